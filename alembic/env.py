@@ -19,7 +19,9 @@ from core.models import (
     BusinessElement,
     Project,
     RefreshToken,
+    ResourceGrant,
     Role,
+    Tenant,
     User,
     UserRole,
 )
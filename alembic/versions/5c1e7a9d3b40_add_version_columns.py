@@ -0,0 +1,38 @@
+"""Add version columns to projects and access_rules
+
+Revision ID: 5c1e7a9d3b40
+Revises: 93092b42285d
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e7a9d3b40"
+down_revision: Union[str, Sequence[str], None] = "93092b42285d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Константный DEFAULT не переписывает таблицу (PostgreSQL 11+)
+    op.add_column(
+        "projects",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "access_rules",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("access_rules", "version")
+    op.drop_column("projects", "version")
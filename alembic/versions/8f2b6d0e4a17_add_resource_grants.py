@@ -0,0 +1,61 @@
+"""Add resource_grants
+
+Revision ID: 8f2b6d0e4a17
+Revises: 5c1e7a9d3b40
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8f2b6d0e4a17"
+down_revision: Union[str, Sequence[str], None] = "5c1e7a9d3b40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "resource_grants",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("element_id", sa.Integer(), nullable=False),
+        sa.Column("object_id", sa.Integer(), nullable=False),
+        sa.Column("principal_type", sa.String(length=10), nullable=False),
+        sa.Column("principal_id", sa.Integer(), nullable=False),
+        sa.Column("actions", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["element_id"], ["business_elements.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "element_id",
+            "object_id",
+            "principal_type",
+            "principal_id",
+            name="unique_resource_grant",
+        ),
+    )
+    op.create_index(
+        "ix_resource_grants_principal",
+        "resource_grants",
+        ["principal_type", "principal_id", "element_id", "object_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_resource_grants_principal", table_name="resource_grants")
+    op.drop_table("resource_grants")
@@ -0,0 +1,86 @@
+"""Add tenants and tenant_id columns
+
+Revision ID: c3d91f5a7e28
+Revises: 8f2b6d0e4a17
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c3d91f5a7e28"
+down_revision: Union[str, Sequence[str], None] = "8f2b6d0e4a17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TENANT_TABLES = (
+    "users",
+    "roles",
+    "access_rules",
+    "projects",
+    "refresh_tokens",
+    "resource_grants",
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "tenants",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    # Существующие данные принадлежат арендатору по умолчанию (id = 1)
+    op.execute("INSERT INTO tenants (id, name) VALUES (1, 'default')")
+    op.execute("SELECT setval(pg_get_serial_sequence('tenants', 'id'), 1)")
+
+    for table in TENANT_TABLES:
+        # Константный DEFAULT: столбец добавляется без перезаписи таблицы
+        op.add_column(
+            table,
+            sa.Column("tenant_id", sa.Integer(), server_default="1", nullable=False),
+        )
+        op.create_foreign_key(
+            f"{table}_tenant_id_fkey",
+            table,
+            "tenants",
+            ["tenant_id"],
+            ["id"],
+            ondelete="CASCADE",
+        )
+
+    op.drop_constraint("roles_name_key", "roles", type_="unique")
+    op.create_unique_constraint(
+        "unique_tenant_role_name", "roles", ["tenant_id", "name"]
+    )
+    op.create_index("ix_users_tenant_id", "users", ["tenant_id"])
+    op.create_index("ix_projects_tenant_owner", "projects", ["tenant_id", "owner_id"])
+    op.create_index(
+        "ix_refresh_tokens_tenant_user", "refresh_tokens", ["tenant_id", "user_id"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_refresh_tokens_tenant_user", table_name="refresh_tokens")
+    op.drop_index("ix_projects_tenant_owner", table_name="projects")
+    op.drop_index("ix_users_tenant_id", table_name="users")
+    op.drop_constraint("unique_tenant_role_name", "roles", type_="unique")
+    op.create_unique_constraint("roles_name_key", "roles", ["name"])
+    for table in reversed(TENANT_TABLES):
+        op.drop_constraint(f"{table}_tenant_id_fkey", table, type_="foreignkey")
+        op.drop_column(table, "tenant_id")
+    op.drop_table("tenants")
@@ -0,0 +1,72 @@
+"""Add partitioned audit_events table
+
+Revision ID: d4a8e2f61b93
+Revises: c3d91f5a7e28
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a8e2f61b93"
+down_revision: Union[str, Sequence[str], None] = "c3d91f5a7e28"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "audit_events",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column("occurred_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("tenant_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("event", sa.String(length=20), nullable=False),
+        sa.Column("outcome", sa.String(length=20), nullable=False),
+        sa.Column("element", sa.String(length=100), nullable=True),
+        sa.Column("action", sa.String(length=20), nullable=True),
+        sa.Column("object_id", sa.Integer(), nullable=True),
+        sa.Column("client_ip", sa.String(length=45), nullable=True),
+        sa.Column("detail", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id", "occurred_at"),
+        postgresql_partition_by="RANGE (occurred_at)",
+    )
+    # Месячные секции создаёт приложение (services/audit_log.py) заранее;
+    # в секцию по умолчанию попадает то, что в них не вошло
+    op.execute("CREATE TABLE audit_events_default PARTITION OF audit_events DEFAULT")
+    op.create_index(
+        "ix_audit_events_tenant_time", "audit_events", ["tenant_id", "occurred_at"]
+    )
+    # Журнал только дописывается: UPDATE и DELETE строк запрещены,
+    # старые месяцы удаляются через DROP/DETACH секции
+    op.execute(
+        """
+        CREATE FUNCTION audit_events_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'audit_events is append-only';
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER audit_events_append_only
+        BEFORE UPDATE OR DELETE ON audit_events
+        FOR EACH ROW EXECUTE FUNCTION audit_events_append_only()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER audit_events_append_only ON audit_events")
+    op.execute("DROP FUNCTION audit_events_append_only()")
+    # Секции удаляются вместе с родительской таблицей
+    op.drop_index("ix_audit_events_tenant_time", table_name="audit_events")
+    op.drop_table("audit_events")
@@ -0,0 +1,111 @@
+"""
+Скрипт массового импорта пользователей из CSV или JSONL.
+Запуск: python bulk_import.py users.csv [--batch-size 5000] [--workers 8] [--tenant 1]
+
+CSV: заголовок с колонками email, password | pass_hash, is_active, roles
+(роли перечисляются через ";"). JSONL: по одному объекту UserImportItem на строку.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from pydantic import ValidationError
+
+from core.db_helper import db_helper
+from core.models import DEFAULT_TENANT_ID
+from core.schemas import UserImportItem, UserImportResult
+from services.auth_service import pwd_context
+from services.bulk_import import BulkImportService
+from services.password_hashing import PasswordHashing
+
+
+def read_csv(path: str) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {
+                "email": row["email"],
+                "password": row.get("password") or None,
+                "pass_hash": row.get("pass_hash") or None,
+                "is_active": (row.get("is_active") or "true").lower()
+                in ("1", "true", "yes"),
+                "roles": [r for r in (row.get("roles") or "").split(";") if r],
+            }
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_items(path: str) -> Iterator[UserImportItem]:
+    reader = read_jsonl if path.endswith((".jsonl", ".ndjson")) else read_csv
+    for lineno, raw in enumerate(reader(path), start=1):
+        try:
+            yield UserImportItem(**raw)
+        except ValidationError as e:
+            print(f"⚠️  Запись {lineno} пропущена: {e.errors()[0]['msg']}")
+
+
+def report(result: UserImportResult) -> None:
+    print(
+        f"  {result.total} обработано, {result.inserted} добавлено, "
+        f"{result.skipped} пропущено — {result.rows_per_second:.0f} строк/с"
+    )
+
+
+async def run_import(
+    path: str, batch_size: int, workers: int | None, tenant_id: int
+) -> None:
+    print(f"Importing users from {path}...")
+    # До создания пула процессов: воркеры наследуют параметры при fork
+    print(f"Хеширование паролей: {PasswordHashing.configure(pwd_context)}")
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        async with db_helper.session_factory() as session:
+            result = await BulkImportService.import_users(
+                read_items(path),
+                session,
+                batch_size=batch_size,
+                executor=executor,
+                workers=workers,
+                progress=report,
+                tenant_id=tenant_id,
+            )
+    await db_helper.dispose()
+
+    print("\n" + "=" * 60)
+    print(f"Импорт завершён за {result.elapsed_seconds:.1f} с")
+    print("=" * 60)
+    print(f"  Всего:          {result.total}")
+    print(f"  Добавлено:      {result.inserted}")
+    print(f"  Пропущено:      {result.skipped}")
+    print(f"  Битые хеши:     {result.invalid}")
+    print(f"  Назначено ролей: {result.role_links}")
+    print(f"  Скорость:       {result.rows_per_second:.0f} строк/с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт пользователей")
+    parser.add_argument("path", help="CSV или JSONL файл")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Процессов для хеширования"
+    )
+    parser.add_argument(
+        "--tenant", type=int, default=DEFAULT_TENANT_ID, help="ID арендатора"
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_import(args.path, args.batch_size, args.workers, args.tenant))
+    except FileNotFoundError:
+        print(f"Файл не найден: {args.path}")
+        sys.exit(1)
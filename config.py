@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -5,6 +7,19 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class RunConfig(BaseModel):
     host: str = "0.0.0.0"
     port: int = 8000
+    debug: bool = False  # Заголовки X-DB-Query-Count / X-DB-Time-Ms и лог запросов
+    # Параметры python server.py (uvicorn)
+    workers: int = 1  # Процессы-воркеры, 0 — по числу CPU
+    loop: Literal["auto", "asyncio", "uvloop"] = "auto"  # auto — uvloop, если есть
+    http: Literal["auto", "h11", "httptools"] = "auto"  # auto — httptools, если есть
+    keep_alive: int = 5  # Таймаут keep-alive соединения, секунды
+    backlog: int = 2048  # Очередь непринятых соединений сокета
+    limit_concurrency: int = 0  # Больше соединений на воркер — 503, 0 — без лимита
+    limit_max_requests: int = 0  # Перезапуск воркера после N запросов, 0 — нет
+    graceful_shutdown_timeout: int = 30  # Ожидание текущих запросов при остановке
+    access_log: bool = True
+    # Функции "module:function", вызываемые в каждом воркере при старте
+    worker_init: list[str] = []
 
 
 class DatabaseConfig(BaseModel):
@@ -13,6 +28,28 @@ class DatabaseConfig(BaseModel):
     echo_pool: bool = False
     pool_size: int = 5
     max_overflow: int = 10
+    pool_timeout: float = 30.0  # Ожидание свободного соединения, секунды
+    pool_recycle: int = -1  # Пересоздавать соединения старше N секунд (-1 — нет)
+    pool_pre_ping: bool = False  # Проверять соединение перед выдачей из пула
+    connect_timeout: float = 10.0  # Таймаут установки соединения asyncpg
+    prepared_statement_cache_size: int = 100  # 0 — отключить (pgbouncer)
+    statement_timeout_ms: int = 0  # statement_timeout на сервере, 0 — без лимита
+    application_name: str = "auth-system"
+    json_serializer: Literal["json", "orjson"] = "json"
+    warmup_connections: int = 2  # Соединения, открываемые при старте
+    ping_timeout: float = 2.0  # Таймаут проверки БД в /readyz, секунды
+    ping_interval: float = 1.0  # Не чаще одной проверки БД за интервал
+    replica_urls: list[str] = []  # Реплики для чтения (JSON-список в .env)
+    max_replica_lag: float = 5.0  # Реплики с большим отставанием не используются
+    replica_check_interval: float = 5.0  # Как часто перемерять отставание
+    read_your_writes_window: float = 5.0  # Сколько читать с primary после записи
+    max_pool_waiters: int = 50  # Больше ожидающих соединение — сразу 503, 0 — выкл.
+
+
+class DeadlineConfig(BaseModel):
+    default_timeout_ms: int = 0  # Срок запроса по умолчанию, 0 — без срока
+    max_timeout_ms: int = 60000  # Верхняя граница срока из заголовка
+    header: str = "X-Request-Timeout-Ms"
 
 
 class AuthConfig(BaseModel):
@@ -20,6 +57,60 @@ class AuthConfig(BaseModel):
     algorithm: str = "HS256"
     ACCESS_EXPIRE_MINUTES: int = 30
     REFRESH_EXPIRE_DAYS: int = 7
+    token_cache_size: int = 10_000  # Кэш проверенных access-токенов, 0 — выкл.
+    # Доля кэша одного арендатора: крупный не вытесняет записи остальных
+    token_cache_per_tenant: int = 2_000
+    # Проверенные API-ключи живут в памяти процесса, секунды (0 — каждый раз БД);
+    # отзыв в другом воркере вступает в силу не позже чем через этот срок
+    api_key_cache_ttl: float = 10.0
+    api_key_last_used_interval: float = 10.0  # Период записи last_used_at
+    # Записывать refresh-токены фоновой задачей; очередь своя в каждом воркере,
+    # см. RefreshTokenWriter о workers > 1
+    refresh_write_behind: bool = False
+    refresh_flush_interval: float = 0.05  # Максимальная задержка записи, секунды
+    refresh_flush_batch: int = 500
+    refresh_max_pending: int = 10_000  # Больше — запрос ждёт записи очереди
+    password_scheme: Literal["bcrypt", "argon2"] = (
+        "bcrypt"  # argon2 — pip install argon2-cffi
+    )
+    password_hash_target_ms: int = 0  # Подбирать стоимость хеша при старте, 0 — нет
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536  # KiB
+    argon2_parallelism: int = 2
+
+
+class RateLimitConfig(BaseModel):
+    enabled: bool = True
+    backend: Literal["memory", "redis"] = "memory"  # redis — общие лимиты воркеров
+    redis_url: str = "redis://localhost:6379/0"
+    window: int = 60  # Окно подсчёта неудачных входов, секунды
+    login_failures_per_email: int = 5
+    login_failures_per_ip: int = 50
+    max_keys: int = 100_000  # Предел ключей в памяти (backend=memory)
+    max_concurrent_hashes: int = 0  # Одновременные bcrypt, 0 — по числу CPU
+    hash_queue_timeout: float = 2.0  # Дольше ждать очередь хеширования — 503
+
+
+class AuditConfig(BaseModel):
+    enabled: bool = True  # Журнал решений авторизации и входов/выходов
+    flush_interval: float = 1.0  # Максимальная задержка записи, секунды
+    flush_batch: int = 1000  # Событий в одном COPY
+    max_pending: int = 50_000  # Предел очереди в памяти
+    # Переполнение: drop_newest — отбросить новое событие, drop_oldest — старейшее,
+    # block — запрос ждёт записи очереди не дольше block_timeout
+    overflow: Literal["drop_newest", "drop_oldest", "block"] = "drop_newest"
+    block_timeout: float = 0.1
+    partitions_ahead: int = 2  # Месячные секции, создаваемые заранее
+
+
+class ProfilingConfig(BaseModel):
+    enabled: bool = True  # Подключить ProfilingMiddleware (без триггера — ~0 затрат)
+    header: str = "X-Profile"  # Подписанный заголовок из POST /admin/profiling/token
+    token_ttl: int = 300  # Срок действия подписи заголовка, секунды
+    sample_rate: float = 0.0  # Доля профилируемых запросов, 0 — только по заголовку
+    buffer_size: int = 50  # Последние профили в памяти воркера
+    stack_interval_ms: float = 5.0  # Период снятия стека, 0 — только участки
 
 
 class Settings(BaseSettings):
@@ -33,6 +124,10 @@ class Settings(BaseSettings):
     run: RunConfig = RunConfig()
     db: DatabaseConfig = DatabaseConfig()
     auth: AuthConfig = AuthConfig()
+    deadline: DeadlineConfig = DeadlineConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    audit: AuditConfig = AuditConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
 
 
 settings = Settings()
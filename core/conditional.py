@@ -0,0 +1,69 @@
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def make_etag(*parts: int) -> str:
+    """
+    Сильный ETag из версии ресурса (или агрегатов коллекции).
+    :param parts: Версия записи либо числа, однозначно описывающие состояние списка
+    :return: str: Значение заголовка ETag, например "3" или "12-40-57"
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _parse(header: str) -> list[str]:
+    """Список тегов из If-Match / If-None-Match, без префикса слабого тега W/"""
+    tags = []
+    for item in header.split(","):
+        item = item.strip()
+        if item.startswith("W/"):
+            item = item[2:]
+        if item:
+            tags.append(item)
+    return tags
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Проверка If-None-Match (слабое сравнение, RFC 9110).
+    :return: Optional[Response]: Готовый ответ 304 без тела или None
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = _parse(header)
+    if "*" in tags or etag in tags:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return None
+
+
+def expected_versions(request: Request) -> Optional[list[int]]:
+    """
+    Версии, допустимые по If-Match, для условного UPDATE/DELETE.
+    Слабые теги не подходят для If-Match (сильное сравнение).
+    :return: Optional[list[int]]: None — условия нет (заголовка нет или "*")
+    :raises HTTPException: 412, если ни один тег не может совпасть
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    versions = []
+    for item in header.split(","):
+        item = item.strip()
+        if item == "*":
+            return None
+        if item.startswith('"') and item.endswith('"') and item[1:-1].isdigit():
+            versions.append(int(item[1:-1]))
+    if not versions:
+        raise precondition_failed()
+    return versions
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Resource was modified (ETag does not match If-Match)",
+    )
@@ -1,24 +1,173 @@
+import asyncio
+import itertools
 import os
 import sys
-from typing import AsyncGenerator
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Optional,
+    Sequence,
+)
 
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from config import settings
+from core.deadline import DeadlineExceeded, current_deadline
+from core.metrics import (
+    db_pool_checkout_wait,
+    db_read_routing,
+    register_pool_gauges,
+    registry,
+)
+from core.query_stats import instrument
+
+READ_YOUR_WRITES_COOKIE = "db_rw_until"
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes-Until"
+
+# SQLSTATE query_canceled: сработал statement_timeout
+QUERY_CANCELED = "57014"
+
+# Действует до конца транзакции, в отличие от SET принимает параметры
+SET_LOCAL_STATEMENT_TIMEOUT = text(
+    "SELECT set_config('statement_timeout', :timeout, true)"
+)
+# Ключ Session.info: (срок запроса, statement_timeout сервера в мс)
+DEADLINE_INFO = "deadline"
+
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+
+# Инициализация нового соединения asyncpg: async def hook(conn: asyncpg.Connection)
+ConnectHook = Callable[[Any], Awaitable[None]]
+
+
+def _json_codec(name: str) -> dict:
+    """Параметры create_async_engine для сериализации JSON-колонок"""
+    if name == "orjson":
+        import orjson
+
+        return {
+            "json_serializer": lambda value: orjson.dumps(value).decode(),
+            "json_deserializer": orjson.loads,
+        }
+    return {}
+
+
+class WriteTracker:
+    """Отмечает, что в текущем HTTP-запросе был commit на primary"""
+
+    def __init__(self) -> None:
+        self.committed = False
+
+
+_write_tracker: ContextVar[Optional[WriteTracker]] = ContextVar(
+    "write_tracker", default=None
+)
+
+
+class PrimarySession(Session):
+    """Сессия primary-движка: её commit'ы включают read-your-writes"""
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _mark_write(session: Session) -> None:
+    tracker = _write_tracker.get()
+    if tracker is not None:
+        tracker.committed = True
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session: Session, transaction, connection) -> None:
+    """
+    Переносит оставшееся время запроса в statement_timeout каждой
+    транзакции сессии: SET LOCAL действует до commit, а обработчики
+    продолжают работать с сессией и после него.
+    """
+    limit = session.info.get(DEADLINE_INFO)
+    if limit is None:
+        return
+    deadline, server_timeout_ms = limit
+    remaining_ms = deadline.remaining_ms()
+    if remaining_ms <= 0:
+        raise DeadlineExceeded()
+    # Серверный лимит и так строже срока — лишний round-trip не нужен
+    if not server_timeout_ms or remaining_ms < server_timeout_ms:
+        connection.execute(SET_LOCAL_STATEMENT_TIMEOUT, {"timeout": str(remaining_ms)})
+
+
+class Replica:
+    """
+    Реплика для чтения с кэшированным значением отставания.
+    Атрибуты:
+        engine (AsyncEngine): Движок реплики
+        session_factory (async_sessionmaker): Фабрика сессий реплики
+        lag (float): Последнее измеренное отставание, секунды (inf — недоступна)
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
+            bind=engine,
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+        )
+        self.lag = float("inf")
+        self.checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def current_lag(self, interval: float, timeout: float) -> float:
+        """Отставание реплики; измеряется не чаще раза в interval секунд"""
+        if time.monotonic() - self.checked_at < interval:
+            return self.lag
+        async with self._lock:
+            if time.monotonic() - self.checked_at >= interval:
+                try:
+                    self.lag = await asyncio.wait_for(self._measure(), timeout)
+                except Exception:
+                    self.lag = float("inf")
+                self.checked_at = time.monotonic()
+        return self.lag
+
+    async def _measure(self) -> float:
+        async with self.engine.connect() as conn:
+            return float((await conn.execute(REPLICA_LAG_SQL)).scalar_one())
 
 
 class DatabaseHelper:
     """
     Вспомогательный класс для управления подключениями к базе данных и сессиями.
     Атрибуты:
-        engine (AsyncEngine): Асинхронный движок SQLAlchemy
+        engine (AsyncEngine): Асинхронный движок SQLAlchemy (primary)
         session_factory (async_sessionmaker): Фабрика для создания асинхронных сессий
+        replicas (list[Replica]): Реплики для читающих запросов
+        pool_waiters (int): Сессии, ожидающие соединение из пула
     """
 
     def __init__(
@@ -28,28 +177,175 @@ class DatabaseHelper:
         echo_pool: bool = False,
         pool_size: int = 5,
         max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        connect_timeout: float = 10.0,
+        prepared_statement_cache_size: int = 100,
+        statement_timeout_ms: int = 0,
+        application_name: Optional[str] = None,
+        json_serializer: str = "json",
+        on_connect: Sequence[ConnectHook] = (),
+        replica_urls: Sequence[str] = (),
+        max_replica_lag: float = 5.0,
+        replica_check_interval: float = 5.0,
+        read_your_writes_window: float = 5.0,
     ) -> None:
-        self.engine: AsyncEngine = create_async_engine(
-            url=url,
+        server_settings = {}
+        if application_name:
+            server_settings["application_name"] = application_name
+        if statement_timeout_ms:
+            server_settings["statement_timeout"] = str(statement_timeout_ms)
+        engine_kwargs = dict(
             echo=echo,
             echo_pool=echo_pool,
             pool_size=pool_size,
             max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            connect_args={
+                "timeout": connect_timeout,
+                # Кэш подготовленных запросов SQLAlchemy и собственный кэш asyncpg
+                "prepared_statement_cache_size": prepared_statement_cache_size,
+                "statement_cache_size": prepared_statement_cache_size,
+                "server_settings": server_settings,
+            },
+            **_json_codec(json_serializer),
         )
+        self.statement_timeout_ms = statement_timeout_ms
+        self.pool_waiters = 0
+        self.on_connect: list[ConnectHook] = list(on_connect)
+        self.engine: AsyncEngine = self._create_engine(url, engine_kwargs)
         self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
             bind=self.engine,
+            sync_session_class=PrimarySession,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False,
         )
 
+        self.replicas: list[Replica] = []
+        for replica_url in replica_urls:
+            self.replicas.append(
+                Replica(self._create_engine(replica_url, engine_kwargs))
+            )
+        self.max_replica_lag = max_replica_lag
+        self.replica_check_interval = replica_check_interval
+        self.read_your_writes_window = read_your_writes_window
+        self._round_robin = itertools.count()
+
+        if not self.replicas:
+            # Без реплик чтение идёт через ту же зависимость, что и запись:
+            # FastAPI кэширует её в пределах запроса, второго соединения не будет
+            self.read_session_getter = self.session_getter
+
+    def _create_engine(self, url: str, engine_kwargs: dict) -> AsyncEngine:
+        engine = create_async_engine(url=url, **engine_kwargs)
+        instrument(engine)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _init_connection(dbapi_connection, connection_record):
+            for hook in self.on_connect:
+                dbapi_connection.run_async(hook)
+
+        return engine
+
     async def dispose(self) -> None:
         """
         Закрывает все соединения
         """
         await self.engine.dispose()
+        for replica in self.replicas:
+            await replica.engine.dispose()
         print("dispose engine")
 
+    async def warmup(self, connections: int) -> int:
+        """
+        Открывает соединения заранее, чтобы первые запросы не ждали их установки.
+        :param connections: Сколько соединений открыть (не больше pool_size)
+        :return: int: Сколько соединений удалось открыть
+        """
+        connections = min(connections, self.engine.pool.size())
+
+        async def open_one():
+            conn = await self.engine.connect()
+            try:
+                await conn.execute(text("SELECT 1"))
+            except Exception:
+                await conn.close()
+                raise
+            return conn
+
+        # Все соединения берутся одновременно, иначе пул отдавал бы одно и то же
+        results = await asyncio.gather(
+            *(open_one() for _ in range(connections)), return_exceptions=True
+        )
+        opened = [conn for conn in results if not isinstance(conn, BaseException)]
+        for conn in opened:
+            await conn.close()
+        return len(opened)
+
+    async def ping(self, timeout: float) -> bool:
+        """
+        Проверяет доступность БД запросом SELECT 1.
+        :param timeout: Таймаут в секундах
+        :return: bool: True если БД ответила
+        """
+
+        async def select_one():
+            async with self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        try:
+            await asyncio.wait_for(select_one(), timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _checkout(self, session: AsyncSession) -> None:
+        """
+        Берёт соединение для сессии в пределах срока запроса; оставшееся
+        время каждой транзакции сессии получает _apply_deadline.
+        :raises DeadlineExceeded: Срок истёк до получения соединения
+        """
+        deadline = current_deadline()
+        if deadline is not None:
+            session.sync_session.info[DEADLINE_INFO] = (
+                deadline,
+                self.statement_timeout_ms,
+            )
+        self.pool_waiters += 1
+        started = time.perf_counter()
+        try:
+            if deadline is None:
+                await session.connection()
+            else:
+                deadline.check()
+                await asyncio.wait_for(session.connection(), deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded() from None
+        finally:
+            self.pool_waiters -= 1
+            db_pool_checkout_wait.observe(time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def _open_session(
+        self, factory: async_sessionmaker[AsyncSession]
+    ) -> AsyncIterator[AsyncSession]:
+        session = factory()
+        async with session:
+            # Соединение берётся сразу: ожидание в очереди пула измеряется
+            # и ограничивается сроком запроса
+            await self._checkout(session)
+            try:
+                yield session
+            except DBAPIError as exc:
+                canceled = getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED
+                if canceled and current_deadline() is not None:
+                    raise DeadlineExceeded() from exc
+                raise
+
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
         """
         Асинхронный генератор для получения сессии базы данных.
@@ -57,15 +353,96 @@ class DatabaseHelper:
         Yields:
             AsyncSession: Сессия базы данных
         """
-        session = self.session_factory()
-        async with session:
+        async with self._open_session(self.session_factory) as session:
+            yield session
+
+    def _requires_primary(self, request: Request) -> bool:
+        """Клиент недавно писал: читаем с primary, чтобы увидеть свои изменения"""
+        tracker = _write_tracker.get()
+        if tracker is not None and tracker.committed:
+            return True
+        marker = request.headers.get(READ_YOUR_WRITES_HEADER) or request.cookies.get(
+            READ_YOUR_WRITES_COOKIE
+        )
+        try:
+            return marker is not None and float(marker) > time.time()
+        except ValueError:
+            return False
+
+    async def pick_replica(self) -> Optional[Replica]:
+        """
+        Выбирает реплику по кругу среди тех, чьё отставание не больше max_replica_lag.
+        :return: Optional[Replica]: Реплика или None, если подходящих нет
+        """
+        start = next(self._round_robin)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            lag = await replica.current_lag(
+                self.replica_check_interval, settings.db.ping_timeout
+            )
+            if lag <= self.max_replica_lag:
+                return replica
+        return None
+
+    async def read_session_getter(
+        self, request: Request
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Сессия для читающих запросов: реплика с допустимым отставанием,
+        иначе primary. После записи клиент читает с primary в течение
+        read_your_writes_window секунд (cookie или заголовок).
+        Yields:
+            AsyncSession: Сессия базы данных
+        """
+        factory = self.session_factory
+        if self._requires_primary(request):
+            db_read_routing.inc(target="primary", reason="read_your_writes")
+        else:
+            replica = await self.pick_replica()
+            if replica is None:
+                db_read_routing.inc(target="primary", reason="replicas_lagging")
+            else:
+                db_read_routing.inc(target="replica", reason="ok")
+                factory = replica.session_factory
+        async with self._open_session(factory) as session:
             yield session
 
 
+def track_writes() -> tuple[WriteTracker, object]:
+    """
+    Начинает отслеживание commit'ов на primary в текущем контексте.
+    :return: tuple: (трекер, токен для reset_write_tracking)
+    """
+    tracker = WriteTracker()
+    return tracker, _write_tracker.set(tracker)
+
+
+def reset_write_tracking(token) -> None:
+    _write_tracker.reset(token)
+
+
 db_helper = DatabaseHelper(
     url=settings.db.url,
     echo=settings.db.echo,
     echo_pool=settings.db.echo_pool,
     pool_size=settings.db.pool_size,
     max_overflow=settings.db.max_overflow,
+    pool_timeout=settings.db.pool_timeout,
+    pool_recycle=settings.db.pool_recycle,
+    pool_pre_ping=settings.db.pool_pre_ping,
+    connect_timeout=settings.db.connect_timeout,
+    prepared_statement_cache_size=settings.db.prepared_statement_cache_size,
+    statement_timeout_ms=settings.db.statement_timeout_ms,
+    application_name=settings.db.application_name,
+    json_serializer=settings.db.json_serializer,
+    replica_urls=settings.db.replica_urls,
+    max_replica_lag=settings.db.max_replica_lag,
+    replica_check_interval=settings.db.replica_check_interval,
+    read_your_writes_window=settings.db.read_your_writes_window,
+)
+register_pool_gauges(db_helper.engine)
+registry.gauge(
+    "db_pool_waiters",
+    "Сессии, ожидающие соединение из пула",
+    collect=lambda: db_helper.pool_waiters,
 )
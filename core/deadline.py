@@ -0,0 +1,53 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Время, отведённое на запрос, истекло"""
+
+
+class Deadline:
+    """
+    Крайний срок обработки запроса.
+    Атрибуты:
+        expires_at (float): Момент истечения по time.monotonic()
+        explicit (bool): Срок задан клиентом через заголовок
+    """
+
+    __slots__ = ("expires_at", "explicit")
+
+    def __init__(self, timeout: float, explicit: bool = False) -> None:
+        self.expires_at = time.monotonic() + timeout
+        self.explicit = explicit
+
+    def remaining(self) -> float:
+        """Оставшееся время в секундах (может быть отрицательным)"""
+        return self.expires_at - time.monotonic()
+
+    def remaining_ms(self) -> int:
+        return int(self.remaining() * 1000)
+
+    def check(self) -> None:
+        if self.remaining() <= 0:
+            raise DeadlineExceeded()
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Срок текущего запроса или None, если он не задан"""
+    return _deadline.get()
+
+
+def set_deadline(deadline: Optional[Deadline]):
+    """
+    Устанавливает срок для текущего контекста.
+    :return: Токен для reset_deadline
+    """
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token) -> None:
+    _deadline.reset(token)
@@ -0,0 +1,40 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+
+class ReadinessProbe:
+    """
+    Проверка готовности приложения для /readyz.
+    Приложение не готово, пока не завершён прогрев при старте. Проверка БД
+    выполняется не чаще раза в interval секунд: остальные запросы получают
+    последний результат, а одновременные — ждут одну общую проверку.
+    """
+
+    def __init__(self, check: Callable[[], Awaitable[bool]], interval: float) -> None:
+        self._check = check
+        self.interval = interval
+        self.started = False
+        self._healthy = False
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def mark_started(self) -> None:
+        self.started = True
+
+    def mark_stopped(self) -> None:
+        self.started = False
+
+    async def database_ok(self) -> bool:
+        """Результат проверки БД (из кэша, если он свежее interval)"""
+        if time.monotonic() - self._checked_at < self.interval:
+            return self._healthy
+        async with self._lock:
+            # Пока ждали блокировку, проверку мог выполнить другой запрос
+            if time.monotonic() - self._checked_at >= self.interval:
+                self._healthy = await self._check()
+                self._checked_at = time.monotonic()
+        return self._healthy
+
+    async def ready(self) -> bool:
+        return self.started and await self.database_ok()
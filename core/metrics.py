@@ -0,0 +1,333 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Базовый класс метрики с набором меток"""
+
+    type_name = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name}: ожидались метки {self.labelnames}, получены {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик"""
+
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """Значение, которое может расти и убывать; либо вычисляется при сборе"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self, *args, collect: Optional[Callable[[], float]] = None, **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        if self._collect is not None:
+            return self._collect()
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        if self._collect is not None:
+            yield f"{self.name} {_format_value(self._collect())}"
+            return
+        for key, value in sorted(self._values.items()):
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """Гистограмма с накопительными бакетами"""
+
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # метки → (счётчики по бакетам, сумма, количество)
+        self._values: dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Замеряет длительность блока в секундах"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(
+                    self.labelnames, key, f'le="{_format_value(bound)}"'
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """Реестр метрик с выводом в текстовом формате Prometheus"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        collect: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, collect=collect))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(
+            Histogram(name, documentation, labelnames, buckets=buckets)
+        )
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total",
+    "Число HTTP-запросов",
+    ("method", "route", "status"),
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Длительность HTTP-запросов по шаблону маршрута",
+    ("method", "route"),
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Число обрабатываемых HTTP-запросов"
+)
+auth_operation_duration = registry.histogram(
+    "auth_operation_duration_seconds",
+    "Длительность криптографических операций AuthService",
+    ("operation",),
+)
+auth_password_rehash = registry.counter(
+    "auth_password_rehash_total",
+    "Пароли, перехешированные при входе под текущие параметры",
+)
+auth_login_rejected = registry.counter(
+    "auth_login_rejected_total",
+    "Попытки входа, отклонённые до проверки пароля",
+    ("reason",),
+)
+refresh_token_flushes = registry.counter(
+    "refresh_token_flushes_total",
+    "Пачки refresh-токенов, записанные фоновой задачей",
+    ("result",),
+)
+refresh_token_write_lag = registry.histogram(
+    "refresh_token_write_lag_seconds",
+    "Время от выдачи refresh-токена до его записи в БД",
+)
+audit_events = registry.counter(
+    "audit_events_total",
+    "События аудита, записанные в БД",
+)
+audit_events_dropped = registry.counter(
+    "audit_events_dropped_total",
+    "События аудита, потерянные при переполнении очереди или остановке",
+    ("reason",),
+)
+audit_flushes = registry.counter(
+    "audit_flushes_total",
+    "Пачки событий аудита, записанные фоновой задачей",
+    ("result",),
+)
+api_key_auth = registry.counter(
+    "api_key_auth_total",
+    "Проверки API-ключей: cached — из памяти, ok — по БД, rejected — отказ",
+    ("result",),
+)
+token_cache_requests = registry.counter(
+    "token_cache_requests_total",
+    "Обращения к кэшу проверенных JWT",
+    ("result",),
+)
+singleflight_calls = registry.counter(
+    "singleflight_calls_total",
+    "Вызовы single-flight: leader — выполнен запрос, shared — получен чужой результат",
+    ("name", "result"),
+)
+db_read_routing = registry.counter(
+    "db_read_routing_total",
+    "Куда направлены читающие сессии",
+    ("target", "reason"),
+)
+http_requests_rejected = registry.counter(
+    "http_requests_rejected_total",
+    "Запросы, отклонённые из-за перегрузки пула или истёкшего срока",
+    ("reason",),
+)
+db_pool_checkout_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Время ожидания соединения из пула",
+)
+
+
+def register_pool_gauges(engine) -> None:
+    """
+    Гейджи состояния пула соединений SQLAlchemy (вычисляются при сборе).
+    Пул берётся из движка при каждом сборе: dispose() пересоздаёт его.
+    """
+    pool = lambda: engine.pool
+    registry.gauge(
+        "db_pool_size", "Размер пула соединений", collect=lambda: pool().size()
+    )
+    registry.gauge(
+        "db_pool_checked_out",
+        "Выданные из пула соединения",
+        collect=lambda: pool().checkedout(),
+    )
+    registry.gauge(
+        "db_pool_checked_in",
+        "Свободные соединения в пуле",
+        collect=lambda: pool().checkedin(),
+    )
+    registry.gauge(
+        "db_pool_overflow",
+        "Соединения сверх pool_size (отрицательное — ещё не открытые)",
+        collect=lambda: pool().overflow(),
+    )
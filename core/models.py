@@ -1,26 +1,58 @@
 from datetime import datetime
 
 from sqlalchemy import (
+    DDL,
+    BigInteger,
     Boolean,
     DateTime,
     ForeignKey,
+    Identity,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
 )
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.event import listen
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
+# Организация по умолчанию: в неё попадают данные, созданные до появления
+# арендаторов, и саморегистрация через /auth/register
+DEFAULT_TENANT_ID = 1
+
 
 class Base(DeclarativeBase):
     pass
 
 
+def tenant_fk() -> Mapped[int]:
+    return mapped_column(
+        ForeignKey("tenants.id", ondelete="CASCADE"),
+        nullable=False,
+        server_default=str(DEFAULT_TENANT_ID),
+    )
+
+
+class Tenant(Base):
+    """Организация-клиент; все пользовательские данные принадлежат одной из них"""
+
+    __tablename__ = "tenants"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
 class User(Base):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    tenant_id: Mapped[int] = tenant_fk()
+    # Email уникален глобально: по нему при входе определяется арендатор
     email: Mapped[str] = mapped_column(
         String(255), unique=True, nullable=False, index=True
     )
@@ -42,12 +74,15 @@ class User(Base):
         "Project", back_populates="owner", foreign_keys="[Project.owner_id]"
     )
 
+    __table_args__ = (Index("ix_users_tenant_id", "tenant_id"),)
+
 
 class Role(Base):
     __tablename__ = "roles"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    tenant_id: Mapped[int] = tenant_fk()
+    name: Mapped[str] = mapped_column(String(50), nullable=False)
     description: Mapped[str | None] = mapped_column(String(255))
 
     users: Mapped[list["User"]] = relationship(
@@ -57,6 +92,11 @@ class Role(Base):
         "AccessRule", back_populates="role", cascade="all, delete-orphan"
     )
 
+    # Названия ролей (admin, manager, ...) свои у каждого арендатора
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="unique_tenant_role_name"),
+    )
+
 
 class UserRole(Base):
     __tablename__ = "user_roles"
@@ -73,6 +113,7 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    tenant_id: Mapped[int] = tenant_fk()
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
@@ -87,6 +128,9 @@ class RefreshToken(Base):
 
     user: Mapped["User"] = relationship("User", back_populates="refresh_tokens")
 
+    # Активные токены пользователя в пределах арендатора
+    __table_args__ = (Index("ix_refresh_tokens_tenant_user", "tenant_id", "user_id"),)
+
 
 class BusinessElement(Base):
     __tablename__ = "business_elements"
@@ -104,6 +148,7 @@ class AccessRule(Base):
     __tablename__ = "access_rules"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    tenant_id: Mapped[int] = tenant_fk()
     role_id: Mapped[int] = mapped_column(ForeignKey("roles.id", ondelete="CASCADE"))
     element_id: Mapped[int] = mapped_column(
         ForeignKey("business_elements.id", ondelete="CASCADE")
@@ -116,6 +161,8 @@ class AccessRule(Base):
     update_all_permission: Mapped[bool] = mapped_column(Boolean, default=False)
     delete_permission: Mapped[bool] = mapped_column(Boolean, default=False)
     delete_all_permission: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Растёт при каждом изменении — основа ETag и If-Match
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
 
     role: Mapped["Role"] = relationship("Role", back_populates="access_rules")
     element: Mapped["BusinessElement"] = relationship(
@@ -131,6 +178,7 @@ class Project(Base):
     __tablename__ = "projects"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    tenant_id: Mapped[int] = tenant_fk()
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str | None] = mapped_column(Text)
     owner_id: Mapped[int] = mapped_column(
@@ -139,5 +187,116 @@ class Project(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
 
     owner: Mapped["User"] = relationship("User", back_populates="projects")
+
+    # Списки проектов всегда в пределах арендатора: (tenant_id) и
+    # (tenant_id, owner_id) — один индекс на оба префикса
+    __table_args__ = (Index("ix_projects_tenant_owner", "tenant_id", "owner_id"),)
+
+
+class ResourceGrant(Base):
+    """
+    Доступ к отдельному объекту ресурса (например, проекту) для пользователя
+    или роли. actions — битовая маска core.principal.GRANT_ACTIONS.
+    """
+
+    __tablename__ = "resource_grants"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    tenant_id: Mapped[int] = tenant_fk()
+    element_id: Mapped[int] = mapped_column(
+        ForeignKey("business_elements.id", ondelete="CASCADE")
+    )
+    object_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    principal_type: Mapped[str] = mapped_column(String(10), nullable=False)
+    principal_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    actions: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        # Проверка доступа к объекту: (element_id, object_id) → гранты
+        UniqueConstraint(
+            "element_id",
+            "object_id",
+            "principal_type",
+            "principal_id",
+            name="unique_resource_grant",
+        ),
+        # Список расшаренного: (principal_type, principal_id) → объекты
+        Index(
+            "ix_resource_grants_principal",
+            "principal_type",
+            "principal_id",
+            "element_id",
+            "object_id",
+        ),
+    )
+
+
+class ApiKey(Base):
+    """
+    Ключ сервисного клиента: вход без пароля и refresh-токенов.
+    Ключ вида ak_<prefix>_<secret>; prefix открыт и ищется по уникальному
+    индексу, key_hash — HMAC-SHA256 всего ключа. Права — роли владельца,
+    ограниченные role_ids.
+    """
+
+    __tablename__ = "api_keys"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    tenant_id: Mapped[int] = tenant_fk()
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    prefix: Mapped[str] = mapped_column(String(16), unique=True, nullable=False)
+    key_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    role_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    last_used_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    revoked: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class AuditEvent(Base):
+    """
+    Журнал аудита: решения авторизации, входы, обновления токенов и выходы.
+    Только дописывается; секционирован по месяцам occurred_at, старые месяцы
+    удаляются целыми секциями. tenant_id и user_id без внешних ключей —
+    история переживает удаление пользователя и арендатора.
+    """
+
+    __tablename__ = "audit_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    # Ключ секционирования входит в первичный ключ
+    occurred_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
+    )
+    tenant_id: Mapped[int | None] = mapped_column(Integer)
+    user_id: Mapped[int | None] = mapped_column(Integer)
+    event: Mapped[str] = mapped_column(String(20), nullable=False)
+    outcome: Mapped[str] = mapped_column(String(20), nullable=False)
+    element: Mapped[str | None] = mapped_column(String(100))
+    action: Mapped[str | None] = mapped_column(String(20))
+    object_id: Mapped[int | None] = mapped_column(Integer)
+    client_ip: Mapped[str | None] = mapped_column(String(45))
+    detail: Mapped[str | None] = mapped_column(Text)
+
+    __table_args__ = (
+        # Выгрузка истории арендатора за период
+        Index("ix_audit_events_tenant_time", "tenant_id", "occurred_at"),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+
+# Секция по умолчанию: события вне созданных месячных секций не теряются
+listen(
+    AuditEvent.__table__,
+    "after_create",
+    DDL("CREATE TABLE audit_events_default PARTITION OF audit_events DEFAULT"),
+)
@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from datetime import datetime
+from enum import IntFlag
+from typing import Optional
+
+
+class Permission(IntFlag):
+    """Права правила доступа, упакованные в битовое поле"""
+
+    READ = 1
+    READ_ALL = 2
+    CREATE = 4
+    UPDATE = 8
+    UPDATE_ALL = 16
+    DELETE = 32
+    DELETE_ALL = 64
+
+
+# Бит → колонка AccessRule (порядок колонок в выборке правил)
+RULE_COLUMNS = (
+    (Permission.READ, "read_permission"),
+    (Permission.READ_ALL, "read_all_permission"),
+    (Permission.CREATE, "create_permission"),
+    (Permission.UPDATE, "update_permission"),
+    (Permission.UPDATE_ALL, "update_all_permission"),
+    (Permission.DELETE, "delete_permission"),
+    (Permission.DELETE_ALL, "delete_all_permission"),
+)
+
+# Действие → (право на все объекты, право только на свои)
+ACTION_PERMISSIONS: dict[str, tuple[int, int]] = {
+    "read": (Permission.READ_ALL, Permission.READ),
+    "create": (Permission.CREATE, 0),
+    "update": (Permission.UPDATE_ALL, Permission.UPDATE),
+    "delete": (Permission.DELETE_ALL, Permission.DELETE),
+}
+
+# Действия, которые можно выдать на отдельный объект (resource_grants.actions).
+# Биты совпадают с правами "только свои": доступ по гранту равен доступу владельца
+GRANT_ACTIONS: dict[str, int] = {
+    "read": Permission.READ,
+    "update": Permission.UPDATE,
+    "delete": Permission.DELETE,
+}
+
+
+def pack_rule(flags) -> int:
+    """
+    Упаковывает флаги одного правила в битовое поле.
+    :param flags: Значения колонок в порядке RULE_COLUMNS
+    :return: int: Битовая маска Permission
+    """
+    mask = 0
+    for (bit, _), allowed in zip(RULE_COLUMNS, flags):
+        if allowed:
+            mask |= bit
+    return int(mask)
+
+
+def is_allowed(
+    mask: int, action: str, owner_id: Optional[int], principal_id: int
+) -> bool:
+    """
+    Проверка действия по объединённой маске правил ролей.
+    :param mask: Битовая маска Permission
+    :param action: Действие ("read", "create", "update", "delete")
+    :param owner_id: Владелец ресурса (для прав "только свои")
+    :param principal_id: Пользователь, выполняющий действие
+    """
+    permissions = ACTION_PERMISSIONS.get(action)
+    if permissions is None:
+        return False
+    any_object, own_object = permissions
+    if mask & any_object:
+        return True
+    return owner_id is not None and owner_id == principal_id and bool(mask & own_object)
+
+
+def pack_actions(actions) -> int:
+    """
+    :param actions: Названия действий из GRANT_ACTIONS
+    :return: int: Битовая маска для resource_grants.actions
+    """
+    mask = 0
+    for action in actions:
+        mask |= GRANT_ACTIONS[action]
+    return int(mask)
+
+
+def unpack_actions(mask: int) -> list[str]:
+    return [action for action, bit in GRANT_ACTIONS.items() if mask & bit]
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    Аутентифицированный пользователь без привязки к сессии БД.
+    Неизменяем, поэтому его можно разделять между запросами и кэшировать.
+    """
+
+    id: int
+    tenant_id: int
+    email: str
+    is_active: bool
+    created_at: datetime
+    role_ids: frozenset[int]
+    role_names: tuple[str, ...]
+
+    def has_role(self, name: str) -> bool:
+        return name in self.role_names
@@ -0,0 +1,304 @@
+import functools
+import hashlib
+import hmac
+import inspect
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+
+from fastapi.routing import APIRoute
+
+from config import settings
+
+_ids = itertools.count(1)
+
+
+@dataclass
+class RequestProfile:
+    """
+    Профиль одного HTTP-запроса.
+    spans — суммарное время участков, мс. Участки вложены: handler включает
+    permission_check и SQL, user_load — SQL загрузки пользователя.
+    stacks — свёрнутые стеки потока event loop ("a;b;c" → число сэмплов).
+    """
+
+    method: str
+    path: str
+    id: str = field(default_factory=lambda: f"{os.getpid()}-{next(_ids)}")
+    trigger: str = "sample"
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    status: Optional[int] = None
+    duration_ms: float = 0.0
+    spans: dict[str, float] = field(default_factory=dict)
+    db_queries: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    stack_interval_ms: float = 0.0
+    handler_finished: Optional[float] = None
+
+    def add_span(self, name: str, elapsed: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + elapsed * 1000
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": {name: round(ms, 3) for name, ms in self.spans.items()},
+            "db_queries": self.db_queries,
+            "samples": sum(self.stacks.values()),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            **self.summary(),
+            "stack_interval_ms": self.stack_interval_ms,
+            "stacks": dict(self.stacks.most_common()),
+        }
+
+    def folded(self) -> str:
+        """Стеки в формате flamegraph.pl / speedscope: "a;b;c N" в строке"""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+_profile: ContextVar[Optional[RequestProfile]] = ContextVar("profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _profile.get()
+
+
+@contextmanager
+def profile_request(profile: RequestProfile) -> Iterator[RequestProfile]:
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Замер участка запроса для профиля. Без активного профиля — только
+    чтение ContextVar.
+    """
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, time.perf_counter() - started)
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        profile = _profile.get()
+        if profile is None:
+            return await endpoint(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            profile.handler_finished = time.perf_counter()
+            profile.add_span("handler", profile.handler_finished - started)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Маршрут, замеряющий время самого обработчика (span "handler").
+    Время от его завершения до начала ответа — валидация response_model
+    и сериализация — ProfilingMiddleware записывает в span "serialize".
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs) -> None:
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Статистический профилировщик: фоновый поток раз в interval снимает стек
+    потока event loop. Одновременно работает один сэмплер на процесс;
+    сэмплы включают и другие запросы, выполнявшиеся в это время в том же
+    event loop.
+    """
+
+    _active = threading.Lock()
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        # Сэмпл и остановка не пересекаются: после stop() stacks не меняются
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """
+        :return: bool: False — сэмплер уже занят другим запросом
+        """
+        if self.interval <= 0 or not self._active.acquire(blocking=False):
+            return False
+        target = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run, args=(target,), name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _run(self, target: int) -> None:
+        try:
+            while not self._stop.wait(self.interval):
+                frame = sys._current_frames().get(target)
+                if frame is None:
+                    continue
+                stack = _fold(frame)
+                with self._lock:
+                    if self._stop.is_set():
+                        break
+                    self.stacks[stack] += 1
+        finally:
+            self._active.release()
+
+    def stop(self) -> Counter:
+        """
+        Останавливает сэмплирование без join: вызывается из event loop,
+        поток завершается сам и освобождает сэмплер процесса.
+        """
+        if self._thread is not None:
+            with self._lock:
+                self._stop.set()
+            self._thread = None
+        return self.stacks
+
+
+class ProfileBuffer:
+    """Последние профили процесса (кольцевой буфер)"""
+
+    def __init__(self, size: int) -> None:
+        self._profiles: deque[RequestProfile] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles.append(profile)
+
+    def list(self) -> list[RequestProfile]:
+        return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in self._profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+
+def sign_profile_token(secret: str, expires: int) -> str:
+    """
+    :param expires: Unix-время, до которого заголовок действует
+    :return: str: Значение заголовка профилирования "<expires>.<hmac>"
+    """
+    digest = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256)
+    return f"{expires}.{digest.hexdigest()}"
+
+
+def verify_profile_token(secret: str, value: str, now: Optional[float] = None) -> bool:
+    expires, _, _ = value.partition(".")
+    if not expires.isdigit() or int(expires) < (now or time.time()):
+        return False
+    return hmac.compare_digest(sign_profile_token(secret, int(expires)), value)
+
+
+class Profiler:
+    """
+    Когда профилировать запрос: по подписанному заголовку (любой запрос
+    с ним, пока подпись не истекла) или по доле sample_rate. Доля задаётся
+    в настройках или временно через /admin/profiling/sampling — только
+    в этом процессе.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        sample_rate: float = 0.0,
+        buffer_size: int = 50,
+        stack_interval: float = 0.005,
+        rng: Callable[[], float] = random.random,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.secret = secret
+        self.default_rate = sample_rate
+        self.sample_rate = sample_rate
+        self.sample_until: Optional[float] = None
+        self.stack_interval = stack_interval
+        self.buffer = ProfileBuffer(buffer_size)
+        self.rng = rng
+        self.clock = clock
+
+    def set_sampling(self, rate: float, duration: float) -> float:
+        """
+        Временная доля профилируемых запросов.
+        :return: float: Unix-время возврата к доле из настроек
+        """
+        self.sample_rate = rate
+        self.sample_until = self.clock() + duration
+        return self.sample_until
+
+    def current_rate(self) -> float:
+        if self.sample_until is not None and self.sample_until <= self.clock():
+            self.sample_rate = self.default_rate
+            self.sample_until = None
+        return self.sample_rate
+
+    def trigger(self, header_value: Optional[str]) -> Optional[str]:
+        """
+        :param header_value: Значение заголовка профилирования или None
+        :return: Optional[str]: "header", "sample" или None — не профилировать
+        """
+        if header_value is not None and verify_profile_token(
+            self.secret, header_value, self.clock()
+        ):
+            return "header"
+        rate = self.current_rate()
+        if rate > 0 and self.rng() < rate:
+            return "sample"
+        return None
+
+
+profiler = Profiler(
+    settings.auth.secret_key,
+    sample_rate=settings.profiling.sample_rate,
+    buffer_size=settings.profiling.buffer_size,
+    stack_interval=settings.profiling.stack_interval_ms / 1000,
+)
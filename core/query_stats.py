@@ -0,0 +1,82 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Активные сборщики статистики (вложенные track_queries видят одни и те же запросы)
+_collectors: ContextVar[tuple["QueryStats", ...]] = ContextVar(
+    "query_collectors", default=()
+)
+
+
+class QueryStats:
+    """
+    Статистика SQL-запросов в пределах одного запроса/блока кода.
+    Атрибуты:
+        count (int): Число выполненных statement'ов
+        total_time (float): Суммарное время в БД, секунды
+        statements (Counter): Сколько раз выполнялся каждый текст SQL
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_time += elapsed
+        self.statements[statement] += 1
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_time * 1000
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        """
+        Statement'ы, выполненные не меньше threshold раз (признак N+1).
+        :return: dict[str, int]: SQL → число выполнений
+        """
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Считает SQL-запросы, выполненные внутри блока.
+
+    Использование:
+        with track_queries() as stats:
+            await client.get("/auth/me")
+        assert stats.count <= 2
+    """
+    stats = QueryStats()
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """Подключает подсчёт запросов к движку"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if _collectors.get():
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        collectors = _collectors.get()
+        started = conn.info.get("query_started")
+        if not collectors or not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        for stats in collectors:
+            stats.record(statement, elapsed)
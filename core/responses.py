@@ -0,0 +1,33 @@
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse as BaseORJSONResponse
+
+from core.profiling import span
+
+# Формат datetime совпадает с сериализацией pydantic ("...Z" для UTC)
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+class ORJSONResponse(BaseORJSONResponse):
+    """
+    ORJSONResponse FastAPI с форматом datetime как у pydantic и замером
+    сериализации в профиле запроса.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def rows_response(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> Response:
+    """
+    Быстрый путь для больших списков: Core-строки сразу в JSON.
+    Колонки должны совпадать с полями response_model маршрута — он остаётся
+    для OpenAPI, но FastAPI не валидирует возвращённый Response повторно.
+    :param keys: Имена полей в порядке колонок
+    :param rows: Строки результата (кортежи значений)
+    :return: Response: Готовый JSON-ответ
+    """
+    return ORJSONResponse([dict(zip(keys, row)) for row in rows])
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, model_validator
 
 
 class UserBase(BaseModel):
@@ -144,6 +144,7 @@ class AccessRuleRead(AccessRuleBase):
     id: int
     role_name: Optional[str] = None  # Название роли (для удобства)
     element_name: Optional[str] = None  # Название элемента (для удобства)
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -174,10 +175,66 @@ class ProjectRead(ProjectBase):
     id: int
     owner_id: int
     created_at: datetime
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class ResourceGrantCreate(BaseModel):
+    """Схема выдачи доступа к объекту"""
+
+    principal_type: Literal["user", "role"]
+    principal_id: int
+    actions: List[Literal["read", "update", "delete"]] = Field(..., min_length=1)
+
+
+class ResourceGrantRead(BaseModel):
+    """Схема для чтения выданного доступа"""
+
+    id: int
+    object_id: int
+    principal_type: str
+    principal_id: int
+    actions: List[str]
+
+
+class ApiKeyCreate(BaseModel):
+    """Схема выпуска API-ключа"""
+
+    user_id: int
+    name: str = Field(..., min_length=1, max_length=100)
+    # Роли владельца, доступные по ключу; None — все его текущие роли
+    role_ids: Optional[List[int]] = None
+    expires_in_days: Optional[int] = Field(None, ge=1, le=3650)
+
+
+class ApiKeyRead(BaseModel):
+    """Схема для чтения API-ключа (без секрета)"""
+
+    id: int
+    user_id: int
+    name: str
+    prefix: str
+    role_ids: List[int]
+    expires_at: Optional[datetime]
+    last_used_at: Optional[datetime]
+    revoked: bool
+    created_at: datetime
+
+
+class ApiKeyCreated(ApiKeyRead):
+    """Выпущенный ключ: значение показывается только в этом ответе"""
+
+    key: str
+
+
+class ProfilingSampling(BaseModel):
+    """Схема временного включения выборочного профилирования"""
+
+    sample_rate: float = Field(..., ge=0, le=1)
+    duration_seconds: int = Field(300, ge=1, le=3600)
+
+
 class PermissionsResponse(BaseModel):
     """Схема ответа с правами пользователя"""
 
@@ -191,3 +248,33 @@ class ErrorResponse(BaseModel):
     """Схема ответа с ошибкой"""
 
     detail: str
+
+
+class UserImportItem(BaseModel):
+    """Схема пользователя для массового импорта"""
+
+    email: EmailStr
+    password: Optional[str] = Field(None, min_length=6)
+    pass_hash: Optional[str] = None  # Уже захешированный пароль (bcrypt)
+    is_active: bool = True
+    roles: List[str] = []  # Названия ролей
+
+    @model_validator(mode="after")
+    def check_password(self) -> "UserImportItem":
+        if (self.password is None) == (self.pass_hash is None):
+            raise ValueError(
+                "Нужно указать ровно одно из полей: password или pass_hash"
+            )
+        return self
+
+
+class UserImportResult(BaseModel):
+    """Схема результата массового импорта"""
+
+    total: int = 0
+    inserted: int = 0
+    skipped: int = 0  # Уже существующие email и дубликаты
+    invalid: int = 0  # Нераспознанные хеши паролей
+    role_links: int = 0
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from core.metrics import singleflight_calls
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вызовов: пока вызов с ключом key
+    выполняется, остальные ожидающие получают его результат (или исключение)
+    вместо повторного запроса к БД. Результаты не кэшируются — после
+    завершения вызова следующий выполняется заново.
+
+    Первый вызов (лидер) выполняется в своём контексте. Если лидера отменили
+    (клиент отключился, истёк срок), ожидающие повторяют вызов сами.
+    Общий результат должен использоваться только для чтения.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        :param key: Ключ вызова (одинаковые ключи — одинаковый результат)
+        :param fn: Фабрика корутины, выполняется только лидером
+        :return: Результат fn
+        """
+        while (future := self._calls.get(key)) is not None:
+            singleflight_calls.inc(name=self.name, result="shared")
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # Отменили самого ожидающего
+                # Лидера отменили: повторяем вызов
+
+        future = asyncio.get_running_loop().create_future()
+        # Без ожидающих исключение лидера иначе попало бы в лог как "never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        singleflight_calls.inc(name=self.name, result="leader")
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
@@ -0,0 +1,109 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from core.metrics import token_cache_requests
+
+
+class TokenCache:
+    """
+    Кэш проверенных JWT: sha256(токен) → claims.
+    Запись живёт до exp токена; токены без exp не кэшируются.
+    Записи разбиты по арендаторам (claim "tid"): каждый занимает не больше
+    max_per_tenant записей и вытесняет сначала свои давно не использованные.
+    Общий размер ограничен max_entries; при переполнении запись вытесняется
+    у арендатора с самой большой долей, поэтому крупный арендатор не
+    вымывает из кэша остальных.
+    invalidate_subject() удаляет все записи пользователя — например, при выходе,
+    чтобы следующий запрос снова прошёл полную проверку.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        clock: Callable[[], float] = time.time,
+        max_per_tenant: Optional[int] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_per_tenant = min(max_per_tenant or max_entries, max_entries)
+        self.clock = clock
+        # tid → (digest → (claims, exp)) в порядке использования
+        self._tenants: dict[str, OrderedDict[bytes, tuple[dict, float]]] = {}
+        self._tenant_of: dict[bytes, str] = {}
+        self._by_subject: dict[str, set[bytes]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tenant_of)
+
+    def tenant_size(self, tenant_id) -> int:
+        return len(self._tenants.get(str(tenant_id), ()))
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        :return: Optional[dict]: Claims ранее проверенного токена или None
+        """
+        if not self.max_entries:
+            return None
+        key = self._digest(token)
+        tenant = self._tenant_of.get(key)
+        if tenant is None:
+            token_cache_requests.inc(result="miss")
+            return None
+        entries = self._tenants[tenant]
+        claims, exp = entries[key]
+        if exp <= self.clock():
+            self._remove(key)
+            token_cache_requests.inc(result="expired")
+            return None
+        entries.move_to_end(key)
+        token_cache_requests.inc(result="hit")
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        """Запоминает claims токена, подпись которого уже проверена"""
+        exp = claims.get("exp")
+        if not self.max_entries or not isinstance(exp, (int, float)):
+            return
+        key = self._digest(token)
+        if key in self._tenant_of:
+            self._remove(key)
+        tenant = str(claims.get("tid"))
+        entries = self._tenants.setdefault(tenant, OrderedDict())
+        if len(entries) >= self.max_per_tenant:
+            self._remove(next(iter(entries)))
+        elif len(self._tenant_of) >= self.max_entries:
+            largest = max(self._tenants.values(), key=len)
+            self._remove(next(iter(largest)))
+        # Раздел мог быть удалён вместе с последней записью
+        entries = self._tenants.setdefault(tenant, entries)
+        entries[key] = (claims, exp)
+        self._tenant_of[key] = tenant
+        self._by_subject.setdefault(str(claims.get("sub")), set()).add(key)
+
+    def invalidate_subject(self, subject) -> int:
+        """
+        Удаляет записи всех токенов пользователя.
+        :return: int: Число удалённых записей
+        """
+        keys = list(self._by_subject.get(str(subject), ()))
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def _remove(self, key: bytes) -> None:
+        tenant = self._tenant_of.pop(key)
+        entries = self._tenants[tenant]
+        claims, _ = entries.pop(key)
+        if not entries:
+            del self._tenants[tenant]
+        subject = str(claims.get("sub"))
+        keys = self._by_subject.get(subject)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[subject]
@@ -0,0 +1,64 @@
+import importlib
+import inspect
+import logging
+from typing import Awaitable, Callable, Union
+
+logger = logging.getLogger("app.worker")
+
+Hook = Callable[[], Union[None, Awaitable[None]]]
+
+
+def resolve(path: str) -> Hook:
+    """
+    :param path: Ссылка вида "package.module:function"
+    :return: Hook: Найденная функция
+    """
+    module_name, _, attr = path.partition(":")
+    if not attr:
+        raise ValueError(f"Ожидалось 'module:function', получено {path!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class WorkerHooks:
+    """
+    Инициализация и завершение процесса-воркера.
+    С несколькими воркерами каждый процесс сам выполняет lifespan приложения,
+    поэтому пулы, кэши и фоновые задачи создаются в каждом воркере отдельно.
+    Хуки выполняются в порядке регистрации, при остановке — в обратном;
+    ошибка хука остановки не мешает остальным.
+    """
+
+    def __init__(self) -> None:
+        self._startup: list[Hook] = []
+        self._shutdown: list[Hook] = []
+
+    def on_startup(self, hook: Hook) -> Hook:
+        self._startup.append(hook)
+        return hook
+
+    def on_shutdown(self, hook: Hook) -> Hook:
+        self._shutdown.append(hook)
+        return hook
+
+    def load(self, paths: list[str]) -> None:
+        """Регистрирует хуки старта из настроек (APP_CONFIG__RUN__WORKER_INIT)"""
+        for path in paths:
+            self.on_startup(resolve(path))
+
+    async def startup(self) -> None:
+        for hook in self._startup:
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
+
+    async def shutdown(self) -> None:
+        for hook in reversed(self._shutdown):
+            try:
+                result = hook()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Ошибка при остановке воркера: %r", hook)
+
+
+worker = WorkerHooks()
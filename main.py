@@ -1,20 +1,63 @@
+import os
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from config import settings
 from core.db_helper import db_helper
+from core.deadline import DeadlineExceeded
+from core.health import ReadinessProbe
+from core.metrics import http_requests_rejected, registry
+from core.profiling import ProfiledRoute, profiler
+from core.worker import worker
+from middleware.admission import AdmissionControlMiddleware
+from middleware.deadline import DeadlineMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.profiling import ProfilingMiddleware
+from middleware.query_stats import QueryStatsMiddleware
+from middleware.read_your_writes import ReadYourWritesMiddleware
 from routes import admin, auth, mock_resourses
+from services.api_keys import last_used
+from services.audit_log import audit_log
+from services.auth_service import AuthService, pwd_context
+from services.password_hashing import PasswordHashing
+from services.refresh_token_writer import refresh_writer
+
+readiness = ReadinessProbe(
+    lambda: db_helper.ping(settings.db.ping_timeout),
+    interval=settings.db.ping_interval,
+)
+
+# Фоновые задачи записи — свои в каждом воркере
+worker.on_startup(refresh_writer.start)
+worker.on_shutdown(refresh_writer.stop)
+worker.on_startup(audit_log.start)
+worker.on_shutdown(audit_log.stop)
+worker.on_startup(last_used.start)
+worker.on_shutdown(last_used.stop)
+worker.load(settings.run.worker_init)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения"""
-    print("🚀 Приложение запущено. Подключение к БД готово.")
+    opened = await db_helper.warmup(settings.db.warmup_connections)
+    print(f"🔑 Хеширование паролей: {PasswordHashing.configure(pwd_context)}")
+    AuthService.warmup()
+    await worker.startup()
+    readiness.mark_started()
+    print(
+        f"🚀 Приложение запущено (pid {os.getpid()}). "
+        f"Открыто соединений с БД: {opened}."
+    )
     try:
         yield
     finally:
+        readiness.mark_stopped()
+        await worker.shutdown()
         await db_helper.dispose()
         print("🔌 Соединение с БД закрыто.")
 
@@ -39,6 +82,7 @@ app = FastAPI(
     """,
     version="1.0.0",
 )
+app.router.route_class = ProfiledRoute
 
 
 app.add_middleware(
@@ -49,6 +93,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    DeadlineMiddleware,
+    default_timeout_ms=settings.deadline.default_timeout_ms,
+    max_timeout_ms=settings.deadline.max_timeout_ms,
+    header=settings.deadline.header,
+)
+
+if settings.db.max_pool_waiters:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        waiters=lambda: db_helper.pool_waiters,
+        max_waiters=settings.db.max_pool_waiters,
+    )
+
+app.add_middleware(MetricsMiddleware)
+
+if db_helper.replicas:
+    app.add_middleware(
+        ReadYourWritesMiddleware, window=settings.db.read_your_writes_window
+    )
+
+if settings.run.debug:
+    app.add_middleware(QueryStatsMiddleware)
+
+if settings.profiling.enabled:
+    app.add_middleware(
+        ProfilingMiddleware, profiler=profiler, header=settings.profiling.header
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """Срок запроса истёк в ожидании соединения или выполнении SQL"""
+    http_requests_rejected.inc(reason="deadline")
+    return JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+
 
 app.include_router(auth.router)
 app.include_router(admin.router)
@@ -78,8 +158,40 @@ async def root():
 @app.get("/health", tags=["Root"])
 async def health():
     """Health check endpoint"""
-    return {"status": "healthy", "database": "connected"}
+    database_ok = await readiness.database_ok()
+    return JSONResponse(
+        {
+            "status": "healthy" if database_ok else "unhealthy",
+            "database": "connected" if database_ok else "unavailable",
+        },
+        status_code=200 if database_ok else 503,
+    )
+
+
+@app.get("/livez", tags=["Root"])
+async def livez():
+    """Liveness probe: процесс жив и обслуживает запросы"""
+    return {"status": "alive"}
+
+
+@app.get("/readyz", tags=["Root"])
+async def readyz():
+    """Readiness probe: прогрев завершён и БД отвечает"""
+    ready = await readiness.ready()
+    return JSONResponse(
+        {"status": "ready" if ready else "not ready"},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse)
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # Режим разработки; в production — python server.py
+    uvicorn.run("main:app", host=settings.run.host, port=settings.run.port, reload=True)
@@ -0,0 +1,46 @@
+from typing import Callable
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.metrics import http_requests_rejected
+
+
+class AdmissionControlMiddleware:
+    """
+    Сразу отвечает 503, если очередь ожидания соединений из пула длиннее
+    max_waiters: новый запрос всё равно не дождался бы соединения вовремя,
+    а его ожидание увеличило бы задержку остальных.
+    Пробы и метрики не отклоняются.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        waiters: Callable[[], int],
+        max_waiters: int,
+        retry_after: int = 1,
+        exempt_paths: tuple[str, ...] = ("/livez", "/readyz", "/health", "/metrics"),
+    ) -> None:
+        self.app = app
+        self.waiters = waiters
+        self.max_waiters = max_waiters
+        self.retry_after = retry_after
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"] in self.exempt_paths
+            or self.waiters() < self.max_waiters
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        http_requests_rejected.inc(reason="pool_saturated")
+        response = JSONResponse(
+            {"detail": "Service overloaded, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.deadline import Deadline, reset_deadline, set_deadline
+from core.metrics import http_requests_rejected
+
+
+class DeadlineMiddleware:
+    """
+    Назначает запросу срок: из заголовка (миллисекунды, не больше max_timeout_ms)
+    или default_timeout_ms. Срок ограничивает ожидание соединения из пула и
+    statement_timeout транзакций; если он истёк до начала ответа, клиент
+    получает 504 и обработка запроса прекращается.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_timeout_ms: int = 0,
+        max_timeout_ms: int = 60000,
+        header: str = "X-Request-Timeout-Ms",
+    ) -> None:
+        self.app = app
+        self.default_timeout_ms = default_timeout_ms
+        self.max_timeout_ms = max_timeout_ms
+        self.header = header
+
+    def _deadline(self, scope: Scope) -> Optional[Deadline]:
+        value = Headers(scope=scope).get(self.header)
+        if value is not None:
+            try:
+                timeout_ms = min(int(value), self.max_timeout_ms)
+                return Deadline(max(timeout_ms, 0) / 1000, explicit=True)
+            except ValueError:
+                pass
+        if self.default_timeout_ms:
+            return Deadline(self.default_timeout_ms / 1000)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = self._deadline(scope)
+        if deadline is None:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        token = set_deadline(deadline)
+        try:
+            await asyncio.wait_for(
+                self.app(scope, receive, send_wrapper), max(deadline.remaining(), 0)
+            )
+        except asyncio.TimeoutError:
+            if response_started:
+                raise
+            http_requests_rejected.inc(reason="deadline")
+            response = JSONResponse({"detail": "Request deadline exceeded"}, 504)
+            await response(scope, receive, send)
+        finally:
+            reset_deadline(token)
@@ -0,0 +1,44 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import http_request_duration, http_requests, http_requests_in_flight
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики HTTP-запросов: число запросов в обработке,
+    длительность и статус по шаблону маршрута (/projects/{project_id}).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # FastAPI кладёт найденный маршрут в scope; шаблон вместо пути
+            # не даёт кардинальности меток расти с числом id
+            route = scope.get("route")
+            template = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            http_request_duration.observe(
+                time.perf_counter() - started, method=method, route=template
+            )
+            http_requests.inc(method=method, route=template, status=str(status_code))
@@ -2,37 +2,89 @@ from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import JWTError, jwt
+from jose import JWTError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from config import settings
 from core.db_helper import db_helper
-from core.models import User
+from core.models import DEFAULT_TENANT_ID, Role, User, UserRole
+from core.principal import Principal
+from core.profiling import span
+from core.singleflight import SingleFlight
+from services.api_keys import ApiKeyService
+from services.auth_service import AuthService
 
 # Bearer схема для получения токена из заголовка Authorization
 security = HTTPBearer()
 
+# Параллельные запросы с одним токеном загружают пользователя один раз
+principal_loads = SingleFlight("principal")
+
+
+async def _load_principal(user_id: int, session: AsyncSession) -> Optional[Principal]:
+    """Пользователь и его роли одним запросом, без ORM-объектов"""
+    stmt = (
+        select(
+            User.id,
+            User.tenant_id,
+            User.email,
+            User.is_active,
+            User.created_at,
+            Role.id.label("role_id"),
+            Role.name.label("role_name"),
+        )
+        .outerjoin(UserRole, UserRole.user_id == User.id)
+        .outerjoin(Role, Role.id == UserRole.role_id)
+        .where(User.id == user_id)
+        .order_by(Role.id)
+    )
+    rows = (await session.execute(stmt)).all()
+    if not rows:
+        return None
+    roles = [(row.role_id, row.role_name) for row in rows if row.role_id is not None]
+    first = rows[0]
+    return Principal(
+        id=first.id,
+        tenant_id=first.tenant_id,
+        email=first.email,
+        is_active=first.is_active,
+        created_at=first.created_at,
+        role_ids=frozenset(role_id for role_id, _ in roles),
+        role_names=tuple(name for _, name in roles),
+    )
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: AsyncSession = Depends(db_helper.session_getter),
-) -> User:
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+) -> Principal:
     """
-    Dependency для получения текущего пользователя из JWT токена.
+    Dependency для получения текущего пользователя из JWT токена
+    или API-ключа (Bearer ak_...).
+    Возвращает неизменяемый Principal, не привязанный к сессии.
 
     Использование:
         @router.get("/protected")
-        async def protected_route(current_user: User = Depends(get_current_user)):
+        async def protected_route(current_user: Principal = Depends(get_current_user)):
             return {"user_id": current_user.id}
     """
     token = credentials.credentials
 
+    if ApiKeyService.is_api_key(token):
+        with span("api_key_verify"):
+            user = await ApiKeyService.authenticate(token, session)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key"
+            )
+        if not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive"
+            )
+        return user
+
     try:
-        payload = jwt.decode(
-            token, settings.auth.secret_key, algorithms=[settings.auth.algorithm]
-        )
+        payload = AuthService.decode_access_token(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(
@@ -44,15 +96,25 @@ async def get_current_user(
             detail="Could not validate credentials",
         )
 
-    stmt = select(User).options(selectinload(User.roles)).where(User.id == int(user_id))
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+    # Движок в ключе: запрос, читающий с primary, не получит данные реплики
+    with span("user_load"):
+        user = await principal_loads.do(
+            (int(user_id), session.bind),
+            lambda: _load_principal(int(user_id), session),
+        )
 
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
         )
 
+    # Токены, выданные до появления арендаторов, не содержат tid
+    if payload.get("tid", DEFAULT_TENANT_ID) != user.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="User is inactive"
@@ -61,20 +123,37 @@ async def get_current_user(
     return user
 
 
-async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+async def require_admin(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     """
     Dependency для проверки, что пользователь — админ.
 
     Использование:
         @router.get("/admin-only")
-        async def admin_route(admin: User = Depends(require_admin)):
+        async def admin_route(admin: Principal = Depends(require_admin)):
             return {"message": "Admin access granted"}
     """
-    role_names = [role.name for role in current_user.roles]
-
-    if "admin" not in role_names:
+    if not current_user.has_role("admin"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
         )
 
     return current_user
+
+
+async def require_platform_admin(
+    current_user: Principal = Depends(require_admin),
+) -> Principal:
+    """
+    Dependency для глобальных справочников (ресурсы business_elements):
+    админ арендатора платформы (DEFAULT_TENANT_ID). Админы остальных
+    арендаторов управляют только данными своего арендатора.
+    """
+    if current_user.tenant_id != DEFAULT_TENANT_ID:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Platform admin access required",
+        )
+
+    return current_user
@@ -0,0 +1,76 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.profiling import (
+    Profiler,
+    RequestProfile,
+    StackSampler,
+    profile_request,
+)
+from core.query_stats import track_queries
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование отдельных запросов по требованию.
+    Запрос профилируется, если несёт подписанный заголовок (header) или
+    попал в долю sample_rate. Для него собираются участки (span) —
+    token_decode, user_load, permission_check, handler, serialize, db —
+    и стеки event loop; профиль попадает в кольцевой буфер Profiler,
+    а его id — в заголовок ответа X-Profile-Id.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: Profiler, header: str) -> None:
+        self.app = app
+        self.profiler = profiler
+        self.header = header.lower().encode()
+
+    def _header_value(self, scope: Scope):
+        for name, value in scope["headers"]:
+            if name == self.header:
+                return value.decode("latin-1")
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self.profiler.trigger(self._header_value(scope))
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], trigger=trigger)
+        sampler = StackSampler(self.profiler.stack_interval)
+        sampling = sampler.start()
+        started = time.perf_counter()
+        response_started = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = time.perf_counter()
+                profile.status = message["status"]
+                if profile.handler_finished is not None:
+                    profile.add_span(
+                        "serialize", response_started - profile.handler_finished
+                    )
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile.id
+            await send(message)
+
+        try:
+            with profile_request(profile), track_queries() as stats:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            if sampling:
+                profile.stacks = sampler.stop()
+                profile.stack_interval_ms = self.profiler.stack_interval * 1000
+            profile.duration_ms = (finished - started) * 1000
+            if response_started is not None:
+                profile.add_span("send", finished - response_started)
+            profile.add_span("db", stats.total_time)
+            profile.db_queries = stats.count
+            self.profiler.buffer.add(profile)
@@ -0,0 +1,48 @@
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.query_stats import track_queries
+
+logger = logging.getLogger("app.db")
+
+
+class QueryStatsMiddleware:
+    """
+    Считает SQL-запросы и время в БД для каждого HTTP-запроса.
+    Результат добавляется в заголовки X-DB-Query-Count / X-DB-Time-Ms
+    и в лог. Подключается только в debug-режиме.
+    """
+
+    def __init__(self, app: ASGIApp, repeat_threshold: int = 2) -> None:
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers["X-DB-Query-Count"] = str(stats.count)
+                    headers["X-DB-Time-Ms"] = f"{stats.total_ms:.2f}"
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        repeated = stats.repeated(self.repeat_threshold)
+        logger.info(
+            "%s %s db_queries=%d db_time_ms=%.2f repeated=%d",
+            scope["method"],
+            scope["path"],
+            stats.count,
+            stats.total_ms,
+            len(repeated),
+        )
+        for sql, n in repeated.items():
+            logger.warning("Повторяющийся запрос (%d раз): %s", n, sql)
@@ -0,0 +1,47 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.db_helper import (
+    READ_YOUR_WRITES_COOKIE,
+    READ_YOUR_WRITES_HEADER,
+    reset_write_tracking,
+    track_writes,
+)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Если запрос сделал commit на primary, отдаёт клиенту отметку времени
+    (cookie и заголовок), до которой его чтения направляются на primary.
+    Нужен только при настроенных репликах.
+    """
+
+    def __init__(self, app: ASGIApp, window: float) -> None:
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker, token = track_writes()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and tracker.committed:
+                until = f"{time.time() + self.window:.3f}"
+                headers = MutableHeaders(scope=message)
+                headers[READ_YOUR_WRITES_HEADER] = until
+                headers.append(
+                    "Set-Cookie",
+                    f"{READ_YOUR_WRITES_COOKIE}={until}; Max-Age={int(self.window) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_write_tracking(token)
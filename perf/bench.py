@@ -0,0 +1,436 @@
+"""
+Микро-бенчмарки горячих путей AuthService и AuthorizationService.
+Запуск:
+    python -m perf.bench                              # БД заглушена
+    python -m perf.bench --db --email admin@test.com  # локальная БД
+    python -m perf.bench --statement-cache            # кэш asyncpg вкл/выкл
+    python -m perf.bench --save default               # сохранить baseline
+    python -m perf.bench --compare default            # сравнить с baseline
+
+Baseline хранится в perf/baselines/<name>.json. При сравнении операции,
+ставшие медленнее больше чем на --tolerance, помечаются, код выхода 1.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+from config import settings
+from core.models import AccessRule, BusinessElement, User
+from core.principal import RULE_COLUMNS, Principal
+from middleware.permissions import _load_principal, get_current_user
+from services.auth_service import AuthService
+from services.authz_service import AuthorizationService
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+RULE_COUNTS = (1, 10, 100, 1000)
+
+
+class StubResult:
+    """Минимальная замена Result SQLAlchemy поверх списка строк"""
+
+    def __init__(self, rows: list) -> None:
+        self._rows = rows
+
+    def _scalar(self, row: Any) -> Any:
+        return row[0] if isinstance(row, tuple) else row
+
+    def scalars(self) -> "StubResult":
+        return StubResult([self._scalar(row) for row in self._rows])
+
+    def all(self) -> list:
+        return list(self._rows)
+
+    def first(self) -> Any:
+        return self._rows[0] if self._rows else None
+
+    def one(self) -> Any:
+        return self._rows[0]
+
+    def scalar_one(self) -> Any:
+        return self._scalar(self._rows[0])
+
+    def scalar_one_or_none(self) -> Any:
+        return self._scalar(self._rows[0]) if self._rows else None
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class StubSession:
+    """
+    Заглушка AsyncSession: отдаёт заранее подготовленные строки
+    по сущности, которую выбирает запрос.
+    """
+
+    bind = None
+
+    def __init__(self, data: dict[type, list]) -> None:
+        self.data = data
+
+    async def execute(self, stmt, *args, **kwargs) -> StubResult:
+        desc = stmt.column_descriptions[0]
+        entity = desc.get("entity")
+        # select(Model.column, ...) — отдельный набор строк-кортежей
+        key = entity if desc.get("expr") is entity else (entity, "columns")
+        return StubResult(self.data.get(key, []))
+
+    async def get(self, entity, ident):
+        return next((obj for obj in self.data.get(entity, []) if obj.id == ident), None)
+
+
+def make_stub_data(rule_count: int) -> tuple[Principal, dict]:
+    """Пользователь с rule_count ролями и по одному правилу на роль"""
+    element = BusinessElement(id=1, name="projects")
+    roles = [SimpleNamespace(id=i, name=f"role_{i}") for i in range(1, rule_count + 1)]
+    rules = [
+        AccessRule(
+            id=i,
+            role_id=role.id,
+            element_id=element.id,
+            element=element,
+            read_permission=True,
+            read_all_permission=False,
+            create_permission=False,
+            update_permission=False,
+            update_all_permission=False,
+            delete_permission=False,
+            # Разрешающее правило последним — худший случай для перебора
+            delete_all_permission=i == rule_count,
+        )
+        for i, role in enumerate(roles, start=1)
+    ]
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    user = Principal(
+        id=1,
+        tenant_id=1,
+        email="bench@test.com",
+        is_active=True,
+        created_at=created_at,
+        role_ids=frozenset(role.id for role in roles),
+        role_names=tuple(role.name for role in roles),
+    )
+    principal_rows = [
+        SimpleNamespace(
+            id=user.id,
+            tenant_id=user.tenant_id,
+            email=user.email,
+            is_active=True,
+            created_at=created_at,
+            role_id=role.id,
+            role_name=role.name,
+        )
+        for role in roles
+    ]
+    flag_rows = [
+        tuple(getattr(rule, column) for _, column in RULE_COLUMNS) for rule in rules
+    ]
+    return user, {
+        BusinessElement: [element],
+        AccessRule: rules,
+        (AccessRule, "columns"): flag_rows,
+        (User, "columns"): principal_rows,
+    }
+
+
+class Bench:
+    """Замер одной операции: лучший и медианный раунд, в микросекундах"""
+
+    def __init__(self, rounds: int, min_time: float) -> None:
+        self.rounds = rounds
+        self.min_time = min_time
+        self.results: dict[str, dict] = {}
+
+    async def run(self, name: str, fn: Callable[[], Any]) -> None:
+        is_async = asyncio.iscoroutinefunction(fn)
+
+        async def once() -> None:
+            result = fn()
+            if is_async:
+                await result
+
+        # Калибровка: подбираем число итераций на раунд под min_time
+        number = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(number):
+                await once()
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.min_time or number >= 1_000_000:
+                break
+            number *= 10 if elapsed < self.min_time / 10 else 2
+
+        timings = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            for _ in range(number):
+                await once()
+            timings.append((time.perf_counter() - started) / number * 1e6)
+
+        self.results[name] = {
+            "best_us": round(min(timings), 3),
+            "median_us": round(statistics.median(timings), 3),
+            "iterations": number,
+            "rounds": self.rounds,
+        }
+        print(f"  {name:<45} {self.results[name]['median_us']:>12.2f} µs")
+
+
+async def collect(args: argparse.Namespace) -> dict[str, dict]:
+    bench = Bench(rounds=args.rounds, min_time=args.min_time)
+
+    password = "benchmark-password"
+    pass_hash = AuthService.get_password_hash(password)
+    access_token = AuthService.create_access_token({"sub": "1"})
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=access_token
+    )
+
+    await bench.run(
+        "auth.get_password_hash", lambda: AuthService.get_password_hash(password)
+    )
+    await bench.run(
+        "auth.verify_password", lambda: AuthService.verify_password(password, pass_hash)
+    )
+    await bench.run(
+        "auth.create_access_token",
+        lambda: AuthService.create_access_token({"sub": "1"}),
+    )
+    await bench.run(
+        "auth.create_refresh_token", lambda: AuthService.create_refresh_token(1)
+    )
+    await bench.run(
+        "auth.jwt_decode",
+        lambda: jwt.decode(
+            access_token, settings.auth.secret_key, algorithms=[settings.auth.algorithm]
+        ),
+    )
+    AuthService.decode_access_token(access_token)
+    await bench.run(
+        "auth.decode_access_token[cached]",
+        lambda: AuthService.decode_access_token(access_token),
+    )
+
+    if args.statement_cache:
+        await collect_statement_cache(
+            bench, args.email, settings.db.prepared_statement_cache_size or 100
+        )
+        return bench.results
+
+    if args.db:
+        await collect_db(bench, args.email)
+        return bench.results
+
+    for count in RULE_COUNTS:
+        user, data = make_stub_data(count)
+        session = StubSession(data)
+        if count == 1:
+
+            async def current_user():
+                await get_current_user(credentials=credentials, session=session)
+
+            await bench.run("authz.get_current_user[stub]", current_user)
+
+        async def check():
+            await AuthorizationService.check_permission(
+                user=user, element_name="projects", action="delete", session=session
+            )
+
+        async def permissions():
+            await AuthorizationService.get_user_permissions(user, session)
+
+        await bench.run(f"authz.check_permission[rules={count}]", check)
+        await bench.run(f"authz.get_user_permissions[rules={count}]", permissions)
+
+    return bench.results
+
+
+async def collect_db(bench: Bench, email: str) -> None:
+    """Замеры с реальной БД (данные — seed_data.py или perf.datagen)"""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from core.db_helper import db_helper
+
+    async with db_helper.session_factory() as session:
+        user = (
+            await session.execute(
+                select(User)
+                .options(selectinload(User.roles))
+                .where(User.email == email)
+            )
+        ).scalar_one_or_none()
+        if user is None:
+            raise SystemExit(f"Пользователь {email} не найден")
+        principal = await _load_principal(user.id, session)
+        token = AuthService.create_access_token(
+            {"sub": str(user.id), "tid": user.tenant_id}
+        )
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        rules = len(
+            (
+                await session.execute(
+                    select(AccessRule).where(
+                        AccessRule.role_id.in_([r.id for r in user.roles])
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+        async def current_user():
+            await get_current_user(credentials=credentials, session=session)
+
+        async def check():
+            await AuthorizationService.check_permission(
+                user=principal,
+                element_name="projects",
+                action="delete",
+                session=session,
+            )
+
+        async def permissions():
+            await AuthorizationService.get_user_permissions(principal, session)
+
+        await bench.run("authz.get_current_user[db]", current_user)
+        await bench.run(f"authz.check_permission[db,rules={rules}]", check)
+        await bench.run(f"authz.get_user_permissions[db,rules={rules}]", permissions)
+    await db_helper.dispose()
+
+
+async def collect_statement_cache(bench: Bench, email: str, cache_size: int) -> None:
+    """
+    Горячие запросы (загрузка пользователя с ролями, правила по ролям)
+    с кэшем подготовленных запросов asyncpg и без него.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from core.db_helper import DatabaseHelper
+
+    for size in (0, cache_size):
+        helper = DatabaseHelper(
+            url=settings.db.url,
+            pool_size=1,
+            max_overflow=0,
+            prepared_statement_cache_size=size,
+        )
+        async with helper.session_factory() as session:
+            user = (
+                await session.execute(
+                    select(User)
+                    .options(selectinload(User.roles))
+                    .where(User.email == email)
+                )
+            ).scalar_one_or_none()
+            if user is None:
+                raise SystemExit(f"Пользователь {email} не найден")
+            role_ids = frozenset(role.id for role in user.roles)
+
+            async def principal_load():
+                await _load_principal(user.id, session)
+
+            async def rule_load():
+                await AuthorizationService._load_rules(
+                    user.tenant_id, role_ids, "projects", session
+                )
+
+            await bench.run(f"db.principal_load[stmt_cache={size}]", principal_load)
+            await bench.run(f"db.rule_load[stmt_cache={size}]", rule_load)
+        await helper.dispose()
+
+
+def compare(
+    current: dict[str, dict], baseline: dict[str, dict], tolerance: float
+) -> list[str]:
+    """
+    Печатает сравнение с baseline.
+    :return: list[str]: Операции, замедлившиеся больше чем на tolerance
+    """
+    regressions = []
+    print(f"\n{'operation':<45} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, result in current.items():
+        ref = baseline.get(name)
+        if ref is None:
+            print(f"{name:<45} {'—':>12} {result['best_us']:>12.2f} {'new':>8}")
+            continue
+        # Сравниваем лучшие раунды: они меньше всего зависят от шума
+        ratio = result["best_us"] / ref["best_us"] if ref["best_us"] else 1.0
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark = " ❌"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            mark = " ✅"
+        print(
+            f"{name:<45} {ref['best_us']:>12.2f} {result['best_us']:>12.2f} "
+            f"{ratio:>7.2f}x{mark}"
+        )
+    return regressions
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Микро-бенчмарки сервисов")
+    parser.add_argument("--db", action="store_true", help="Использовать локальную БД")
+    parser.add_argument(
+        "--statement-cache",
+        action="store_true",
+        help="Горячие запросы к БД с кэшем подготовленных запросов и без",
+    )
+    parser.add_argument(
+        "--email", default="admin@test.com", help="Пользователь для --db"
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Минимум секунд на раунд"
+    )
+    parser.add_argument("--save", metavar="NAME", help="Сохранить baseline")
+    parser.add_argument("--compare", metavar="NAME", help="Сравнить с baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    print("Running benchmarks...")
+    results = asyncio.run(collect(args))
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Baseline сохранён: {baseline_path(args.save)}")
+
+    if args.compare:
+        with open(baseline_path(args.compare), encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования.
+Запуск: python -m perf.datagen --users 100000 --roles 50 --elements 200 \
+    --rule-density 0.2 --projects-per-user 5 --seed 42 [--truncate]
+
+Данные детерминированы по seed (кроме соли в хеше пароля): одинаковые параметры
+дают одинаковые email, роли, правила и проекты. Все пользователи получают один
+пароль (--password), его хеш вычисляется один раз. Первые --admins пользователей
+получают роль admin. Загрузка идёт через COPY пачками по --batch-size строк.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlalchemy import text
+
+from core.db_helper import db_helper
+from core.models import DEFAULT_TENANT_ID
+from services.auth_service import AuthService
+
+PERMISSION_COLUMNS = (
+    "read_permission",
+    "read_all_permission",
+    "create_permission",
+    "update_permission",
+    "update_all_permission",
+    "delete_permission",
+    "delete_all_permission",
+)
+
+TABLES = (
+    "access_rules",
+    "user_roles",
+    "refresh_tokens",
+    "projects",
+    "users",
+    "business_elements",
+    "roles",
+)
+
+
+@dataclass
+class DataGenConfig:
+    users: int = 1000
+    roles: int = 10
+    elements: int = 20
+    rule_density: float = 0.3
+    projects_per_user: int = 3
+    roles_per_user: int = 2
+    admins: int = 1
+    seed: int = 42
+    password: str = "loadtest123"
+    batch_size: int = 10000
+    truncate: bool = False
+
+
+def user_email(index: int) -> str:
+    """Email синтетического пользователя по его номеру"""
+    return f"user{index}@load.test"
+
+
+def _batches(records: Iterator[tuple], size: int) -> Iterator[list[tuple]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class DataGenerator:
+    """
+    Генерирует роли, бизнес-элементы, правила, пользователей и проекты.
+    ID назначаются явно начиная с текущего max(id) + 1, после загрузки
+    последовательности сдвигаются через setval.
+    """
+
+    def __init__(self, config: DataGenConfig) -> None:
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.counts: dict[str, int] = {}
+
+    async def _next_id(self, conn, table: str) -> int:
+        return await conn.fetchval(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")
+
+    async def _copy(
+        self, conn, table: str, columns: list[str], records: Iterator[tuple]
+    ) -> None:
+        total = 0
+        started = time.perf_counter()
+        for batch in _batches(records, self.config.batch_size):
+            await conn.copy_records_to_table(table, records=batch, columns=columns)
+            total += len(batch)
+        self.counts[table] = total
+        elapsed = time.perf_counter() - started
+        print(f"  {table}: {total} строк за {elapsed:.1f} с")
+
+    async def _sync_sequence(self, conn, table: str) -> None:
+        await conn.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT coalesce(max(id), 1) FROM {table}))"
+        )
+
+    async def _admin_role_id(self, conn) -> int:
+        # Синтетические данные создаются в арендаторе по умолчанию
+        role_id = await conn.fetchval(
+            "SELECT id FROM roles WHERE tenant_id = $1 AND name = 'admin'",
+            DEFAULT_TENANT_ID,
+        )
+        if role_id is None:
+            role_id = await conn.fetchval(
+                "INSERT INTO roles (name, description) "
+                "VALUES ('admin', 'Полный доступ ко всем ресурсам') RETURNING id"
+            )
+        return role_id
+
+    async def generate(self, conn) -> dict[str, int]:
+        """
+        Генерирует и загружает данные в рамках одной транзакции.
+        :param conn: Сырое соединение asyncpg
+        :return: dict[str, int]: Число строк по таблицам
+        """
+        cfg, rng = self.config, self.rng
+
+        if cfg.truncate:
+            await conn.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+        role_base = await self._next_id(conn, "roles")
+        role_ids = list(range(role_base, role_base + cfg.roles))
+        await self._copy(
+            conn,
+            "roles",
+            ["id", "name", "description"],
+            ((rid, f"role_{rid}", "Синтетическая роль") for rid in role_ids),
+        )
+        await self._sync_sequence(conn, "roles")
+
+        # Первый элемент — projects, чтобы правила действовали на /projects
+        element_base = await self._next_id(conn, "business_elements")
+        element_ids = list(range(element_base, element_base + cfg.elements))
+        has_projects = await conn.fetchval(
+            "SELECT id FROM business_elements WHERE name = 'projects'"
+        )
+        element_names = {
+            eid: ("projects" if i == 0 and has_projects is None else f"element_{eid}")
+            for i, eid in enumerate(element_ids)
+        }
+        await self._copy(
+            conn,
+            "business_elements",
+            ["id", "name", "description"],
+            ((eid, element_names[eid], "Синтетический ресурс") for eid in element_ids),
+        )
+        await self._sync_sequence(conn, "business_elements")
+        if has_projects is not None:
+            element_ids.insert(0, has_projects)
+
+        def rules() -> Iterator[tuple]:
+            for rid in role_ids:
+                for eid in element_ids:
+                    if rng.random() < cfg.rule_density:
+                        yield (rid, eid) + tuple(
+                            rng.random() < 0.5 for _ in PERMISSION_COLUMNS
+                        )
+
+        await self._copy(
+            conn,
+            "access_rules",
+            ["role_id", "element_id", *PERMISSION_COLUMNS],
+            rules(),
+        )
+
+        pass_hash = AuthService.get_password_hash(cfg.password)
+        user_base = await self._next_id(conn, "users")
+        await self._copy(
+            conn,
+            "users",
+            ["id", "email", "pass_hash", "is_active"],
+            ((user_base + i, user_email(i), pass_hash, True) for i in range(cfg.users)),
+        )
+        await self._sync_sequence(conn, "users")
+
+        admin_role = await self._admin_role_id(conn) if cfg.admins else None
+        per_user = min(cfg.roles_per_user, len(role_ids))
+
+        def user_roles() -> Iterator[tuple]:
+            for i in range(cfg.users):
+                uid = user_base + i
+                if i < cfg.admins:
+                    yield uid, admin_role
+                if per_user:
+                    for rid in rng.sample(role_ids, rng.randint(1, per_user)):
+                        yield uid, rid
+
+        await self._copy(conn, "user_roles", ["user_id", "role_id"], user_roles())
+
+        def projects() -> Iterator[tuple]:
+            for i in range(cfg.users):
+                for n in range(cfg.projects_per_user):
+                    yield (
+                        f"Project {n} of user {i}",
+                        f"Synthetic project #{rng.randrange(10**9)}",
+                        user_base + i,
+                    )
+
+        await self._copy(
+            conn, "projects", ["title", "description", "owner_id"], projects()
+        )
+
+        return self.counts
+
+
+async def generate(config: DataGenConfig) -> dict[str, int]:
+    """Генерирует данные в БД из настроек приложения"""
+    print("Generating synthetic data...")
+    started = time.perf_counter()
+    async with db_helper.engine.begin() as connection:
+        raw = await connection.get_raw_connection()
+        counts = await DataGenerator(config).generate(raw.driver_connection)
+        await connection.execute(text("ANALYZE"))
+    await db_helper.dispose()
+    print(f"✅ Готово за {time.perf_counter() - started:.1f} с")
+    return counts
+
+
+def parse_args(argv=None) -> DataGenConfig:
+    defaults = DataGenConfig()
+    parser = argparse.ArgumentParser(description="Генератор синтетических данных")
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--roles", type=int, default=defaults.roles)
+    parser.add_argument("--elements", type=int, default=defaults.elements)
+    parser.add_argument("--rule-density", type=float, default=defaults.rule_density)
+    parser.add_argument(
+        "--projects-per-user", type=int, default=defaults.projects_per_user
+    )
+    parser.add_argument("--roles-per-user", type=int, default=defaults.roles_per_user)
+    parser.add_argument("--admins", type=int, default=defaults.admins)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--password", default=defaults.password)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument(
+        "--truncate", action="store_true", help="Очистить таблицы перед генерацией"
+    )
+    return DataGenConfig(**vars(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    asyncio.run(generate(parse_args()))
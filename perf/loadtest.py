@@ -0,0 +1,412 @@
+"""
+Нагрузочное тестирование API.
+Запуск:
+    python -m perf.loadtest --scenario project_reads --concurrency 50 --duration 30
+    python -m perf.loadtest --target http://localhost:8000 --scenario login_storm
+    python -m perf.loadtest --scenario all --out result.json --compare baseline.json
+
+--target asgi (по умолчанию) гоняет main.app в процессе через ASGITransport,
+URL — работающий uvicorn. Отчёт печатается в JSON: RPS, p50/p95/p99 и доля
+ошибок по каждой операции. --compare завершает процесс с кодом 1, если p95 или
+RPS хуже базового отчёта больше чем на --tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+
+from httpx import ASGITransport, AsyncClient, Response
+
+from perf.datagen import user_email
+
+FIXTURE_ACCOUNTS = {
+    "admin": ("admin@test.com", "admin123"),
+    "manager": ("manager@test.com", "manager123"),
+    "user": ("user@test.com", "user123"),
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Перцентиль по методу ближайшего ранга (values должен быть отсортирован)"""
+    if not values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+@dataclass
+class Stats:
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+
+    def record(self, latency: float, status: Optional[int], ok: bool) -> None:
+        self.latencies.append(latency)
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def report(self, elapsed: float) -> dict:
+        values = sorted(self.latencies)
+        count = len(values)
+        ms = lambda v: round(v * 1000, 3)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": ms(sum(values) / count) if count else 0.0,
+                "p50": ms(percentile(values, 50)),
+                "p95": ms(percentile(values, 95)),
+                "p99": ms(percentile(values, 99)),
+                "max": ms(values[-1]) if count else 0.0,
+            },
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+        }
+
+
+class VirtualUser:
+    """Виртуальный пользователь: свой набор токенов и учёт операций"""
+
+    def __init__(self, runner: "LoadRunner", index: int) -> None:
+        self.runner = runner
+        self.index = index
+        self.rng = random.Random(runner.seed + index)
+        self.state: dict = {}
+
+    async def call(
+        self, op: str, method: str, url: str, expect: tuple[int, ...] = (200,), **kw
+    ) -> Optional[Response]:
+        """Выполняет запрос и записывает латентность под именем операции"""
+        started = time.perf_counter()
+        try:
+            response = await self.runner.client.request(method, url, **kw)
+        except Exception:
+            self.runner.record(op, time.perf_counter() - started, None, False)
+            return None
+        latency = time.perf_counter() - started
+        self.runner.record(
+            op, latency, response.status_code, response.status_code in expect
+        )
+        return response
+
+    def credentials(self, role: str = "user") -> tuple[str, str]:
+        if self.runner.accounts == "synthetic":
+            # perf.datagen выдаёт роль admin первому пользователю
+            index = (
+                0
+                if role == "admin"
+                else self.rng.randrange(self.runner.synthetic_users)
+            )
+            return user_email(index), self.runner.password
+        return FIXTURE_ACCOUNTS[role]
+
+    async def login(self, role: str = "user") -> Optional[dict]:
+        email, password = self.credentials(role)
+        response = await self.call(
+            "login", "POST", "/auth/login", json={"email": email, "password": password}
+        )
+        if response is None or response.status_code != 200:
+            return None
+        return response.json()
+
+    def auth(self, role: str) -> dict:
+        return {"Authorization": f"Bearer {self.state[role]['access_token']}"}
+
+
+async def login_storm(vu: VirtualUser) -> None:
+    await vu.login(vu.rng.choice(list(FIXTURE_ACCOUNTS)))
+
+
+async def refresh_churn(vu: VirtualUser) -> None:
+    if "user" not in vu.state:
+        tokens = await vu.login("user")
+        if tokens is None:
+            return
+        vu.state["user"] = tokens
+    response = await vu.call(
+        "refresh",
+        "POST",
+        "/auth/refresh",
+        json={"refresh_token": vu.state["user"]["refresh_token"]},
+    )
+    if response is not None and response.status_code == 200:
+        vu.state["user"] = response.json()
+    else:
+        vu.state.pop("user", None)
+
+
+def _role_for(vu: VirtualUser) -> str:
+    roles = list(FIXTURE_ACCOUNTS)
+    return roles[vu.index % len(roles)]
+
+
+async def _ensure_login(vu: VirtualUser, role: str) -> bool:
+    if role not in vu.state:
+        tokens = await vu.login(role)
+        if tokens is None:
+            return False
+        vu.state[role] = tokens
+    return True
+
+
+async def project_reads(vu: VirtualUser) -> None:
+    role = _role_for(vu)
+    if not await _ensure_login(vu, role):
+        return
+    headers = vu.auth(role)
+    if "project_id" not in vu.state:
+        response = await vu.call(
+            "create_project",
+            "POST",
+            "/projects/",
+            json={"title": f"Load {vu.index}", "description": "read target"},
+            headers=headers,
+        )
+        if response is None or response.status_code != 200:
+            return
+        vu.state["project_id"] = response.json()["id"]
+    if role != "user":
+        await vu.call(f"list_projects[{role}]", "GET", "/projects/", headers=headers)
+    await vu.call(
+        f"get_project[{role}]",
+        "GET",
+        f"/projects/{vu.state['project_id']}",
+        headers=headers,
+    )
+
+
+async def project_writes(vu: VirtualUser) -> None:
+    role = _role_for(vu)
+    if not await _ensure_login(vu, role):
+        return
+    headers = vu.auth(role)
+    response = await vu.call(
+        f"create_project[{role}]",
+        "POST",
+        "/projects/",
+        json={"title": f"Load {vu.index}", "description": "write churn"},
+        headers=headers,
+    )
+    if response is None or response.status_code != 200:
+        return
+    project_id = response.json()["id"]
+    await vu.call(
+        f"update_project[{role}]",
+        "PATCH",
+        f"/projects/{project_id}",
+        json={"title": f"Load {vu.index} v2"},
+        headers=headers,
+    )
+    await vu.call(
+        f"delete_project[{role}]", "DELETE", f"/projects/{project_id}", headers=headers
+    )
+
+
+async def admin_rule_edits(vu: VirtualUser) -> None:
+    if not await _ensure_login(vu, "admin"):
+        return
+    headers = vu.auth("admin")
+    response = await vu.call("list_rules", "GET", "/admin/rules", headers=headers)
+    if response is None or response.status_code != 200 or not response.json():
+        return
+    rule = vu.rng.choice(response.json())
+    # Переключаем и тут же возвращаем флаг, чтобы не портить права
+    for value in (not rule["read_permission"], rule["read_permission"]):
+        await vu.call(
+            "update_rule",
+            "PATCH",
+            f"/admin/rules/{rule['id']}",
+            json={"read_permission": value},
+            headers=headers,
+        )
+
+
+SCENARIOS: dict[str, Callable[[VirtualUser], Awaitable[None]]] = {
+    "login_storm": login_storm,
+    "refresh_churn": refresh_churn,
+    "project_reads": project_reads,
+    "project_writes": project_writes,
+    "admin_rule_edits": admin_rule_edits,
+}
+
+
+class LoadRunner:
+    """Запускает виртуальных пользователей по сценарию и собирает статистику"""
+
+    def __init__(
+        self,
+        client: AsyncClient,
+        accounts: str = "fixtures",
+        synthetic_users: int = 1000,
+        password: str = "loadtest123",
+        seed: int = 42,
+    ) -> None:
+        self.client = client
+        self.accounts = accounts
+        self.synthetic_users = synthetic_users
+        self.password = password
+        self.seed = seed
+        self.stats: dict[str, Stats] = {}
+
+    def record(self, op: str, latency: float, status: Optional[int], ok: bool) -> None:
+        self.stats.setdefault(op, Stats()).record(latency, status, ok)
+
+    async def run(self, scenario: str, concurrency: int, duration: float) -> dict:
+        """
+        Запускает сценарий на заданное время.
+        :return: dict: Отчёт по операциям и суммарно
+        """
+        self.stats = {}
+        step = SCENARIOS[scenario]
+        deadline = time.perf_counter() + duration
+
+        async def worker(index: int) -> None:
+            vu = VirtualUser(self, index)
+            while time.perf_counter() < deadline:
+                await step(vu)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        total = Stats()
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            total.errors += stats.errors
+            for code, n in stats.statuses.items():
+                total.statuses[code] = total.statuses.get(code, 0) + n
+
+        return {
+            "scenario": scenario,
+            "concurrency": concurrency,
+            "duration_s": round(elapsed, 3),
+            "total": total.report(elapsed),
+            "operations": {
+                op: stats.report(elapsed) for op, stats in sorted(self.stats.items())
+            },
+        }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Сравнивает отчёт с базовым.
+    :return: list[str]: Описание регрессий (пустой список — регрессий нет)
+    """
+    regressions = []
+    base_runs = {run["scenario"]: run for run in baseline["runs"]}
+    for run in current["runs"]:
+        base = base_runs.get(run["scenario"])
+        if base is None:
+            continue
+        for op, stats in run["operations"].items():
+            ref = base["operations"].get(op)
+            if ref is None:
+                continue
+            name = f"{run['scenario']}/{op}"
+            p95, ref_p95 = stats["latency_ms"]["p95"], ref["latency_ms"]["p95"]
+            if ref_p95 and p95 > ref_p95 * (1 + tolerance):
+                regressions.append(f"{name}: p95 {ref_p95} → {p95} ms")
+            if ref["rps"] and stats["rps"] < ref["rps"] * (1 - tolerance):
+                regressions.append(f"{name}: rps {ref['rps']} → {stats['rps']}")
+            if stats["error_rate"] > ref["error_rate"] + 0.01:
+                regressions.append(
+                    f"{name}: error_rate {ref['error_rate']} → {stats['error_rate']}"
+                )
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args: argparse.Namespace) -> dict:
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    report = {
+        "revision": _git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "target": args.target,
+        "runs": [],
+    }
+
+    async def run_all(client: AsyncClient) -> None:
+        runner = LoadRunner(
+            client,
+            accounts=args.accounts,
+            synthetic_users=args.synthetic_users,
+            password=args.password,
+            seed=args.seed,
+        )
+        for scenario in scenarios:
+            report["runs"].append(
+                await runner.run(scenario, args.concurrency, args.duration)
+            )
+
+    if args.target == "asgi":
+        from asgi_lifespan import LifespanManager
+
+        from main import app
+
+        async with LifespanManager(app):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                await run_all(client)
+    else:
+        async with AsyncClient(base_url=args.target, timeout=args.timeout) as client:
+            await run_all(client)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование API")
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--target", default="asgi", help="asgi или URL сервера")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Секунд на сценарий"
+    )
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--accounts", choices=["fixtures", "synthetic"], default="fixtures"
+    )
+    parser.add_argument("--synthetic-users", type=int, default=1000)
+    parser.add_argument("--password", default="loadtest123")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Куда сохранить JSON-отчёт")
+    parser.add_argument("--compare", help="Базовый JSON-отчёт для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    result = asyncio.run(main(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,111 @@
+"""
+Сравнение сериализации больших списков: ORM + response_model против
+Core-строк + orjson (routes.admin.list_rules, routes.mock_resourses.list_projects).
+
+Замеряется только работа Python после получения строк из драйвера:
+загрузка в объекты, валидация/сериализация, кодирование JSON.
+
+Запуск:
+    python -m perf.serialization [--rows 100000]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from pydantic import TypeAdapter
+
+from core.models import Project
+from core.responses import rows_response
+from core.schemas import AccessRuleRead, ProjectRead
+
+PROJECT_KEYS = ("title", "description", "id", "owner_id", "created_at", "version")
+RULE_KEYS = tuple(AccessRuleRead.model_fields)
+
+
+def make_rows(count: int) -> tuple[list[tuple], list[tuple]]:
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    projects = [
+        (
+            f"Project {i}",
+            f"Description {i}",
+            i,
+            i % 1000,
+            started + timedelta(seconds=i),
+            1,
+        )
+        for i in range(count)
+    ]
+    rules = [
+        (i % 50, i % 20, True, False, True, False, False, True, False, i, "r", "e", 1)
+        for i in range(count)
+    ]
+    return projects, rules
+
+
+def legacy_response(adapter: TypeAdapter, content) -> bytes:
+    """Что делает FastAPI с response_model: валидация, dump в JSON-режиме, json.dumps"""
+    value = adapter.validate_python(content, from_attributes=True)
+    data = adapter.dump_python(value, mode="json")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def measure(fn: Callable[[], object]) -> tuple[float, float]:
+    """
+    Время и память замеряются отдельными прогонами: tracemalloc замедляет код.
+    :return: (время, мс; пиковая память, МиБ)
+    """
+    gc.collect()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    projects, rules = make_rows(args.rows)
+    projects_adapter = TypeAdapter(list[ProjectRead])
+    rules_adapter = TypeAdapter(list[AccessRuleRead])
+
+    def projects_before():
+        orm = [Project(**dict(zip(PROJECT_KEYS, row))) for row in projects]
+        return legacy_response(projects_adapter, orm)
+
+    def rules_before():
+        items = [AccessRuleRead(**dict(zip(RULE_KEYS, row))) for row in rules]
+        return legacy_response(rules_adapter, items)
+
+    cases = {
+        "list_projects": (
+            projects_before,
+            lambda: rows_response(PROJECT_KEYS, projects).body,
+        ),
+        "list_rules": (rules_before, lambda: rows_response(RULE_KEYS, rules).body),
+    }
+    assert json.loads(projects_before()) == json.loads(cases["list_projects"][1]())
+    assert json.loads(rules_before()) == json.loads(cases["list_rules"][1]())
+
+    print(f"{args.rows} строк")
+    print(f"{'endpoint':<16} {'path':<8} {'time, ms':>10} {'peak, MiB':>10}")
+    for name, (before, after) in cases.items():
+        for label, fn in (("before", before), ("after", after)):
+            elapsed, peak = measure(fn)
+            print(f"{name:<16} {label:<8} {elapsed:>10.1f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import FromClause, Select, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import settings
+from core.conditional import (
+    expected_versions,
+    make_etag,
+    not_modified,
+    precondition_failed,
+)
 from core.db_helper import db_helper
-from core.models import AccessRule, BusinessElement, Role
+from core.models import (
+    AccessRule,
+    ApiKey,
+    AuditEvent,
+    BusinessElement,
+    Role,
+    User,
+    UserRole,
+)
+from core.profiling import ProfiledRoute, profiler, sign_profile_token
+from core.responses import ORJSON_OPTIONS, ORJSONResponse, rows_response
 from core.schemas import (
     AccessRuleCreate,
     AccessRuleRead,
     AccessRuleUpdate,
+    ApiKeyCreate,
+    ApiKeyCreated,
+    ApiKeyRead,
     BusinessElementCreate,
     BusinessElementRead,
+    ProfilingSampling,
     RoleCreate,
     RoleRead,
+    UserImportItem,
+    UserImportResult,
 )
-from middleware.permissions import require_admin
+from middleware.permissions import require_admin, require_platform_admin
+from services.api_keys import API_KEYS, ApiKeyService, verified_keys
+from services.bulk_import import BulkImportService
+
+router = APIRouter(prefix="/admin", tags=["Admin"], route_class=ProfiledRoute)
+
+ACCESS_RULES = AccessRule.__table__
+
 
-router = APIRouter(prefix="/admin", tags=["Admin"])
+def _rule_select(rules: FromClause = ACCESS_RULES) -> Select:
+    """
+    Правила с названиями роли и ресурса в порядке полей AccessRuleRead.
+    :param rules: Таблица правил или CTE с RETURNING (INSERT/UPDATE)
+    :return: Select: Запрос с join на роли и ресурсы
+    """
+    return (
+        select(
+            rules.c.role_id,
+            rules.c.element_id,
+            rules.c.read_permission,
+            rules.c.read_all_permission,
+            rules.c.create_permission,
+            rules.c.update_permission,
+            rules.c.update_all_permission,
+            rules.c.delete_permission,
+            rules.c.delete_all_permission,
+            rules.c.id,
+            Role.name.label("role_name"),
+            BusinessElement.name.label("element_name"),
+            rules.c.version,
+        )
+        .join(Role, rules.c.role_id == Role.id)
+        .join(BusinessElement, rules.c.element_id == BusinessElement.id)
+    )
 
 
 @router.post("/roles", response_model=RoleRead)
@@ -24,49 +86,62 @@ async def create_role(
     admin=Depends(require_admin),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    existing = await session.execute(select(Role).where(Role.name == data.name))
-    if existing.scalar_one_or_none():
+    # Проверка дубликата и вставка — один INSERT ... ON CONFLICT ... RETURNING
+    result = await session.execute(
+        insert(Role)
+        .values(tenant_id=admin.tenant_id, name=data.name, description=data.description)
+        .on_conflict_do_nothing(index_elements=[Role.tenant_id, Role.name])
+        .returning(Role.name, Role.description, Role.id)
+    )
+    row = result.one_or_none()
+    if row is None:
         raise HTTPException(400, detail="Role already exists")
 
-    role = Role(name=data.name, description=data.description)
-    session.add(role)
     await session.commit()
-    await session.refresh(role)
-    return role
+    return RoleRead(**row._mapping)
 
 
 @router.get("/roles", response_model=list[RoleRead])
 async def list_roles(
     admin=Depends(require_admin),
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
 ):
-    result = await session.execute(select(Role))
+    result = await session.execute(
+        select(Role).where(Role.tenant_id == admin.tenant_id)
+    )
     return result.scalars().all()
 
 
 @router.post("/resources", response_model=BusinessElementRead)
 async def create_resource(
     data: BusinessElementCreate,
-    admin=Depends(require_admin),
+    admin=Depends(require_platform_admin),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    existing = await session.execute(
-        select(BusinessElement).where(BusinessElement.name == data.name)
+    """
+    Ресурсы общие для всех арендаторов (к их именам привязаны проверки
+    в коде), поэтому справочник ведёт только админ платформы.
+    """
+    result = await session.execute(
+        insert(BusinessElement)
+        .values(name=data.name, description=data.description)
+        .on_conflict_do_nothing(index_elements=[BusinessElement.name])
+        .returning(
+            BusinessElement.name, BusinessElement.description, BusinessElement.id
+        )
     )
-    if existing.scalar_one_or_none():
+    row = result.one_or_none()
+    if row is None:
         raise HTTPException(400, detail="Resource already exists")
 
-    element = BusinessElement(name=data.name, description=data.description)
-    session.add(element)
     await session.commit()
-    await session.refresh(element)
-    return element
+    return BusinessElementRead(**row._mapping)
 
 
 @router.get("/resources", response_model=list[BusinessElementRead])
 async def list_resources(
-    admin=Depends(require_admin),
-    session: AsyncSession = Depends(db_helper.session_getter),
+    admin=Depends(require_platform_admin),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
 ):
     result = await session.execute(select(BusinessElement))
     return result.scalars().all()
@@ -75,101 +150,323 @@ async def list_resources(
 @router.post("/rules", response_model=AccessRuleRead)
 async def create_rule(
     data: AccessRuleCreate,
+    response: Response,
     admin=Depends(require_admin),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-
-    role = await session.get(Role, data.role_id)
-    if not role:
-        raise HTTPException(404, detail="Role not found")
-
-    element = await session.get(BusinessElement, data.element_id)
-    if not element:
+    # INSERT ... SELECT из роли арендатора администратора: роль чужого
+    # арендатора не даёт строк. RETURNING в CTE, названия роли и ресурса —
+    # join в том же запросе
+    values = data.model_dump()
+    columns = [name for name in values if name != "role_id"]
+    source = select(
+        Role.id, *(literal(values[name]) for name in columns), Role.tenant_id
+    ).where(Role.id == data.role_id, Role.tenant_id == admin.tenant_id)
+    written = (
+        insert(AccessRule)
+        .from_select(["role_id", *columns, "tenant_id"], source)
+        .on_conflict_do_nothing(
+            index_elements=[AccessRule.role_id, AccessRule.element_id]
+        )
+        .returning(*ACCESS_RULES.c)
+        .cte("written")
+    )
+    try:
+        result = await session.execute(_rule_select(written))
+    except IntegrityError:
+        # Ресурса нет (нарушение внешнего ключа)
+        await session.rollback()
         raise HTTPException(404, detail="Resource not found")
 
-    existing = await session.execute(
-        select(AccessRule).where(
-            AccessRule.role_id == data.role_id, AccessRule.element_id == data.element_id
+    row = result.one_or_none()
+    if row is None:
+        role_id = await session.scalar(
+            select(Role.id).where(
+                Role.id == data.role_id, Role.tenant_id == admin.tenant_id
+            )
         )
-    )
-    if existing.scalar_one_or_none():
+        if role_id is None:
+            raise HTTPException(404, detail="Role not found")
         raise HTTPException(400, detail="Rule already exists")
 
-    rule = AccessRule(**data.model_dump())
-    session.add(rule)
     await session.commit()
-    await session.refresh(rule)
-
-    return AccessRuleRead(
-        **data.model_dump(), id=rule.id, role_name=role.name, element_name=element.name
-    )
+    response.headers["ETag"] = make_etag(row.version)
+    return AccessRuleRead(**row._mapping)
 
 
 @router.get("/rules", response_model=list[AccessRuleRead])
 async def list_rules(
+    request: Request,
     admin=Depends(require_admin),
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
 ):
+    # Состояние списка: вставка и удаление меняют count/max(id),
+    # изменение правила — сумму версий. Опрос без изменений — один агрегат и 304
+    state = (
+        await session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.max(AccessRule.id), 0),
+                func.coalesce(func.sum(AccessRule.version), 0),
+            ).where(AccessRule.tenant_id == admin.tenant_id)
+        )
+    ).one()
+    etag = make_etag(*state)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     result = await session.execute(
-        select(AccessRule, Role, BusinessElement)
-        .join(Role, AccessRule.role_id == Role.id)
-        .join(BusinessElement, AccessRule.element_id == BusinessElement.id)
+        _rule_select().where(ACCESS_RULES.c.tenant_id == admin.tenant_id)
     )
-
-    items = []
-    for rule, role, element in result.all():
-        items.append(
-            AccessRuleRead(
-                id=rule.id,
-                role_id=rule.role_id,
-                element_id=rule.element_id,
-                read_permission=rule.read_permission,
-                read_all_permission=rule.read_all_permission,
-                create_permission=rule.create_permission,
-                update_permission=rule.update_permission,
-                update_all_permission=rule.update_all_permission,
-                delete_permission=rule.delete_permission,
-                delete_all_permission=rule.delete_all_permission,
-                role_name=role.name,
-                element_name=element.name,
-            )
-        )
-    return items
+    # Колонки в порядке полей AccessRuleRead: ORM-объекты и повторная
+    # валидация не нужны
+    response = rows_response(tuple(result.keys()), result)
+    response.headers["ETag"] = etag
+    return response
 
 
 @router.patch("/rules/{rule_id}", response_model=AccessRuleRead)
 async def update_rule(
     rule_id: int,
     data: AccessRuleUpdate,
+    request: Request,
+    response: Response,
     admin=Depends(require_admin),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    rule = await session.get(AccessRule, rule_id)
-    if not rule:
+    update_data = data.model_dump(exclude_unset=True)
+    versions = expected_versions(request)
+
+    if update_data:
+        # UPDATE ... RETURNING в CTE вместо refresh и двух session.get;
+        # при If-Match — условный по версии
+        stmt = update(AccessRule).where(
+            AccessRule.id == rule_id, AccessRule.tenant_id == admin.tenant_id
+        )
+        if versions is not None:
+            stmt = stmt.where(AccessRule.version.in_(versions))
+        rules = (
+            stmt.values(**update_data, version=AccessRule.version + 1)
+            .returning(*ACCESS_RULES.c)
+            .cte("written")
+        )
+    else:
+        rules = ACCESS_RULES
+    result = await session.execute(
+        _rule_select(rules).where(
+            rules.c.id == rule_id, rules.c.tenant_id == admin.tenant_id
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        rule = await session.get(AccessRule, rule_id)
+        if versions is not None and rule and rule.tenant_id == admin.tenant_id:
+            raise precondition_failed()
         raise HTTPException(404, detail="Rule not found")
+    if not update_data and versions is not None and row.version not in versions:
+        raise precondition_failed()
 
-    update_data = data.model_dump(exclude_unset=True)
+    await session.commit()
+    response.headers["ETag"] = make_etag(row.version)
+    return AccessRuleRead(**row._mapping)
 
-    for key, value in update_data.items():
-        setattr(rule, key, value)
 
+@router.post("/users/import", response_model=UserImportResult)
+async def import_users(
+    items: list[UserImportItem],
+    batch_size: int = Query(5000, ge=1, le=50000),
+    admin=Depends(require_admin),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Массовый импорт пользователей.
+    Принимает открытые пароли (password) или готовые хеши (pass_hash).
+    Существующие email пропускаются. Пользователи и роли — арендатора администратора.
+    Для миллионов записей используйте bulk_import.py.
+    """
+    return await BulkImportService.import_users(
+        items, session, batch_size=batch_size, tenant_id=admin.tenant_id
+    )
+
+
+@router.post("/api-keys", response_model=ApiKeyCreated)
+async def create_api_key(
+    data: ApiKeyCreate,
+    admin=Depends(require_admin),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Выпуск API-ключа для пользователя арендатора (сервисного клиента).
+    Ключ возвращается один раз; в БД хранится только его HMAC.
+    """
+    result = await session.execute(
+        select(User.id, UserRole.role_id)
+        .outerjoin(UserRole, UserRole.user_id == User.id)
+        .where(User.id == data.user_id, User.tenant_id == admin.tenant_id)
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(404, detail="User not found")
+    user_roles = {row.role_id for row in rows if row.role_id is not None}
+    if data.role_ids is None:
+        role_ids = sorted(user_roles)
+    elif set(data.role_ids) <= user_roles:
+        role_ids = sorted(set(data.role_ids))
+    else:
+        raise HTTPException(400, detail="Roles are not assigned to the user")
+
+    key, prefix = ApiKeyService.generate()
+    expires_at = None
+    if data.expires_in_days is not None:
+        expires_at = datetime.now(timezone.utc) + timedelta(days=data.expires_in_days)
+    result = await session.execute(
+        insert(ApiKey)
+        .values(
+            tenant_id=admin.tenant_id,
+            user_id=data.user_id,
+            name=data.name,
+            prefix=prefix,
+            key_hash=ApiKeyService.hash_key(key),
+            role_ids=role_ids,
+            expires_at=expires_at,
+        )
+        .returning(*(API_KEYS.c[name] for name in ApiKeyRead.model_fields))
+    )
+    row = result.one()
+    await session.commit()
+    return ApiKeyCreated(**row._mapping, key=key)
+
+
+@router.get("/api-keys", response_model=list[ApiKeyRead])
+async def list_api_keys(
+    admin=Depends(require_admin),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+):
+    result = await session.execute(
+        select(*(API_KEYS.c[name] for name in ApiKeyRead.model_fields))
+        .where(API_KEYS.c.tenant_id == admin.tenant_id)
+        .order_by(API_KEYS.c.id)
+    )
+    return rows_response(tuple(result.keys()), result)
+
+
+@router.delete("/api-keys/{key_id}")
+async def revoke_api_key(
+    key_id: int,
+    admin=Depends(require_admin),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Отзыв API-ключа. В этом процессе действует сразу, в остальных —
+    не позже APP_CONFIG__AUTH__API_KEY_CACHE_TTL.
+    """
+    result = await session.execute(
+        update(ApiKey)
+        .where(ApiKey.id == key_id, ApiKey.tenant_id == admin.tenant_id)
+        .values(revoked=True)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(404, detail="API key not found")
     await session.commit()
-    await session.refresh(rule)
-
-    role = await session.get(Role, rule.role_id)
-    element = await session.get(BusinessElement, rule.element_id)
-
-    return AccessRuleRead(
-        id=rule.id,
-        role_id=rule.role_id,
-        element_id=rule.element_id,
-        read_permission=rule.read_permission,
-        read_all_permission=rule.read_all_permission,
-        create_permission=rule.create_permission,
-        update_permission=rule.update_permission,
-        update_all_permission=rule.update_all_permission,
-        delete_permission=rule.delete_permission,
-        delete_all_permission=rule.delete_all_permission,
-        role_name=role.name,
-        element_name=element.name,
+    verified_keys.invalidate(key_id)
+
+    return {"message": "API key revoked"}
+
+
+@router.get("/audit", response_class=StreamingResponse)
+async def export_audit(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    event: Optional[str] = None,
+    user_id: Optional[int] = None,
+    admin=Depends(require_admin),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+):
+    """
+    Выгрузка журнала аудита арендатора в формате NDJSON (одно событие в строке).
+    Строки читаются серверным курсором и отдаются по мере чтения, поэтому
+    память не зависит от размера истории. since/until отсекают лишние
+    месячные секции.
+    """
+    stmt = (
+        select(AuditEvent.__table__)
+        .where(AuditEvent.tenant_id == admin.tenant_id)
+        .order_by(AuditEvent.occurred_at, AuditEvent.id)
+        .execution_options(yield_per=1000)
+    )
+    if since is not None:
+        stmt = stmt.where(AuditEvent.occurred_at >= since)
+    if until is not None:
+        stmt = stmt.where(AuditEvent.occurred_at < until)
+    if event is not None:
+        stmt = stmt.where(AuditEvent.event == event)
+    if user_id is not None:
+        stmt = stmt.where(AuditEvent.user_id == user_id)
+
+    async def lines() -> AsyncIterator[bytes]:
+        # Сессия зависимости закрывается после отправки ответа
+        result = await session.stream(stmt)
+        async for partition in result.mappings().partitions():
+            yield b"".join(
+                orjson.dumps(dict(row), option=ORJSON_OPTIONS) + b"\n"
+                for row in partition
+            )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/profiling/token")
+async def create_profiling_token(admin=Depends(require_admin)):
+    """
+    Подписанный заголовок профилирования: запросы с ним профилируются
+    в любом воркере, пока подпись не истекла (APP_CONFIG__PROFILING__TOKEN_TTL).
+    """
+    expires = int(time.time()) + settings.profiling.token_ttl
+    return {
+        "header": settings.profiling.header,
+        "value": sign_profile_token(settings.auth.secret_key, expires),
+        "expires_at": datetime.fromtimestamp(expires, timezone.utc),
+    }
+
+
+@router.put("/profiling/sampling")
+async def set_profiling_sampling(data: ProfilingSampling, admin=Depends(require_admin)):
+    """
+    Временная доля профилируемых запросов — только в воркере, принявшем
+    этот запрос. По истечении duration_seconds действует доля из настроек.
+    """
+    until = profiler.set_sampling(data.sample_rate, data.duration_seconds)
+    return {
+        "sample_rate": data.sample_rate,
+        "until": datetime.fromtimestamp(until, timezone.utc),
+    }
+
+
+@router.get("/profiles")
+async def list_profiles(admin=Depends(require_admin)):
+    """Последние профили этого воркера, новые первыми (без стеков)"""
+    return ORJSONResponse([profile.summary() for profile in profiler.buffer.list()])
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, admin=Depends(require_admin)):
+    """Профиль целиком: участки и свёрнутые стеки"""
+    profile = profiler.buffer.get(profile_id)
+    if profile is None:
+        raise HTTPException(404, detail="Profile not found")
+    return ORJSONResponse(profile.to_dict())
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+async def download_profile_stacks(profile_id: str, admin=Depends(require_admin)):
+    """Стеки в формате folded (flamegraph.pl, speedscope)"""
+    profile = profiler.buffer.get(profile_id)
+    if profile is None:
+        raise HTTPException(404, detail="Profile not found")
+    return PlainTextResponse(
+        profile.folded(),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'
+        },
     )
@@ -1,14 +1,15 @@
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
 from config import settings
 from core.db_helper import db_helper
-from core.models import RefreshToken, User
+from core.models import DEFAULT_TENANT_ID, RefreshToken
+from core.principal import Principal
+from core.profiling import ProfiledRoute
 from core.schemas import (
     LoginRequest,
     RefreshTokenRequest,
@@ -18,9 +19,26 @@ from core.schemas import (
     UserRead,
 )
 from middleware.permissions import get_current_user
-from services.auth_service import AuthService, pwd_context
+from services.audit_log import audit_log
+from services.auth_service import AuthService, access_token_cache, pwd_context
+from services.rate_limit import hash_limiter, login_throttle
+from services.refresh_token_writer import refresh_writer
+
+router = APIRouter(prefix="/auth", tags=["Auth"], route_class=ProfiledRoute)
+
+
+def _user_read(user: Principal) -> UserRead:
+    return UserRead(
+        id=user.id,
+        email=user.email,
+        is_active=user.is_active,
+        created_at=user.created_at,
+        roles=list(user.role_names),
+    )
+
 
-router = APIRouter(prefix="/auth", tags=["Auth"])
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
 
 
 from fastapi import APIRouter, Depends, HTTPException
@@ -36,20 +54,7 @@ async def register(
     """
     try:
         user = await AuthService.register(user_data, session)
-
-        stmt = select(User).options(selectinload(User.roles)).where(User.id == user.id)
-        result = await session.execute(stmt)
-        user_with_roles = result.scalar_one()
-
-        roles = [role.name for role in user_with_roles.roles]
-
-        return {
-            "id": user_with_roles.id,
-            "email": user_with_roles.email,
-            "is_active": user_with_roles.is_active,
-            "created_at": user_with_roles.created_at,
-            "roles": roles,
-        }
+        return _user_read(user)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -62,14 +67,42 @@ async def register(
 
 @router.post("/login", response_model=TokenResponse)
 async def login(
-    credentials: LoginRequest, session: AsyncSession = Depends(db_helper.session_getter)
+    credentials: LoginRequest,
+    request: Request,
+    session: AsyncSession = Depends(db_helper.session_getter),
 ):
     """
     Регистрация нового пользователя.
     Возвращает данные пользователя без роли (роль можно назначить через админку).
+    Неудачные попытки ограничены по email и IP (429 с Retry-After).
     """
-    tokens = await AuthService.authenticate(
-        credentials.email, credentials.password, session
+    client_ip = _client_ip(request)
+    reservation = []
+    failed = False
+    try:
+        reservation = await login_throttle.reserve(credentials.email, client_ip)
+        tokens = await AuthService.authenticate(
+            credentials.email, credentials.password, session
+        )
+    except HTTPException as e:
+        # Резерв остаётся только за неверными учётными данными
+        failed = e.status_code == 401
+        await audit_log.record(
+            "login",
+            "throttled" if e.status_code == 429 else "failure",
+            client_ip=client_ip,
+            detail=credentials.email,
+        )
+        raise
+    finally:
+        if not failed:
+            await login_throttle.refund(reservation)
+    await audit_log.record(
+        "login",
+        "success",
+        tenant_id=tokens["tenant_id"],
+        user_id=tokens["user_id"],
+        client_ip=client_ip,
     )
     # refresh_token = AuthService.create_refresh_token(tokens["user_id"])
     # await AuthService.persist_refresh_token(tokens["user_id"], refresh_token, session)
@@ -84,20 +117,32 @@ async def login(
 @router.post("/refresh", response_model=Token)
 async def refresh(
     token_data: RefreshTokenRequest,
+    request: Request,
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
     """Обновление access_token по refresh_token."""
-    user_id = await AuthService.verify_refresh_token(token_data.refresh_token, session)
-    if not user_id:
+    verified = await AuthService.verify_refresh_token(token_data.refresh_token, session)
+    if not verified:
+        await audit_log.record("refresh", "failure", client_ip=_client_ip(request))
         raise HTTPException(
             status_code=401, detail="Неверный или просроченный refresh токен"
         )
+    user_id, tenant_id = verified
 
-    new_access = AuthService.create_access_token({"sub": str(user_id)})
-    new_refresh = AuthService.create_refresh_token(user_id)  # ⬅️ Создаём
+    new_access = AuthService.create_access_token(
+        {"sub": str(user_id), "tid": tenant_id}
+    )
+    new_refresh = AuthService.create_refresh_token(user_id, tenant_id)  # ⬅️ Создаём
     await AuthService.persist_refresh_token(
-        user_id, new_refresh, session
+        user_id, new_refresh, session, tenant_id=tenant_id
     )  # ⬅️ Сохраняем
+    await audit_log.record(
+        "refresh",
+        "success",
+        tenant_id=tenant_id,
+        user_id=user_id,
+        client_ip=_client_ip(request),
+    )
 
     return {
         "access_token": new_access,
@@ -109,6 +154,7 @@ async def refresh(
 @router.post("/logout")
 async def logout(
     token_data: RefreshTokenRequest,
+    request: Request,
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
     """
@@ -116,6 +162,7 @@ async def logout(
     Отзывает refresh_token.
     """
     refresh_token = token_data.refresh_token
+    client_ip = _client_ip(request)
     try:
         payload = jwt.decode(
             refresh_token,
@@ -123,48 +170,49 @@ async def logout(
             algorithms=[settings.auth.algorithm],
         )
         user_id = int(payload.get("sub"))
+        tenant_id = int(payload.get("tid", DEFAULT_TENANT_ID))
         if payload.get("type") != "refresh":
             raise ValueError()
     except (JWTError, ValueError):
+        await audit_log.record("logout", "failure", client_ip=client_ip)
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
+    if refresh_writer.has_pending(user_id):
+        # Отзыв ищет токен в БД: сначала дописываем очередь
+        await refresh_writer.flush()
+
     stmt = select(RefreshToken).where(
-        RefreshToken.user_id == user_id, RefreshToken.revoked == False
+        RefreshToken.tenant_id == tenant_id,
+        RefreshToken.user_id == user_id,
+        RefreshToken.revoked == False,
     )
     result = await session.execute(stmt)
     tokens = result.scalars().all()
     for token in tokens:
-        if pwd_context.verify(refresh_token, token.token_hash):
+        if await hash_limiter.run(pwd_context.verify, refresh_token, token.token_hash):
             print(">>> logout matched token:", token.id)
             print(">>> decoded user_id =", user_id, "total tokens:", len(tokens))
             token.revoked = True
             await session.commit()
+            access_token_cache.invalidate_subject(user_id)
+            await audit_log.record(
+                "logout",
+                "success",
+                tenant_id=tenant_id,
+                user_id=user_id,
+                client_ip=client_ip,
+            )
             return {"message": "Выход выполнен"}
+    await audit_log.record(
+        "logout", "failure", tenant_id=tenant_id, user_id=user_id, client_ip=client_ip
+    )
     raise HTTPException(status_code=400, detail="Токен не найден")
 
 
 @router.get("/me", response_model=UserRead)
-async def get_me(
-    current_user: User = Depends(get_current_user),
-    session: AsyncSession = Depends(db_helper.session_getter),
-):
+async def get_me(current_user: Principal = Depends(get_current_user)):
     """
     Получение информации о текущем пользователе.
     Требует авторизации (Bearer token).
     """
-    stmt = (
-        select(User).where(User.id == current_user.id).options(selectinload(User.roles))
-    )
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    return UserRead(
-        id=user.id,
-        email=user.email,
-        is_active=user.is_active,
-        created_at=user.created_at,
-        roles=[role.name for role in user.roles],
-    )
+    return _user_read(current_user)
@@ -1,43 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.conditional import (
+    expected_versions,
+    make_etag,
+    not_modified,
+    precondition_failed,
+)
 from core.db_helper import db_helper
-from core.models import Project
-from core.schemas import ProjectCreate, ProjectRead, ProjectUpdate
+from core.models import Project, ResourceGrant, Role, User
+from core.principal import Permission, Principal, pack_actions, unpack_actions
+from core.profiling import ProfiledRoute
+from core.responses import rows_response
+from core.schemas import (
+    ProjectCreate,
+    ProjectRead,
+    ProjectUpdate,
+    ResourceGrantCreate,
+    ResourceGrantRead,
+)
 from middleware.permissions import get_current_user
 from services.authz_service import AuthorizationService
 
-router = APIRouter(prefix="/projects", tags=["Projects (Mock Resources)"])
+router = APIRouter(
+    prefix="/projects", tags=["Projects (Mock Resources)"], route_class=ProfiledRoute
+)
+
+# Колонки в порядке полей ProjectRead (выборка списка и RETURNING записи)
+PROJECT_COLUMNS = (
+    Project.title,
+    Project.description,
+    Project.id,
+    Project.owner_id,
+    Project.created_at,
+    Project.version,
+)
+
+
+def _grant_read(grant: ResourceGrant) -> ResourceGrantRead:
+    return ResourceGrantRead(
+        id=grant.id,
+        object_id=grant.object_id,
+        principal_type=grant.principal_type,
+        principal_id=grant.principal_id,
+        actions=unpack_actions(grant.actions),
+    )
+
+
+async def _get_project(
+    project_id: int, user: Principal, session: AsyncSession
+) -> Project:
+    """Проект арендатора пользователя; чужие арендаторы неотличимы от 404"""
+    project = await session.get(Project, project_id)
+    if not project or project.tenant_id != user.tenant_id:
+        raise HTTPException(404, "Project not found")
+    return project
 
 
 @router.get("/", response_model=list[ProjectRead])
 async def list_projects(
     user=Depends(get_current_user),
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
 ):
-    # Проверяем право read_all
-    allowed = await AuthorizationService.check_permission(
-        user=user,
-        element_name="projects",
-        action="read",
-        session=session,
-        resource_owner_id=None,  # неважно
-    )
-
-    if not allowed:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to read projects",
-        )
+    # read_all — все проекты; иначе свои (при праве read) и расшаренные.
+    # Фильтр целиком в SQL: EXISTS по resource_grants, без проверок по строкам
+    mask = await AuthorizationService.get_mask(user, "projects", session)
+    stmt = select(*PROJECT_COLUMNS).where(Project.tenant_id == user.tenant_id)
+    if not mask & Permission.READ_ALL:
+        visible = AuthorizationService.granted(user, "projects", Project.id)
+        if mask & Permission.READ:
+            visible = or_(Project.owner_id == user.id, visible)
+        stmt = stmt.where(visible)
 
-    result = await session.execute(select(Project))
-    return result.scalars().all()
+    # Только колонки ProjectRead, без загрузки ORM-объектов в identity map
+    result = await session.execute(stmt)
+    return rows_response(tuple(result.keys()), result)
 
 
 @router.post("/", response_model=ProjectRead)
 async def create_project(
     data: ProjectCreate,
+    response: Response,
     user=Depends(get_current_user),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
@@ -50,36 +95,53 @@ async def create_project(
             status_code=403, detail="You do not have permission to create projects"
         )
 
-    project = Project(title=data.title, description=data.description, owner_id=user.id)
-
-    session.add(project)
+    # created_at заполняет сервер — берём его из RETURNING, без refresh
+    result = await session.execute(
+        insert(Project)
+        .values(
+            tenant_id=user.tenant_id,
+            title=data.title,
+            description=data.description,
+            owner_id=user.id,
+        )
+        .returning(*PROJECT_COLUMNS)
+    )
+    row = result.one()
     await session.commit()
-    await session.refresh(project)
 
-    return project
+    response.headers["ETag"] = make_etag(row.version)
+    return ProjectRead(**row._mapping)
 
 
 @router.get("/{project_id}", response_model=ProjectRead)
 async def get_project(
     project_id: int,
+    request: Request,
+    response: Response,
     user=Depends(get_current_user),
-    session: AsyncSession = Depends(db_helper.session_getter),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
 ):
-    project = await session.get(Project, project_id)
-    if not project:
-        raise HTTPException(404, "Project not found")
+    project = await _get_project(project_id, user, session)
 
     allowed = await AuthorizationService.check_permission(
         user=user,
         element_name="projects",
         action="read",
         resource_owner_id=project.owner_id,
+        resource_id=project.id,
         session=session,
     )
 
     if not allowed:
         raise HTTPException(403, "No permission to read this project")
 
+    # Клиент уже видел эту версию — 304 без сериализации тела
+    etag = make_etag(project.version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    response.headers["ETag"] = etag
     return project
 
 
@@ -87,56 +149,216 @@ async def get_project(
 async def update_project(
     project_id: int,
     data: ProjectUpdate,
+    request: Request,
+    response: Response,
     user=Depends(get_current_user),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    project = await session.get(Project, project_id)
-    if not project:
-        raise HTTPException(404, "Project not found")
+    project = await _get_project(project_id, user, session)
 
     allowed = await AuthorizationService.check_permission(
         user=user,
         element_name="projects",
         action="update",
         resource_owner_id=project.owner_id,
+        resource_id=project.id,
         session=session,
     )
 
     if not allowed:
         raise HTTPException(403, "No permission to update this project")
 
+    versions = expected_versions(request)
+    if versions is not None and project.version not in versions:
+        raise precondition_failed()
+
     update_data = data.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(project, key, value)
+    if not update_data:
+        response.headers["ETag"] = make_etag(project.version)
+        return project
 
+    # Условный UPDATE: конкурентная запись между чтением и обновлением → 412
+    stmt = update(Project).where(Project.id == project_id)
+    if versions is not None:
+        stmt = stmt.where(Project.version.in_(versions))
+    result = await session.execute(
+        stmt.values(**update_data, version=Project.version + 1).returning(
+            *PROJECT_COLUMNS
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        if versions is not None:
+            raise precondition_failed()
+        # Проект удалён между чтением и обновлением
+        raise HTTPException(404, "Project not found")
     await session.commit()
-    await session.refresh(project)
 
-    return project
+    response.headers["ETag"] = make_etag(row.version)
+    return ProjectRead(**row._mapping)
 
 
 @router.delete("/{project_id}")
 async def delete_project(
     project_id: int,
+    request: Request,
     user=Depends(get_current_user),
     session: AsyncSession = Depends(db_helper.session_getter),
 ):
-    project = await session.get(Project, project_id)
-    if not project:
-        raise HTTPException(404, "Project not found")
+    project = await _get_project(project_id, user, session)
 
     allowed = await AuthorizationService.check_permission(
         user=user,
         element_name="projects",
         action="delete",
         resource_owner_id=project.owner_id,
+        resource_id=project.id,
         session=session,
     )
 
     if not allowed:
         raise HTTPException(403, "No permission to delete this project")
 
-    await session.delete(project)
+    versions = expected_versions(request)
+    await session.execute(
+        delete(ResourceGrant).where(
+            ResourceGrant.element_id == AuthorizationService.element_id("projects"),
+            ResourceGrant.object_id == project_id,
+        )
+    )
+    if versions is None:
+        await session.delete(project)
+    else:
+        result = await session.execute(
+            delete(Project).where(
+                Project.id == project_id, Project.version.in_(versions)
+            )
+        )
+        if result.rowcount == 0:
+            raise precondition_failed()
     await session.commit()
 
     return {"message": "Project deleted"}
+
+
+@router.get("/{project_id}/grants", response_model=list[ResourceGrantRead])
+async def list_project_grants(
+    project_id: int,
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(db_helper.read_session_getter),
+):
+    project = await _get_project(project_id, user, session)
+
+    allowed = await AuthorizationService.check_permission(
+        user=user,
+        element_name="projects",
+        action="read",
+        resource_owner_id=project.owner_id,
+        resource_id=project.id,
+        session=session,
+    )
+
+    if not allowed:
+        raise HTTPException(403, "No permission to read this project")
+
+    result = await session.execute(
+        select(ResourceGrant).where(
+            ResourceGrant.element_id == AuthorizationService.element_id("projects"),
+            ResourceGrant.object_id == project_id,
+        )
+    )
+    return [_grant_read(grant) for grant in result.scalars()]
+
+
+@router.post("/{project_id}/grants", response_model=ResourceGrantRead)
+async def share_project(
+    project_id: int,
+    data: ResourceGrantCreate,
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    """
+    Выдать пользователю или роли доступ к проекту.
+    Повторная выдача тому же получателю заменяет набор действий.
+    Выдавать и отзывать доступ может только владелец с правом update или
+    роль с update_all — гранты на проект сами не дают права ими управлять.
+    """
+    project = await _get_project(project_id, user, session)
+
+    allowed = await AuthorizationService.check_permission(
+        user=user,
+        element_name="projects",
+        action="update",
+        resource_owner_id=project.owner_id,
+        resource_id=project.id,
+        session=session,
+        use_grants=False,
+    )
+
+    if not allowed:
+        raise HTTPException(403, "No permission to share this project")
+
+    # Получатель должен принадлежать тому же арендатору
+    grantee = User if data.principal_type == "user" else Role
+    exists_in_tenant = await session.scalar(
+        select(grantee.id).where(
+            grantee.id == data.principal_id, grantee.tenant_id == user.tenant_id
+        )
+    )
+    if exists_in_tenant is None:
+        raise HTTPException(404, f"{data.principal_type.capitalize()} not found")
+
+    stmt = insert(ResourceGrant).values(
+        tenant_id=user.tenant_id,
+        element_id=AuthorizationService.element_id("projects"),
+        object_id=project_id,
+        principal_type=data.principal_type,
+        principal_id=data.principal_id,
+        actions=pack_actions(data.actions),
+    )
+    result = await session.execute(
+        stmt.on_conflict_do_update(
+            constraint="unique_resource_grant",
+            set_={"actions": stmt.excluded.actions},
+        ).returning(ResourceGrant)
+    )
+    grant = result.scalar_one()
+    await session.commit()
+
+    return _grant_read(grant)
+
+
+@router.delete("/{project_id}/grants/{grant_id}")
+async def revoke_project_grant(
+    project_id: int,
+    grant_id: int,
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(db_helper.session_getter),
+):
+    project = await _get_project(project_id, user, session)
+
+    allowed = await AuthorizationService.check_permission(
+        user=user,
+        element_name="projects",
+        action="update",
+        resource_owner_id=project.owner_id,
+        resource_id=project.id,
+        session=session,
+        use_grants=False,
+    )
+
+    if not allowed:
+        raise HTTPException(403, "No permission to share this project")
+
+    result = await session.execute(
+        delete(ResourceGrant).where(
+            ResourceGrant.id == grant_id,
+            ResourceGrant.element_id == AuthorizationService.element_id("projects"),
+            ResourceGrant.object_id == project_id,
+        )
+    )
+    if result.rowcount == 0:
+        raise HTTPException(404, "Grant not found")
+    await session.commit()
+
+    return {"message": "Grant revoked"}
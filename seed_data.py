@@ -1,6 +1,9 @@
 """
 Скрипт для заполнения БД тестовыми данными.
 Запуск: python seed_data.py
+
+Для нагрузочного тестирования на больших объёмах используйте
+генератор синтетических данных: python -m perf.datagen --help
 """
 
 import asyncio
@@ -0,0 +1,71 @@
+"""
+Запуск приложения в production.
+Запуск: python server.py
+
+Параметры берутся из настроек APP_CONFIG__RUN__* (config.RunConfig): число
+воркеров, event loop (uvloop) и HTTP-парсер (httptools), keep-alive, backlog,
+лимит соединений и время мягкой остановки. uvloop и httptools ставятся
+отдельно: pip install uvloop httptools (или poetry install -E server).
+
+Каждый воркер — отдельный процесс со своим lifespan: пул соединений с БД,
+кэши и фоновые задачи создаются в нём заново (см. core.worker). Всего
+соединений с БД: workers × (pool_size + max_overflow).
+"""
+
+import importlib.util
+import os
+import sys
+
+import uvicorn
+
+from config import RunConfig, settings
+
+# Значение настройки → модуль, без которого uvicorn не запустится
+OPTIONAL_MODULES = {"uvloop": "uvloop", "httptools": "httptools"}
+
+
+def uvicorn_options(run: RunConfig) -> dict:
+    """
+    :param run: Настройки запуска
+    :return: dict: Аргументы uvicorn.run
+    """
+    return {
+        "host": run.host,
+        "port": run.port,
+        "workers": run.workers or os.cpu_count() or 1,
+        "loop": run.loop,
+        "http": run.http,
+        "backlog": run.backlog,
+        "timeout_keep_alive": run.keep_alive,
+        "limit_concurrency": run.limit_concurrency or None,
+        "limit_max_requests": run.limit_max_requests or None,
+        "timeout_graceful_shutdown": run.graceful_shutdown_timeout,
+        "access_log": run.access_log,
+    }
+
+
+def missing_modules(run: RunConfig) -> list[str]:
+    """Явно выбранные loop/http, модули которых не установлены"""
+    return [
+        OPTIONAL_MODULES[choice]
+        for choice in (run.loop, run.http)
+        if choice in OPTIONAL_MODULES
+        and importlib.util.find_spec(OPTIONAL_MODULES[choice]) is None
+    ]
+
+
+def main() -> None:
+    missing = missing_modules(settings.run)
+    if missing:
+        print(f"Не установлены: {', '.join(missing)} (pip install {' '.join(missing)})")
+        sys.exit(1)
+    options = uvicorn_options(settings.run)
+    print(
+        f"🚀 Воркеров: {options['workers']}, loop={options['loop']}, "
+        f"http={options['http']}, {options['host']}:{options['port']}"
+    )
+    uvicorn.run("main:app", **options)
+
+
+if __name__ == "__main__":
+    main()
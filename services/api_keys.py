@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import and_, bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from core.db_helper import db_helper
+from core.metrics import api_key_auth, registry
+from core.models import ApiKey, Role, User, UserRole
+from core.principal import Principal
+from core.singleflight import SingleFlight
+
+logger = logging.getLogger("app.api_keys")
+
+API_KEY_MARKER = "ak_"
+PREFIX_LENGTH = 12
+API_KEYS = ApiKey.__table__
+
+# Параллельные запросы с одним ключом читают его из БД один раз
+key_loads = SingleFlight("api_key")
+
+
+class VerifiedKeys:
+    """
+    Проверенные ключи: HMAC ключа → (Principal, id ключа, срок записи).
+    Запись живёт ttl секунд, но не дольше expires_at ключа.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 10_000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[Principal, int, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key_hash: str) -> Optional[tuple[Principal, int]]:
+        entry = self._entries.get(key_hash)
+        if entry is None:
+            return None
+        principal, key_id, valid_until = entry
+        if valid_until <= self.clock():
+            del self._entries[key_hash]
+            return None
+        self._entries.move_to_end(key_hash)
+        return principal, key_id
+
+    def put(
+        self,
+        key_hash: str,
+        principal: Principal,
+        key_id: int,
+        expires_at: Optional[datetime],
+    ) -> None:
+        if self.ttl <= 0:
+            return
+        valid_until = self.clock() + self.ttl
+        if expires_at is not None:
+            valid_until = min(valid_until, expires_at.timestamp())
+        self._entries[key_hash] = (principal, key_id, valid_until)
+        self._entries.move_to_end(key_hash)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key_id: int) -> None:
+        """Удаляет ключ из памяти этого процесса (отзыв)"""
+        for key_hash, (_, cached_id, _) in list(self._entries.items()):
+            if cached_id == key_id:
+                del self._entries[key_hash]
+
+
+class LastUsedTracker:
+    """
+    Отложенная запись last_used_at: в памяти хранится только последнее
+    использование каждого ключа, фоновая задача раз в interval записывает
+    их одним executemany UPDATE. При аварийном завершении теряется не
+    больше interval секунд истории использования.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        interval: float = 10.0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.interval = interval
+        self._pending: dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def touch(self, key_id: int) -> None:
+        self._pending[key_id] = datetime.now(timezone.utc)
+
+    async def flush(self) -> int:
+        """
+        :return: int: Число обновлённых ключей
+        """
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        try:
+            async with self.session_factory() as session:
+                await session.execute(
+                    update(API_KEYS)
+                    .where(API_KEYS.c.id == bindparam("key_id"))
+                    .values(last_used_at=bindparam("used_at")),
+                    [
+                        {"key_id": key_id, "used_at": used_at}
+                        for key_id, used_at in batch.items()
+                    ],
+                )
+                await session.commit()
+        except Exception:
+            # Более поздние использования, пришедшие во время записи, важнее
+            self._pending = {**batch, **self._pending}
+            raise
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось записать last_used_at API-ключей")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу и записывает накопленное"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Потеряно last_used_at API-ключей: %d", self.pending)
+
+
+class ApiKeyService:
+    """
+    API-ключи сервисных клиентов.
+    Формат ключа: ak_<prefix>_<secret>. Проверка — поиск по уникальному
+    индексу prefix и сравнение HMAC-SHA256 (секрет сервера как ключ HMAC),
+    без bcrypt: у ключа 256 бит случайности, подбор по словарю невозможен.
+    """
+
+    @staticmethod
+    def generate() -> tuple[str, str]:
+        """
+        :return: tuple[str, str]: (ключ целиком — показывается один раз, prefix)
+        """
+        prefix = secrets.token_hex(PREFIX_LENGTH // 2)
+        return f"{API_KEY_MARKER}{prefix}_{secrets.token_urlsafe(32)}", prefix
+
+    @staticmethod
+    def is_api_key(credential: str) -> bool:
+        return credential.startswith(API_KEY_MARKER)
+
+    @staticmethod
+    def hash_key(key: str) -> str:
+        return hmac.new(
+            settings.auth.secret_key.encode(), key.encode(), hashlib.sha256
+        ).hexdigest()
+
+    @staticmethod
+    def parse_prefix(key: str) -> Optional[str]:
+        prefix, sep, secret = key[len(API_KEY_MARKER) :].partition("_")
+        if not sep or not secret or len(prefix) != PREFIX_LENGTH:
+            return None
+        return prefix
+
+    @staticmethod
+    async def _load(prefix: str, session: AsyncSession) -> list:
+        """
+        Ключ, его владелец и роли владельца в пределах role_ids ключа —
+        один запрос по индексу prefix.
+        """
+        stmt = (
+            select(
+                ApiKey.id.label("key_id"),
+                ApiKey.key_hash,
+                ApiKey.expires_at,
+                ApiKey.revoked,
+                User.id,
+                User.tenant_id,
+                User.email,
+                User.is_active,
+                User.created_at,
+                Role.id.label("role_id"),
+                Role.name.label("role_name"),
+            )
+            .join(User, User.id == ApiKey.user_id)
+            .outerjoin(UserRole, UserRole.user_id == User.id)
+            .outerjoin(
+                Role,
+                and_(Role.id == UserRole.role_id, Role.id == ApiKey.role_ids.any_()),
+            )
+            .where(ApiKey.prefix == prefix)
+            .order_by(Role.id)
+        )
+        return (await session.execute(stmt)).all()
+
+    @classmethod
+    async def authenticate(cls, key: str, session: AsyncSession) -> Optional[Principal]:
+        """
+        Проверка API-ключа.
+        :return: Optional[Principal]: Владелец ключа с ролями, ограниченными
+            ключом, или None — ключ неизвестен, отозван или истёк
+        """
+        key_hash = cls.hash_key(key)
+        cached = verified_keys.get(key_hash)
+        if cached is not None:
+            principal, key_id = cached
+            api_key_auth.inc(result="cached")
+            last_used.touch(key_id)
+            return principal
+
+        prefix = cls.parse_prefix(key)
+        if prefix is None:
+            api_key_auth.inc(result="rejected")
+            return None
+        rows = await key_loads.do(
+            (prefix, session.bind), lambda: cls._load(prefix, session)
+        )
+        if not rows:
+            api_key_auth.inc(result="rejected")
+            return None
+        first = rows[0]
+        now = datetime.now(timezone.utc)
+        if (
+            not hmac.compare_digest(first.key_hash, key_hash)
+            or first.revoked
+            or (first.expires_at is not None and first.expires_at <= now)
+        ):
+            api_key_auth.inc(result="rejected")
+            return None
+
+        roles = [
+            (row.role_id, row.role_name) for row in rows if row.role_id is not None
+        ]
+        principal = Principal(
+            id=first.id,
+            tenant_id=first.tenant_id,
+            email=first.email,
+            is_active=first.is_active,
+            created_at=first.created_at,
+            role_ids=frozenset(role_id for role_id, _ in roles),
+            role_names=tuple(name for _, name in roles),
+        )
+        verified_keys.put(key_hash, principal, first.key_id, first.expires_at)
+        api_key_auth.inc(result="ok")
+        last_used.touch(first.key_id)
+        return principal
+
+
+verified_keys = VerifiedKeys(settings.auth.api_key_cache_ttl)
+last_used = LastUsedTracker(
+    db_helper.session_factory, interval=settings.auth.api_key_last_used_interval
+)
+registry.gauge(
+    "api_key_last_used_pending",
+    "API-ключи с незаписанным last_used_at",
+    collect=lambda: last_used.pending,
+)
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import astuple, dataclass, field
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from core.db_helper import db_helper
+from core.metrics import audit_events, audit_events_dropped, audit_flushes, registry
+from core.models import AuditEvent
+
+logger = logging.getLogger("app.audit")
+
+AUDIT_TABLE = AuditEvent.__tablename__
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+
+
+@dataclass(slots=True)
+class PendingAuditEvent:
+    """Событие аудита в очереди; порядок полей совпадает с AUDIT_COLUMNS"""
+
+    event: str
+    outcome: str
+    tenant_id: Optional[int] = None
+    user_id: Optional[int] = None
+    element: Optional[str] = None
+    action: Optional[str] = None
+    object_id: Optional[int] = None
+    client_ip: Optional[str] = None
+    detail: Optional[str] = None
+    occurred_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+AUDIT_COLUMNS = [name for name in PendingAuditEvent.__dataclass_fields__]
+
+
+def month_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_ddl(month: date) -> str:
+    """
+    :param month: Первое число месяца
+    :return: str: CREATE TABLE для месячной секции audit_events
+    """
+    return (
+        f"CREATE TABLE IF NOT EXISTS {AUDIT_TABLE}_{month:%Y_%m} "
+        f"PARTITION OF {AUDIT_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+
+class AuditLog:
+    """
+    Асинхронный журнал аудита.
+    record() только ставит событие в очередь процесса — запрос не ждёт БД.
+    Фоновая задача записывает очередь пачками через COPY не реже раза
+    в flush_interval. Очередь ограничена max_pending; при переполнении
+    действует политика overflow:
+      drop_newest — новое событие отбрасывается;
+      drop_oldest — вытесняется самое старое событие очереди;
+      block — запрос будит запись и ждёт места не дольше block_timeout,
+              затем событие отбрасывается.
+    Потерянные события считаются в audit_events_dropped_total{reason}.
+    При ошибке записи события остаются в очереди и записываются повторно.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        enabled: bool = True,
+        flush_interval: float = 1.0,
+        max_batch: int = 1000,
+        max_pending: int = 50_000,
+        overflow: str = "drop_newest",
+        block_timeout: float = 0.1,
+        partitions_ahead: int = 2,
+    ) -> None:
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.partitions_ahead = partitions_ahead
+        self._queue: deque[PendingAuditEvent] = deque()
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Месяцы, для которых секции уже созданы (верхняя граница, не включая)
+        self._partitions_until: Optional[date] = None
+        # Месяцы, оставленные в секции по умолчанию (предупреждение — один раз)
+        self._default_months: set[date] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    async def record(self, event: str, outcome: str, **fields) -> bool:
+        """
+        Ставит событие в очередь.
+        :param event: Тип события: authz, login, refresh, logout
+        :param outcome: Результат: allow/deny, success/failure
+        :param fields: Поля PendingAuditEvent (tenant_id, user_id, element, ...)
+        :return: bool: False — событие отброшено политикой переполнения
+        """
+        if not self.enabled:
+            return False
+        if len(self._queue) >= self.max_pending:
+            if self.overflow == "drop_oldest":
+                self._queue.popleft()
+                audit_events_dropped.inc(reason="evicted")
+            elif self.overflow == "block":
+                self._drained.clear()
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(self._drained.wait(), self.block_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                if len(self._queue) >= self.max_pending:
+                    audit_events_dropped.inc(reason="timeout")
+                    return False
+            else:
+                audit_events_dropped.inc(reason="queue_full")
+                return False
+        self._queue.append(PendingAuditEvent(event, outcome, **fields))
+        if len(self._queue) >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """
+        Записывает всю очередь.
+        :return: int: Число записанных событий
+        """
+        written = 0
+        async with self._lock:
+            while self._queue:
+                batch = [
+                    self._queue[i] for i in range(min(self.max_batch, len(self._queue)))
+                ]
+                await self._ensure_partitions(batch)
+                try:
+                    await self._write(batch)
+                except Exception:
+                    audit_flushes.inc(result="error")
+                    raise
+                audit_flushes.inc(result="ok")
+                audit_events.inc(len(batch))
+                # drop_oldest мог вытеснить часть пачки, пока шла запись
+                for entry in batch:
+                    if self._queue and self._queue[0] is entry:
+                        self._queue.popleft()
+                written += len(batch)
+                self._drained.set()
+        return written
+
+    async def _write(self, batch: list[PendingAuditEvent]) -> None:
+        async with self.session_factory() as session:
+            connection = await session.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                AUDIT_TABLE,
+                records=[astuple(entry) for entry in batch],
+                columns=AUDIT_COLUMNS,
+            )
+            await session.commit()
+
+    async def _ensure_partitions(self, batch: list[PendingAuditEvent]) -> None:
+        """
+        Создаёт месячные секции от месяца старейшего события до
+        partitions_ahead месяцев вперёд, каждую в своей транзакции: ошибка
+        одного месяца не мешает следующим. Ошибка не мешает и записи —
+        события попадут в секцию по умолчанию; повторная попытка — при
+        следующей записи. Месяц, строки которого уже лежат в секции по
+        умолчанию, остаётся в ней: CREATE ... PARTITION OF для него
+        невозможен без переноса строк.
+        """
+        first = month_start(min(entry.occurred_at for entry in batch))
+        until = month_start(max(entry.occurred_at for entry in batch))
+        for _ in range(self.partitions_ahead + 1):
+            until = next_month(until)
+        if self._partitions_until is not None and until <= self._partitions_until:
+            return
+        failed = False
+        month = first
+        while month < until:
+            if month not in self._default_months:
+                try:
+                    await self._create_partition(month)
+                except Exception:
+                    logger.exception(
+                        "Не удалось создать секцию журнала аудита за %s", month
+                    )
+                    failed = True
+            month = next_month(month)
+        if not failed:
+            self._partitions_until = until
+
+    async def _create_partition(self, month: date) -> None:
+        async with self.session_factory() as session:
+            in_default = await session.scalar(
+                text(
+                    f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                    "WHERE occurred_at >= :start AND occurred_at < :end)"
+                ),
+                {"start": month, "end": next_month(month)},
+            )
+            if in_default:
+                self._default_months.add(month)
+                logger.warning(
+                    "События аудита за %s уже в %s: секция за месяц не создаётся",
+                    month,
+                    DEFAULT_PARTITION,
+                )
+                return
+            await session.execute(text(partition_ddl(month)))
+            await session.commit()
+
+    async def _run(self) -> None:
+        backoff = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                backoff = self.flush_interval
+            except Exception:
+                # События остаются в очереди; её размер ограничен политикой overflow
+                logger.exception("Не удалось записать журнал аудита")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            # События привязываются к циклу при первом ожидании: при повторном
+            # запуске приложения (тесты, reload) цикл уже другой
+            self._wakeup = asyncio.Event()
+            self._drained = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу и записывает остаток очереди"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue:
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Потеряно событий аудита: %d", len(self._queue))
+                audit_events_dropped.inc(len(self._queue), reason="shutdown")
+                self._queue.clear()
+
+
+audit_log = AuditLog(
+    db_helper.session_factory,
+    enabled=settings.audit.enabled,
+    flush_interval=settings.audit.flush_interval,
+    max_batch=settings.audit.flush_batch,
+    max_pending=settings.audit.max_pending,
+    overflow=settings.audit.overflow,
+    block_timeout=settings.audit.block_timeout,
+    partitions_ahead=settings.audit.partitions_ahead,
+)
+registry.gauge(
+    "audit_events_pending",
+    "События аудита в очереди на запись",
+    collect=lambda: audit_log.pending,
+)
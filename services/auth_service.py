@@ -1,19 +1,34 @@
+import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
 from fastapi import Depends, HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 from config import settings
 from core.db_helper import db_helper
-from core.models import RefreshToken, Role, User
+from core.metrics import auth_operation_duration, auth_password_rehash
+from core.models import DEFAULT_TENANT_ID, RefreshToken, Role, User
+from core.principal import Principal
+from core.profiling import span
 from core.schemas import UserCreate
+from core.token_cache import TokenCache
+from services.password_hashing import PasswordHashing
+from services.rate_limit import hash_limiter
+from services.refresh_token_writer import refresh_writer
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext()
+PasswordHashing.configure(pwd_context, calibrate=False)
+
+access_token_cache = TokenCache(
+    settings.auth.token_cache_size,
+    max_per_tenant=settings.auth.token_cache_per_tenant,
+)
 
 
 class AuthService:
@@ -30,7 +45,8 @@ class AuthService:
         :param password: Пароль в открытом виде
         :return: str: Хешированный пароль
         """
-        return pwd_context.hash(password)
+        with auth_operation_duration.time(operation="password_hash"):
+            return pwd_context.hash(password)
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -40,7 +56,21 @@ class AuthService:
         :param hashed_password: Хранимый хеш пароля
         :return:  bool: True если пароли совпадают, иначе False
         """
-        return pwd_context.verify(plain_password, hashed_password)
+        with auth_operation_duration.time(operation="password_verify"):
+            return pwd_context.verify(plain_password, hashed_password)
+
+    @staticmethod
+    def verify_and_update_password(
+        plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
+        """
+        Проверка пароля с перехешированием под текущие параметры.
+        :param plain_password: Пароль для проверки
+        :param hashed_password: Хранимый хеш пароля
+        :return: tuple: (пароль верен, новый хеш или None, если обновление не нужно)
+        """
+        with auth_operation_duration.time(operation="password_verify"):
+            return pwd_context.verify_and_update(plain_password, hashed_password)
 
     @staticmethod
     def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
@@ -55,83 +85,190 @@ class AuthService:
             expires_delta or timedelta(minutes=settings.auth.ACCESS_EXPIRE_MINUTES)
         )
         to_encode.update({"exp": int(expire.timestamp())})
-        return jwt.encode(
-            to_encode,
-            settings.auth.secret_key,
-            algorithm=settings.auth.algorithm,
-        )
+        with auth_operation_duration.time(operation="access_token_encode"):
+            return jwt.encode(
+                to_encode,
+                settings.auth.secret_key,
+                algorithm=settings.auth.algorithm,
+            )
 
     @staticmethod
-    def create_refresh_token(user_id: int) -> str:
-        """Создает обновленный JWT-токен"""
+    def create_refresh_token(user_id: int, tenant_id: int = DEFAULT_TENANT_ID) -> str:
+        """
+        Создает обновленный JWT-токен.
+        jti делает каждый токен уникальным: иначе токены пользователя
+        совпадают байт в байт и неотличимы в очереди refresh_writer.
+        """
 
         expires = timedelta(days=settings.auth.REFRESH_EXPIRE_DAYS)
-        return jwt.encode(
-            {"sub": str(user_id), "type": "refresh"},
+        with auth_operation_duration.time(operation="refresh_token_encode"):
+            return jwt.encode(
+                {
+                    "sub": str(user_id),
+                    "tid": tenant_id,
+                    "type": "refresh",
+                    "jti": secrets.token_hex(16),
+                },
+                settings.auth.secret_key,
+                algorithm=settings.auth.algorithm,
+            )
+
+    @staticmethod
+    def decode_access_token(token: str) -> dict:
+        """
+        Проверка подписи и срока access-токена.
+        Повторные запросы с тем же токеном берут claims из кэша до его exp.
+        :param token: JWT-токен
+        :return: dict: Claims токена
+        :raises JWTError: Токен недействителен
+        """
+        with span("token_decode"):
+            claims = access_token_cache.get(token)
+            if claims is None:
+                with auth_operation_duration.time(operation="jwt_decode"):
+                    claims = jwt.decode(
+                        token,
+                        settings.auth.secret_key,
+                        algorithms=[settings.auth.algorithm],
+                    )
+                access_token_cache.put(token, claims)
+        return claims
+
+    @staticmethod
+    def _hash_refresh_token(refresh_token: str) -> str:
+        with auth_operation_duration.time(operation="refresh_token_hash"):
+            return pwd_context.hash(refresh_token)
+
+    @staticmethod
+    def warmup() -> None:
+        """
+        Загружает бэкенды bcrypt и JWT до первого запроса.
+        Хеш считается с минимальной стоимостью, чтобы не задерживать старт.
+        """
+        pwd_context.handler().using(rounds=4).hash("warmup")
+        token = jwt.encode(
+            {"sub": "warmup"},
             settings.auth.secret_key,
             algorithm=settings.auth.algorithm,
         )
+        jwt.decode(
+            token, settings.auth.secret_key, algorithms=[settings.auth.algorithm]
+        )
+
+    @classmethod
+    async def _store_refresh_token(
+        cls,
+        user_id: int,
+        refresh_token: str,
+        session: AsyncSession,
+        revoke_previous: bool,
+        tenant_id: int = DEFAULT_TENANT_ID,
+    ) -> None:
+        """
+        Сохраняет хеш refresh-токена: в сессию (commit делает вызывающий код)
+        или в очередь отложенной записи, если она включена.
+        :param revoke_previous: Отозвать ранее выданные токены пользователя
+        :param tenant_id: Арендатор пользователя
+        """
+        hashed = await hash_limiter.run(cls._hash_refresh_token, refresh_token)
+        expires_at = datetime.now(timezone.utc) + timedelta(
+            days=settings.auth.REFRESH_EXPIRE_DAYS
+        )
+        if refresh_writer.enabled:
+            await refresh_writer.submit(
+                user_id,
+                refresh_token,
+                hashed,
+                expires_at,
+                revoke_previous,
+                tenant_id=tenant_id,
+            )
+            return
+
+        if revoke_previous:
+            stmt = select(RefreshToken).where(
+                RefreshToken.user_id == user_id,
+                RefreshToken.revoked == False,
+            )
+            result = await session.execute(stmt)
+            for token in result.scalars().all():
+                token.revoked = True
+        session.add(
+            RefreshToken(
+                tenant_id=tenant_id,
+                user_id=user_id,
+                token_hash=hashed,
+                expires_at=expires_at,
+                revoked=False,
+            )
+        )
 
     @classmethod
     async def persist_refresh_token(
-        cls, user_id: int, refresh_token: str, session: AsyncSession
+        cls,
+        user_id: int,
+        refresh_token: str,
+        session: AsyncSession,
+        tenant_id: int = DEFAULT_TENANT_ID,
     ):
-        stmt = select(RefreshToken).where(
-            RefreshToken.user_id == user_id,
-            RefreshToken.revoked == False,
-        )
-        result = await session.execute(stmt)
-        for token in result.scalars().all():
-            token.revoked = True
-
-        hashed = pwd_context.hash(refresh_token)
-        new_token = RefreshToken(
-            user_id=user_id,
-            token_hash=hashed,
-            expires_at=datetime.now(timezone.utc)
-            + timedelta(days=settings.auth.REFRESH_EXPIRE_DAYS),
-            revoked=False,
+        await cls._store_refresh_token(
+            user_id, refresh_token, session, revoke_previous=True, tenant_id=tenant_id
         )
-        session.add(new_token)
-        await session.commit()
+        if session.new or session.dirty:
+            await session.commit()
 
     @classmethod
     async def register(
         cls,
         user_data: UserCreate,
         session: AsyncSession = Depends(db_helper.session_getter),
-    ) -> User:
+    ) -> Principal:
         """
-        Регистрация нового пользователя.
+        Регистрация нового пользователя в арендаторе по умолчанию.
+        Проверка email и вставка — один INSERT ... ON CONFLICT ... RETURNING.
+        :return: Principal: Созданный пользователь (без ролей)
         """
         if not user_data.email or not user_data.password:
             raise HTTPException(status_code=400, detail="Email и пароль обязательны")
 
-        existing_user = await session.execute(
-            select(User).where(User.email == user_data.email)
-        )
-        if existing_user.scalar_one_or_none():
-            raise HTTPException(
-                status_code=400, detail="Пользователь с таким email уже существует"
-            )
-
-        user = User(
-            email=user_data.email,
-            pass_hash=cls.get_password_hash(user_data.password),
-            is_active=True,
-        )
-
-        session.add(user)
+        pass_hash = await hash_limiter.run(cls.get_password_hash, user_data.password)
         try:
+            result = await session.execute(
+                insert(User)
+                .values(email=user_data.email, pass_hash=pass_hash, is_active=True)
+                .on_conflict_do_nothing(index_elements=[User.email])
+                .returning(
+                    User.id,
+                    User.tenant_id,
+                    User.email,
+                    User.is_active,
+                    User.created_at,
+                )
+            )
+            row = result.one_or_none()
+            if row is None:
+                raise HTTPException(
+                    status_code=400, detail="Пользователь с таким email уже существует"
+                )
             await session.commit()
-            await session.refresh(user)
-            return user
+        except HTTPException:
+            raise
         except Exception as e:
             await session.rollback()
             raise HTTPException(
                 status_code=500, detail=f"Ошибка при создании пользователя: {str(e)}"
             )
 
+        return Principal(
+            id=row.id,
+            tenant_id=row.tenant_id,
+            email=row.email,
+            is_active=row.is_active,
+            created_at=row.created_at,
+            role_ids=frozenset(),
+            role_names=(),
+        )
+
     @classmethod
     async def authenticate(
         cls, email: str, password: str, session: AsyncSession
@@ -155,32 +292,44 @@ class AuthService:
         )
         result = await session.execute(stmt)
         user = result.scalar_one_or_none()
-        if not user or not cls.verify_password(password, user.pass_hash):
+        if not user:
+            raise HTTPException(status_code=401, detail="Неверный email или пароль")
+        verified, new_hash = await hash_limiter.run(
+            cls.verify_and_update_password, password, user.pass_hash
+        )
+        if not verified:
             raise HTTPException(status_code=401, detail="Неверный email или пароль")
 
         if not user.is_active:
             raise HTTPException(
                 status_code=403, detail="Аккаунт деактивирован"  # Доступ запрещён
             )
-        access_token = cls.create_access_token({"sub": str(user.id)})
-        refresh_token = cls.create_refresh_token(user.id)
-
-        hashed_refresh = pwd_context.hash(refresh_token)
-        db_refresh_token = RefreshToken(
-            user_id=user.id,
-            token_hash=hashed_refresh,
-            expires_at=datetime.now(timezone.utc)
-            + timedelta(days=settings.auth.REFRESH_EXPIRE_DAYS),
-            revoked=False,
+        if new_hash is not None:
+            # Сохраняется тем же commit'ом, что и refresh-токен
+            user.pass_hash = new_hash
+            auth_password_rehash.inc()
+        access_token = cls.create_access_token(
+            {"sub": str(user.id), "tid": user.tenant_id}
+        )
+        refresh_token = cls.create_refresh_token(user.id, user.tenant_id)
+
+        await cls._store_refresh_token(
+            user.id,
+            refresh_token,
+            session,
+            revoke_previous=False,
+            tenant_id=user.tenant_id,
         )
-        session.add(db_refresh_token)
-        await session.commit()
+        # При отложенной записи commit нужен только для перехеширования пароля
+        if session.new or session.dirty:
+            await session.commit()
 
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
             "token_type": "bearer",
             "user_id": user.id,
+            "tenant_id": user.tenant_id,
         }
 
     @classmethod
@@ -198,24 +347,32 @@ class AuthService:
     @classmethod
     async def verify_refresh_token(
         cls, refresh_token: str, session: AsyncSession
-    ) -> Optional[int]:
+    ) -> Optional[tuple[int, int]]:
         """
-        Проверяет refresh токен и возвращает user_id, если токен валиден.
+        Проверяет refresh токен.
+        :return: Optional[tuple[int, int]]: (user_id, tenant_id), если токен валиден
         """
         print(">>> Verifying refresh token")
         try:
-            payload = jwt.decode(
-                refresh_token,
-                settings.auth.secret_key,
-                algorithms=[settings.auth.algorithm],
-            )
+            with auth_operation_duration.time(operation="jwt_decode"):
+                payload = jwt.decode(
+                    refresh_token,
+                    settings.auth.secret_key,
+                    algorithms=[settings.auth.algorithm],
+                )
             user_id = int(payload.get("sub"))
+            tenant_id = int(payload.get("tid", DEFAULT_TENANT_ID))
             if payload.get("type") != "refresh":
                 return None
         except (JWTError, ValueError):
             return None
 
+        pending = refresh_writer.lookup(user_id, refresh_token)
+        if pending is not None:
+            return (user_id, tenant_id) if pending else None
+
         stmt = select(RefreshToken).where(
+            RefreshToken.tenant_id == tenant_id,
             RefreshToken.user_id == user_id,
             RefreshToken.revoked == False,
             RefreshToken.expires_at > datetime.now(timezone.utc),
@@ -225,8 +382,12 @@ class AuthService:
         print(f">>> Found {len(tokens)} tokens for user {user_id}")
 
         for token in tokens:
-            if pwd_context.verify(refresh_token, token.token_hash):
+            with auth_operation_duration.time(operation="refresh_token_verify"):
+                matched = await hash_limiter.run(
+                    pwd_context.verify, refresh_token, token.token_hash
+                )
+            if matched:
                 print(">>> Refresh token matched")
-                return user_id
+                return user_id, tenant_id
 
         return None
@@ -1,32 +1,155 @@
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, and_, exists, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from core.models import AccessRule, BusinessElement, User
+from core.models import AccessRule, BusinessElement, ResourceGrant
+from core.principal import (
+    GRANT_ACTIONS,
+    RULE_COLUMNS,
+    Principal,
+    is_allowed,
+    pack_rule,
+)
+from core.profiling import span
+from core.singleflight import SingleFlight
+from services.audit_log import audit_log
+
+# Параллельные проверки с одинаковым набором ролей читают правила один раз
+rule_loads = SingleFlight("access_rules")
 
 
 class AuthorizationService:
     """Сервис для проверки прав доступа к ресурсам"""
 
+    @staticmethod
+    async def _load_rules(
+        tenant_id: int,
+        role_ids: frozenset[int],
+        element_name: str,
+        session: AsyncSession,
+    ) -> int:
+        """
+        Объединённые права ролей на ресурс одним запросом.
+        :return: int: Битовая маска Permission (0 — ресурса или правил нет)
+        """
+        stmt = (
+            select(*(getattr(AccessRule, column) for _, column in RULE_COLUMNS))
+            .join(BusinessElement, AccessRule.element_id == BusinessElement.id)
+            .where(
+                BusinessElement.name == element_name,
+                AccessRule.tenant_id == tenant_id,
+                AccessRule.role_id.in_(sorted(role_ids)),
+            )
+        )
+        result = await session.execute(stmt)
+        mask = 0
+        for row in result:
+            mask |= pack_rule(row)
+        return mask
+
+    @staticmethod
+    async def get_mask(
+        user: Principal, element_name: str, session: AsyncSession
+    ) -> int:
+        """
+        Объединённые права ролей пользователя на ресурс.
+        :return: int: Битовая маска Permission
+        """
+        if not user.role_ids:
+            return 0
+        return await rule_loads.do(
+            (user.tenant_id, user.role_ids, element_name, session.bind),
+            lambda: AuthorizationService._load_rules(
+                user.tenant_id, user.role_ids, element_name, session
+            ),
+        )
+
+    @staticmethod
+    def _grantee(user: Principal) -> ColumnElement[bool]:
+        """Условие: грант выдан пользователю или одной из его ролей"""
+        condition = and_(
+            ResourceGrant.principal_type == "user",
+            ResourceGrant.principal_id == user.id,
+        )
+        if user.role_ids:
+            condition = or_(
+                condition,
+                and_(
+                    ResourceGrant.principal_type == "role",
+                    ResourceGrant.principal_id.in_(sorted(user.role_ids)),
+                ),
+            )
+        return condition
+
+    @staticmethod
+    def element_id(element_name: str):
+        """Скалярный подзапрос id ресурса по имени (вычисляется один раз)"""
+        return (
+            select(BusinessElement.id)
+            .where(BusinessElement.name == element_name)
+            .scalar_subquery()
+        )
+
+    @staticmethod
+    async def _load_grants(
+        user: Principal, element_name: str, object_id: int, session: AsyncSession
+    ) -> int:
+        """
+        Действия, выданные на объект пользователю и его ролям —
+        один probe по индексу (element_id, object_id).
+        :return: int: Битовая маска GRANT_ACTIONS
+        """
+        stmt = select(func.coalesce(func.bit_or(ResourceGrant.actions), 0)).where(
+            ResourceGrant.tenant_id == user.tenant_id,
+            ResourceGrant.element_id == AuthorizationService.element_id(element_name),
+            ResourceGrant.object_id == object_id,
+            AuthorizationService._grantee(user),
+        )
+        return await session.scalar(stmt)
+
+    @staticmethod
+    def granted(
+        user: Principal, element_name: str, object_id_column, action: str = "read"
+    ) -> ColumnElement[bool]:
+        """
+        EXISTS-условие для фильтрации списков: объект расшарен пользователю
+        или его ролям на действие action. Проверка остаётся в SQL (semi-join),
+        без перебора строк в Python.
+        :param object_id_column: Колонка id объекта во внешнем запросе
+        """
+        return exists().where(
+            ResourceGrant.tenant_id == user.tenant_id,
+            ResourceGrant.element_id == AuthorizationService.element_id(element_name),
+            ResourceGrant.object_id == object_id_column,
+            ResourceGrant.actions.op("&")(GRANT_ACTIONS[action]) != 0,
+            AuthorizationService._grantee(user),
+        )
+
     @staticmethod
     async def check_permission(
-        user: User,
+        user: Principal,
         element_name: str,
         action: str,
         resource_owner_id: Optional[int] = None,
         session: AsyncSession = None,
+        resource_id: Optional[int] = None,
+        use_grants: bool = True,
     ) -> bool:
         """
         Проверяет, может ли пользователь выполнить действие над ресурсом.
 
         Args:
-            user: Пользователь с загруженными roles
+            user: Текущий пользователь (Principal)
             element_name: Название ресурса ("projects", "users", и т.д.)
             action: Действие ("read", "create", "update", "delete")
             resource_owner_id: ID владельца ресурса (для проверки "только свои")
             session: Сессия БД
+            resource_id: ID объекта — если правила ролей не разрешают действие,
+                проверяются гранты на этот объект (resource_grants)
+            use_grants: False — только правила ролей; resource_id попадает
+                лишь в журнал аудита (управление грантами)
 
         Returns:
             bool: True если доступ разрешён, иначе False
@@ -34,54 +157,39 @@ class AuthorizationService:
         if not session:
             raise ValueError("Session is required")
 
-        stmt = select(BusinessElement).where(BusinessElement.name == element_name)
-        result = await session.execute(stmt)
-        element = result.scalar_one_or_none()
-
-        if not element:
-            return False
-
-        user_role_ids = [role.id for role in user.roles]
-
-        if not user_role_ids:
-            return False
-
-        stmt = select(AccessRule).where(
-            AccessRule.role_id.in_(user_role_ids), AccessRule.element_id == element.id
+        with span("permission_check"):
+            mask = await AuthorizationService.get_mask(user, element_name, session)
+            allowed = is_allowed(mask, action, resource_owner_id, user.id)
+            if (
+                not allowed
+                and use_grants
+                and resource_id is not None
+                and action in GRANT_ACTIONS
+            ):
+                granted = await AuthorizationService._load_grants(
+                    user, element_name, resource_id, session
+                )
+                allowed = bool(granted & GRANT_ACTIONS[action])
+
+        # Решение попадает в очередь журнала; запись в БД — фоновой задачей
+        await audit_log.record(
+            "authz",
+            "allow" if allowed else "deny",
+            tenant_id=user.tenant_id,
+            user_id=user.id,
+            element=element_name,
+            action=action,
+            object_id=resource_id,
         )
-        result = await session.execute(stmt)
-        rules = result.scalars().all()
-
-        if not rules:
-            return False
-
-        for rule in rules:
-            if action == "read" and rule.read_all_permission:
-                return True
-            if action == "update" and rule.update_all_permission:
-                return True
-            if action == "delete" and rule.delete_all_permission:
-                return True
-            if action == "create" and rule.create_permission:
-                return True
-
-            if resource_owner_id is not None and resource_owner_id == user.id:
-                if action == "read" and rule.read_permission:
-                    return True
-                if action == "update" and rule.update_permission:
-                    return True
-                if action == "delete" and rule.delete_permission:
-                    return True
-
-        return False
+        return allowed
 
     @staticmethod
-    async def get_user_permissions(user: User, session: AsyncSession) -> dict:
+    async def get_user_permissions(user: Principal, session: AsyncSession) -> dict:
         """
         Возвращает все права пользователя в структурированном виде.
 
         Args:
-            user: Пользователь с загруженными roles
+            user: Текущий пользователь (Principal)
             session: Сессия БД
 
         Returns:
@@ -95,7 +203,7 @@ class AuthorizationService:
                 ...
             }
         """
-        user_role_ids = [role.id for role in user.roles]
+        user_role_ids = sorted(user.role_ids)
 
         if not user_role_ids:
             return {}
@@ -104,7 +212,10 @@ class AuthorizationService:
         stmt = (
             select(AccessRule)
             .options(selectinload(AccessRule.element))
-            .where(AccessRule.role_id.in_(user_role_ids))
+            .where(
+                AccessRule.tenant_id == user.tenant_id,
+                AccessRule.role_id.in_(user_role_ids),
+            )
         )
         result = await session.execute(stmt)
         rules = result.scalars().all()
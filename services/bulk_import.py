@@ -0,0 +1,229 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import AsyncIterable, Callable, Iterable, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import DEFAULT_TENANT_ID
+from core.schemas import UserImportItem, UserImportResult
+from services.auth_service import AuthService, pwd_context
+from services.rate_limit import hash_limiter
+
+STAGING_TABLE = "_user_import"
+
+CREATE_STAGING_SQL = text(
+    f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        email text NOT NULL,
+        pass_hash text NOT NULL,
+        is_active boolean NOT NULL,
+        roles text[] NOT NULL,
+        position integer NOT NULL
+    ) ON COMMIT DELETE ROWS
+    """
+)
+
+# Один statement: вставка пользователей и их ролей из staging-таблицы.
+# Существующие email пропускаются, роли назначаются только новым пользователям
+# и только из ролей арендатора, в который идёт импорт. Из повторов email
+# в пачке берётся первая строка (position — порядок строки в пачке).
+LOAD_FROM_STAGING_SQL = text(
+    f"""
+    WITH inserted AS (
+        INSERT INTO users (email, pass_hash, is_active, tenant_id)
+        SELECT DISTINCT ON (email) email, pass_hash, is_active, :tenant_id
+        FROM {STAGING_TABLE}
+        ORDER BY email, position
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email
+    ), role_links AS (
+        INSERT INTO user_roles (user_id, role_id)
+        SELECT DISTINCT i.id, r.id
+        FROM inserted i
+        JOIN {STAGING_TABLE} s ON s.email = i.email
+        JOIN roles r ON r.tenant_id = :tenant_id AND r.name = ANY(s.roles)
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM role_links)
+    """
+)
+
+ProgressCallback = Callable[[UserImportResult], None]
+
+
+def _hash_passwords(passwords: list[str]) -> list[str]:
+    """Хеширует пачку паролей (выполняется в дочернем процессе)"""
+    return [AuthService.get_password_hash(password) for password in passwords]
+
+
+class BulkImportService:
+    """
+    Сервис массового импорта пользователей.
+    Открытые пароли хешируются в переданном пуле процессов (bulk_import.py)
+    или, в HTTP-запросе, в пуле потоков под общим лимитом hash_limiter.
+    Пользователи и их роли загружаются через COPY во временную таблицу
+    и один INSERT ... SELECT на пачку.
+    """
+
+    @staticmethod
+    async def hash_passwords(
+        passwords: list[str], executor: Optional[Executor], chunks: int
+    ) -> list[str]:
+        """
+        Хеширование паролей, распределённое по воркерам пула.
+        :param passwords: Пароли в открытом виде
+        :param executor: Пул процессов; None — пул потоков через hash_limiter
+        :param chunks: На сколько частей делить пачку
+        :return: list[str]: Хеши в том же порядке
+        """
+        if not passwords:
+            return []
+        if executor is None:
+            # По одному паролю за слот: вход и регистрация ждут в той же
+            # очереди, а не за целой пачкой импорта
+            hashed = []
+            step = hash_limiter.max_concurrent
+            for i in range(0, len(passwords), step):
+                hashed += await asyncio.gather(
+                    *(
+                        hash_limiter.run(AuthService.get_password_hash, password)
+                        for password in passwords[i : i + step]
+                    )
+                )
+            return hashed
+        loop = asyncio.get_running_loop()
+        size = max(1, -(-len(passwords) // chunks))
+        parts = await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, _hash_passwords, passwords[i : i + size])
+                for i in range(0, len(passwords), size)
+            )
+        )
+        return [hashed for part in parts for hashed in part]
+
+    @classmethod
+    async def _prepare_batch(
+        cls, batch: list[UserImportItem], executor: Optional[Executor], chunks: int
+    ) -> tuple[list[tuple], int]:
+        """Готовит записи для COPY: хеширует открытые пароли, отбрасывает битые хеши"""
+        plain = [item.password for item in batch if item.pass_hash is None]
+        hashed = iter(await cls.hash_passwords(plain, executor, chunks))
+
+        records = []
+        invalid = 0
+        for position, item in enumerate(batch):
+            if item.pass_hash is None:
+                pass_hash = next(hashed)
+            elif pwd_context.identify(item.pass_hash, required=False) is None:
+                invalid += 1
+                continue
+            else:
+                pass_hash = item.pass_hash
+            records.append(
+                (item.email, pass_hash, item.is_active, item.roles, position)
+            )
+        return records, invalid
+
+    @staticmethod
+    async def _load_batch(
+        records: list[tuple], session: AsyncSession, tenant_id: int = DEFAULT_TENANT_ID
+    ) -> tuple[int, int]:
+        """
+        Загружает пачку записей: COPY в staging-таблицу и перенос в users/user_roles.
+        :return: tuple[int, int]: (вставлено пользователей, назначено ролей)
+        """
+        if not records:
+            return 0, 0
+        try:
+            await session.execute(CREATE_STAGING_SQL)
+            connection = await session.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                STAGING_TABLE,
+                records=records,
+                columns=["email", "pass_hash", "is_active", "roles", "position"],
+            )
+            result = await session.execute(
+                LOAD_FROM_STAGING_SQL, {"tenant_id": tenant_id}
+            )
+            inserted, role_links = result.one()
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return inserted, role_links
+
+    @classmethod
+    async def import_users(
+        cls,
+        items: Union[Iterable[UserImportItem], AsyncIterable[UserImportItem]],
+        session: AsyncSession,
+        batch_size: int = 5000,
+        executor: Optional[Executor] = None,
+        workers: int = 1,
+        progress: Optional[ProgressCallback] = None,
+        tenant_id: int = DEFAULT_TENANT_ID,
+    ) -> UserImportResult:
+        """
+        Массовый импорт пользователей.
+        Хеширование следующей пачки идёт параллельно с загрузкой текущей.
+        :param items: Пользователи для импорта (обычный или асинхронный итератор)
+        :param session: Сессия БД
+        :param batch_size: Размер пачки (одна транзакция на пачку)
+        :param executor: Пул процессов для хеширования; None — пул потоков
+            приложения под лимитом hash_limiter (HTTP-запросы)
+        :param workers: На сколько частей делить пачку для executor
+        :param progress: Колбэк, вызываемый после каждой пачки
+        :param tenant_id: Арендатор, в который импортируются пользователи
+        :return: UserImportResult: Статистика импорта
+        """
+        result = UserImportResult()
+        started = time.perf_counter()
+
+        async def batches():
+            batch = []
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            else:
+                for item in items:
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
+
+        pending: Optional[asyncio.Task] = None
+        pending_size = 0
+
+        async def flush() -> None:
+            records, invalid = await pending
+            inserted, role_links = await cls._load_batch(records, session, tenant_id)
+            result.total += pending_size
+            result.inserted += inserted
+            result.invalid += invalid
+            result.skipped += len(records) - inserted
+            result.role_links += role_links
+            result.elapsed_seconds = time.perf_counter() - started
+            result.rows_per_second = result.total / (result.elapsed_seconds or 1)
+            if progress:
+                progress(result)
+
+        async for batch in batches():
+            prepared = asyncio.ensure_future(
+                cls._prepare_batch(batch, executor, workers)
+            )
+            if pending is not None:
+                await flush()
+            pending, pending_size = prepared, len(batch)
+        if pending is not None:
+            await flush()
+
+        return result
@@ -0,0 +1,116 @@
+"""
+Калибровка стоимости хеширования паролей под железо.
+
+Подбор параметров без запуска приложения:
+    python -m services.password_hashing --target-ms 250
+"""
+
+import argparse
+import time
+
+from passlib.context import CryptContext
+
+from config import AuthConfig, settings
+
+# Допустимые границы калибровки: ниже — небезопасно, выше — неразумно долго
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 16
+MAX_ARGON2_TIME_COST = 10
+
+
+class PasswordHashing:
+    """
+    Настройка pwd_context: схема, стоимость и правила перехеширования.
+    Хеши, параметры которых отличаются от целевых, помечаются needs_update
+    и перехешируются при следующем успешном входе.
+    """
+
+    @staticmethod
+    def context_kwargs(scheme: str, cost: int, auth: AuthConfig) -> dict:
+        """
+        Параметры CryptContext для схемы и стоимости.
+        Вторая схема остаётся для проверки старых хешей (deprecated).
+        Допуск +1 к стоимости: воркеры с немного разной калибровкой
+        не перехешируют пароли друг за другом.
+        """
+        legacy = "argon2" if scheme == "bcrypt" else "bcrypt"
+        kwargs = {
+            "schemes": [scheme, legacy],
+            "deprecated": "auto",
+            f"{scheme}__default_rounds": cost,
+            f"{scheme}__min_rounds": cost,
+            f"{scheme}__max_rounds": cost + 1,
+        }
+        if scheme == "argon2":
+            kwargs["argon2__memory_cost"] = auth.argon2_memory_cost
+            kwargs["argon2__parallelism"] = auth.argon2_parallelism
+        return kwargs
+
+    @staticmethod
+    def _measure(context: CryptContext, samples: int = 3) -> float:
+        """Лучшее время одного хеша в секундах"""
+        best = float("inf")
+        for _ in range(samples):
+            started = time.perf_counter()
+            context.hash("calibration")
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    @classmethod
+    def calibrate(cls, target_ms: int, auth: AuthConfig) -> int:
+        """
+        Подбирает стоимость, при которой один хеш занимает не больше target_ms.
+        bcrypt: каждый раунд удваивает время; argon2: время линейно по time_cost.
+        :return: int: rounds для bcrypt или time_cost для argon2
+        """
+        target = target_ms / 1000
+        if auth.password_scheme == "bcrypt":
+            cost = MIN_BCRYPT_ROUNDS
+            context = CryptContext(**cls.context_kwargs("bcrypt", cost, auth))
+            elapsed = cls._measure(context)
+            while cost < MAX_BCRYPT_ROUNDS and elapsed * 2 <= target:
+                cost += 1
+                elapsed *= 2
+            return cost
+
+        context = CryptContext(**cls.context_kwargs("argon2", 1, auth))
+        elapsed = cls._measure(context)
+        return max(1, min(int(target // elapsed), MAX_ARGON2_TIME_COST))
+
+    @classmethod
+    def configure(
+        cls,
+        context: CryptContext,
+        auth: AuthConfig = settings.auth,
+        calibrate: bool = True,
+    ) -> str:
+        """
+        Перенастраивает context на месте (его уже импортировали другие модули).
+        Без калибровки или password_hash_target_ms используется стоимость из конфига.
+        :return: str: Описание выбранных параметров для лога
+        """
+        scheme = auth.password_scheme
+        if calibrate and auth.password_hash_target_ms:
+            cost = cls.calibrate(auth.password_hash_target_ms, auth)
+        elif scheme == "bcrypt":
+            cost = auth.bcrypt_rounds
+        else:
+            cost = auth.argon2_time_cost
+        context.load(cls.context_kwargs(scheme, cost, auth))
+        param = "rounds" if scheme == "bcrypt" else "time_cost"
+        return f"{scheme}, {param}={cost}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target-ms", type=int, required=True)
+    parser.add_argument("--scheme", choices=("bcrypt", "argon2"), default=None)
+    args = parser.parse_args()
+
+    auth = settings.auth.model_copy(
+        update={"password_scheme": args.scheme or settings.auth.password_scheme}
+    )
+    cost = PasswordHashing.calibrate(args.target_ms, auth)
+    name = "BCRYPT_ROUNDS" if auth.password_scheme == "bcrypt" else "ARGON2_TIME_COST"
+    print(f"APP_CONFIG__AUTH__PASSWORD_SCHEME={auth.password_scheme}")
+    print(f"APP_CONFIG__AUTH__{name}={cost}")
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Protocol, TypeVar
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from core.metrics import auth_login_rejected
+from core.profiling import span
+
+logger = logging.getLogger("app.rate_limit")
+
+T = TypeVar("T")
+
+
+class RateLimitBackend(Protocol):
+    """
+    Хранилище счётчиков скользящего окна.
+    incr возвращает (счётчик предыдущего окна, счётчик текущего окна);
+    incr атомарен — по нему параллельные запросы резервируют попытки.
+    """
+
+    async def incr(self, key: str, window_id: int, ttl: int) -> tuple[int, int]: ...
+
+    async def decr(self, key: str, window_id: int) -> None: ...
+
+
+class MemoryBackend:
+    """
+    Счётчики в памяти процесса: лимиты действуют в пределах одного воркера.
+    Число ключей ограничено max_keys, самые старые вытесняются.
+    """
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        # ключ → [номер окна, счётчик окна, счётчик предыдущего окна];
+        # порядок — по началу окна ключа, устаревшие ключи в начале
+        self._windows: OrderedDict[str, list[int]] = OrderedDict()
+
+    def _entry(self, key: str, window_id: int) -> Optional[list[int]]:
+        entry = self._windows.get(key)
+        if entry is None or entry[0] == window_id:
+            return entry
+        # Окно сдвинулось: текущий счётчик становится предыдущим
+        previous = entry[1] if entry[0] == window_id - 1 else 0
+        entry[:] = [window_id, 0, previous]
+        self._windows.move_to_end(key)
+        return entry
+
+    async def incr(self, key: str, window_id: int, ttl: int) -> tuple[int, int]:
+        entry = self._entry(key, window_id)
+        if entry is None:
+            self._evict(window_id)
+            entry = self._windows[key] = [window_id, 0, 0]
+        entry[1] += 1
+        return entry[2], entry[1]
+
+    async def decr(self, key: str, window_id: int) -> None:
+        entry = self._windows.get(key)
+        if entry is None:
+            return
+        if entry[0] == window_id:
+            entry[1] = max(entry[1] - 1, 0)
+        elif entry[0] == window_id + 1:
+            entry[2] = max(entry[2] - 1, 0)
+
+    def _evict(self, window_id: int) -> None:
+        """Удаляет из начала устаревшие ключи и самые старые сверх max_keys"""
+        while self._windows:
+            key, entry = next(iter(self._windows.items()))
+            if entry[0] >= window_id - 1 and len(self._windows) < self.max_keys:
+                return
+            del self._windows[key]
+
+
+class RedisBackend:
+    """
+    Счётчики в Redis: лимиты общие для всех воркеров и узлов.
+    Требует пакет redis (pip install redis).
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:") -> None:
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    def _keys(self, key: str, window_id: int) -> tuple[str, str]:
+        base = self.prefix + key
+        return f"{base}:{window_id - 1}", f"{base}:{window_id}"
+
+    async def incr(self, key: str, window_id: int, ttl: int) -> tuple[int, int]:
+        previous_key, current_key = self._keys(key, window_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, ttl)
+            pipe.get(previous_key)
+            current, _, previous = await pipe.execute()
+        return int(previous or 0), int(current)
+
+    async def decr(self, key: str, window_id: int) -> None:
+        # Истёкший ключ не воскрешается: DECR создал бы его без TTL
+        await self.client.eval(
+            "if redis.call('exists', KEYS[1]) == 1 then "
+            "return redis.call('decr', KEYS[1]) end return 0",
+            1,
+            self._keys(key, window_id)[1],
+        )
+
+
+class SlidingWindowLimiter:
+    """
+    Ограничение числа событий в скользящем окне (приближение по двум
+    соседним фиксированным окнам: O(1) памяти на ключ).
+    """
+
+    def __init__(self, backend: RateLimitBackend, limit: int, window: int) -> None:
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+
+    def _position(self) -> tuple[int, float]:
+        now = time.time()
+        return int(now // self.window), (now % self.window) / self.window
+
+    def _retry_after(self, previous: int, current: int, elapsed: float) -> float:
+        """Через сколько секунд оценка окна опустится ниже лимита"""
+        if current >= self.limit:
+            return (1 - elapsed) * self.window
+        # previous * (1 - t) + current < limit  →  t > 1 - (limit - current) / previous
+        threshold = 1 - (self.limit - current) / previous
+        return max(threshold - elapsed, 0) * self.window
+
+    async def acquire(self, key: str) -> tuple[int, Optional[float]]:
+        """
+        Учитывает событие и проверяет лимит одним атомарным incr: из
+        параллельных запросов лимит пропускает не больше limit.
+        :return: tuple[int, Optional[float]]: (номер окна для release; None или
+            секунды до сброса — лимит исчерпан, событие не учтено)
+        """
+        window_id, elapsed = self._position()
+        previous, current = await self.backend.incr(key, window_id, ttl=self.window * 2)
+        if previous * (1 - elapsed) + current - 1 < self.limit:
+            return window_id, None
+        await self.backend.decr(key, window_id)
+        return window_id, self._retry_after(previous, current - 1, elapsed)
+
+    async def release(self, key: str, window_id: int) -> None:
+        """Возвращает событие, учтённое acquire в окне window_id"""
+        await self.backend.decr(key, window_id)
+
+
+# Зарезервированные попытки: (лимитер, ключ, номер окна)
+LoginReservation = list[tuple[SlidingWindowLimiter, str, int]]
+
+
+class LoginThrottle:
+    """
+    Ограничение неудачных попыток входа по email и по IP клиента.
+    Попытка резервируется до обращения к БД и bcrypt: отклонённые попытки
+    не стоят CPU, а параллельная серия запросов не проходит проверку разом.
+    Удачные входы возвращают резерв и лимит не расходуют.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        per_email: int,
+        per_ip: int,
+        window: int,
+        enabled: bool = True,
+    ) -> None:
+        self.by_email = SlidingWindowLimiter(backend, per_email, window)
+        self.by_ip = SlidingWindowLimiter(backend, per_ip, window)
+        self.enabled = enabled
+
+    @staticmethod
+    def _keys(email: str, ip: str) -> tuple[str, str]:
+        return f"login:email:{email.strip().lower()}", f"login:ip:{ip}"
+
+    async def reserve(self, email: str, ip: str) -> LoginReservation:
+        """
+        Резервирует попытку входа по email и IP.
+        :return: LoginReservation: Резерв для refund после удачного входа
+        :raises HTTPException: 429 с Retry-After, если лимит по email или IP исчерпан
+        """
+        reservation: LoginReservation = []
+        if not self.enabled:
+            return reservation
+        email_key, ip_key = self._keys(email, ip)
+        for reason, limiter, key in (
+            ("email", self.by_email, email_key),
+            ("ip", self.by_ip, ip_key),
+        ):
+            try:
+                window_id, retry_after = await limiter.acquire(key)
+            except Exception:
+                # Недоступность общего хранилища не должна блокировать вход
+                logger.exception("Rate limit backend недоступен")
+                continue
+            if retry_after is not None:
+                await self.refund(reservation)
+                auth_login_rejected.inc(reason=reason)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Слишком много попыток входа, попробуйте позже",
+                    headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+                )
+            reservation.append((limiter, key, window_id))
+        return reservation
+
+    async def refund(self, reservation: LoginReservation) -> None:
+        """Возвращает резерв: попытка не была неудачной"""
+        for limiter, key, window_id in reservation:
+            try:
+                await limiter.release(key, window_id)
+            except Exception:
+                logger.exception("Rate limit backend недоступен")
+        reservation.clear()
+
+
+class HashConcurrencyLimiter:
+    """
+    Глобальный лимит одновременных операций хеширования паролей.
+    Хеш считается в пуле потоков (bcrypt отпускает GIL), поэтому event loop
+    не блокируется; если очередь не продвигается queue_timeout секунд,
+    запрос получает 503.
+    """
+
+    def __init__(self, max_concurrent: int, queue_timeout: float) -> None:
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        # В профиле запроса — вместе с ожиданием очереди
+        with span("password_hash"):
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                auth_login_rejected.inc(reason="hash_queue")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Сервер перегружен, попробуйте позже",
+                    headers={"Retry-After": "1"},
+                )
+            try:
+                return await run_in_threadpool(fn, *args)
+            finally:
+                self._semaphore.release()
+
+
+def _create_backend() -> RateLimitBackend:
+    if settings.rate_limit.backend == "redis":
+        return RedisBackend(settings.rate_limit.redis_url)
+    return MemoryBackend(settings.rate_limit.max_keys)
+
+
+login_throttle = LoginThrottle(
+    _create_backend(),
+    per_email=settings.rate_limit.login_failures_per_email,
+    per_ip=settings.rate_limit.login_failures_per_ip,
+    window=settings.rate_limit.window,
+    enabled=settings.rate_limit.enabled,
+)
+hash_limiter = HashConcurrencyLimiter(
+    settings.rate_limit.max_concurrent_hashes or os.cpu_count() or 1,
+    settings.rate_limit.hash_queue_timeout,
+)
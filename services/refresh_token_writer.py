@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from config import settings
+from core.db_helper import db_helper
+from core.metrics import refresh_token_flushes, refresh_token_write_lag, registry
+from core.models import DEFAULT_TENANT_ID, RefreshToken
+
+logger = logging.getLogger("app.refresh_tokens")
+
+
+def token_digest(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+@dataclass
+class PendingRefreshToken:
+    """
+    Refresh-токен, выданный клиенту, но ещё не записанный в БД.
+    revoke_previous: при записи отзываются все ранее сохранённые токены
+    пользователя (ротация в /auth/refresh).
+    """
+
+    user_id: int
+    digest: str
+    token_hash: str
+    expires_at: datetime
+    revoke_previous: bool
+    tenant_id: int = DEFAULT_TENANT_ID
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class RefreshTokenWriter:
+    """
+    Отложенная (write-behind) запись refresh-токенов.
+    Токены попадают в очередь процесса и записываются фоновой задачей пачками
+    (один UPDATE для ротации и один многострочный INSERT) не реже раза
+    в flush_interval. Пока токен в очереди, verify_refresh_token находит
+    его через lookup(). Очередь ограничена max_pending: при переполнении
+    запрос сам дожидается записи. При остановке очередь сбрасывается полностью.
+    Очередь своя у каждого воркера (server.py, workers > 1): другой воркер
+    до записи не знает о токене — выданный токен получает там 401, а
+    отозванный ротацией ещё принимается, не дольше flush_interval. Если
+    клиенты не повторяют запрос, включайте write-behind с одним воркером.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        enabled: bool = False,
+        flush_interval: float = 0.05,
+        max_batch: int = 500,
+        max_pending: int = 10_000,
+    ) -> None:
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._queue: list[PendingRefreshToken] = []
+        self._by_user: dict[int, list[PendingRefreshToken]] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def has_pending(self, user_id: int) -> bool:
+        return user_id in self._by_user
+
+    async def submit(
+        self,
+        user_id: int,
+        refresh_token: str,
+        token_hash: str,
+        expires_at: datetime,
+        revoke_previous: bool = False,
+        tenant_id: int = DEFAULT_TENANT_ID,
+    ) -> None:
+        """Ставит токен в очередь; при переполнении сначала записывает очередь"""
+        if len(self._queue) >= self.max_pending:
+            await self.flush()
+        entry = PendingRefreshToken(
+            user_id=user_id,
+            digest=token_digest(refresh_token),
+            token_hash=token_hash,
+            expires_at=expires_at,
+            revoke_previous=revoke_previous,
+            tenant_id=tenant_id,
+        )
+        self._queue.append(entry)
+        self._by_user.setdefault(user_id, []).append(entry)
+        if len(self._queue) >= self.max_batch:
+            self._wakeup.set()
+
+    def lookup(self, user_id: int, refresh_token: str) -> Optional[bool]:
+        """
+        Проверка токена по очереди.
+        :return: Optional[bool]: True — токен в очереди и действителен;
+            False — истёк или вытеснен ротацией (после ротации в очереди это
+            относится и ко всем сохранённым токенам пользователя); None — решает БД
+        """
+        entries = self._by_user.get(user_id)
+        if not entries:
+            return None
+        last_rotation = max(
+            (i for i, e in enumerate(entries) if e.revoke_previous), default=-1
+        )
+        digest = token_digest(refresh_token)
+        # От новых к старым: решает последняя выдача токена
+        for i in range(len(entries) - 1, -1, -1):
+            entry = entries[i]
+            if entry.digest == digest:
+                return i >= last_rotation and entry.expires_at > datetime.now(
+                    timezone.utc
+                )
+        return False if last_rotation >= 0 else None
+
+    async def flush(self) -> int:
+        """
+        Записывает всю очередь.
+        :return: int: Число записанных токенов
+        """
+        written = 0
+        async with self._lock:
+            while self._queue:
+                batch = self._queue[: self.max_batch]
+                try:
+                    await self._write(batch)
+                except Exception:
+                    refresh_token_flushes.inc(result="error")
+                    raise
+                refresh_token_flushes.inc(result="ok")
+                del self._queue[: len(batch)]
+                self._forget(batch)
+                now = time.perf_counter()
+                for entry in batch:
+                    refresh_token_write_lag.observe(now - entry.submitted)
+                written += len(batch)
+        return written
+
+    def _forget(self, batch: list[PendingRefreshToken]) -> None:
+        written = {id(entry) for entry in batch}
+        for user_id in {entry.user_id for entry in batch}:
+            remaining = [e for e in self._by_user[user_id] if id(e) not in written]
+            if remaining:
+                self._by_user[user_id] = remaining
+            else:
+                del self._by_user[user_id]
+
+    async def _write(self, batch: list[PendingRefreshToken]) -> None:
+        # Внутри пачки ротация вытесняет более ранние токены того же пользователя
+        last_rotation = {
+            entry.user_id: i for i, entry in enumerate(batch) if entry.revoke_previous
+        }
+        rows = [
+            {
+                "tenant_id": entry.tenant_id,
+                "user_id": entry.user_id,
+                "token_hash": entry.token_hash,
+                "expires_at": entry.expires_at,
+                "revoked": i < last_rotation.get(entry.user_id, -1),
+                "created_at": entry.created_at,
+            }
+            for i, entry in enumerate(batch)
+        ]
+        async with self.session_factory() as session:
+            if last_rotation:
+                await session.execute(
+                    update(RefreshToken)
+                    .where(
+                        RefreshToken.user_id.in_(last_rotation),
+                        RefreshToken.revoked == False,
+                    )
+                    .values(revoked=True)
+                )
+            await session.execute(insert(RefreshToken).values(rows))
+            await session.commit()
+
+    async def _run(self) -> None:
+        backoff = self.flush_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                backoff = self.flush_interval
+            except Exception:
+                # Токены остаются в очереди и действительны в этом процессе
+                logger.exception("Не удалось записать refresh-токены")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу и записывает остаток очереди"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue:
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Потеряно refresh-токенов: %d", len(self._queue))
+
+
+refresh_writer = RefreshTokenWriter(
+    db_helper.session_factory,
+    enabled=settings.auth.refresh_write_behind,
+    flush_interval=settings.auth.refresh_flush_interval,
+    max_batch=settings.auth.refresh_flush_batch,
+    max_pending=settings.auth.refresh_max_pending,
+)
+registry.gauge(
+    "refresh_token_pending",
+    "Refresh-токены в очереди на запись",
+    collect=lambda: refresh_writer.pending,
+)
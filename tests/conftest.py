@@ -1,5 +1,6 @@
 import os
 import sys
+from contextlib import contextmanager
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import pytest
@@ -9,6 +10,7 @@ from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.db_helper import db_helper
+from core.query_stats import track_queries
 from main import app
 
 
@@ -19,6 +21,36 @@ async def db_session():
         yield session
 
 
+@pytest.fixture
+def query_counter():
+    """
+    Проверка числа SQL-запросов внутри блока.
+
+    Использование:
+        with query_counter(max_queries=2):
+            await client.get("/auth/me", headers=headers)
+
+    По умолчанию повторяющиеся одинаковые запросы (N+1) считаются ошибкой.
+    """
+
+    @contextmanager
+    def counter(max_queries: int | None = None, allow_repeats: bool = False):
+        with track_queries() as stats:
+            yield stats
+        if max_queries is not None:
+            assert stats.count <= max_queries, (
+                f"Выполнено {stats.count} SQL-запросов, ожидалось не больше "
+                f"{max_queries}:\n" + "\n".join(stats.statements)
+            )
+        if not allow_repeats:
+            repeated = stats.repeated()
+            assert not repeated, "Повторяющиеся запросы:\n" + "\n".join(
+                f"{n}x {sql}" for sql, n in repeated.items()
+            )
+
+    return counter
+
+
 @pytest_asyncio.fixture
 async def client(db_session):
     """HTTP клиент, использующий ту же DB session"""
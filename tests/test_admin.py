@@ -1,4 +1,10 @@
+from datetime import datetime, timezone
+
 import pytest
+from fastapi import HTTPException
+
+from core.principal import Principal
+from middleware.permissions import require_platform_admin
 
 
 class TestAdminRoles:
@@ -42,6 +48,22 @@ class TestAdminResources:
         resource_names = [r["name"] for r in resources]
         assert "projects" in resource_names
 
+    async def test_tenant_admin_cannot_manage_resources(self):
+        """Справочник ресурсов общий: админ другого арендатора — 403"""
+        tenant_admin = Principal(
+            id=10,
+            tenant_id=2,
+            email="admin@tenant2.com",
+            is_active=True,
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            role_ids=frozenset({7}),
+            role_names=("admin",),
+        )
+
+        with pytest.raises(HTTPException) as exc:
+            await require_platform_admin(tenant_admin)
+        assert exc.value.status_code == 403
+
 
 class TestAdminAccessRules:
     """Тесты управления правилами доступа"""
@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from core.principal import Principal
+from core.schemas import ApiKeyCreate
+from services.api_keys import ApiKeyService, LastUsedTracker, VerifiedKeys
+
+PRINCIPAL = Principal(
+    id=1,
+    tenant_id=1,
+    email="service@test.com",
+    is_active=True,
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    role_ids=frozenset({2}),
+    role_names=("user",),
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RecordingSession:
+    """Сессия, запоминающая параметры executemany"""
+
+    def __init__(self, log: list) -> None:
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        self.log.append(params)
+
+    async def commit(self):
+        pass
+
+
+class TestApiKeyFormat:
+    """Тесты формата и хеширования API-ключей"""
+
+    def test_generate_and_parse(self):
+        key, prefix = ApiKeyService.generate()
+
+        assert ApiKeyService.is_api_key(key)
+        assert ApiKeyService.parse_prefix(key) == prefix
+        assert ApiKeyService.parse_prefix("ak_short_secret") is None
+        assert not ApiKeyService.is_api_key("eyJhbGciOiJIUzI1NiJ9.e30.sig")
+
+    def test_hash_is_keyed_and_stable(self):
+        key, _ = ApiKeyService.generate()
+        other, _ = ApiKeyService.generate()
+
+        assert ApiKeyService.hash_key(key) == ApiKeyService.hash_key(key)
+        assert ApiKeyService.hash_key(key) != ApiKeyService.hash_key(other)
+        assert len(ApiKeyService.hash_key(key)) == 64
+
+    def test_expiry_is_bounded(self):
+        # Иначе timedelta(days=...) переполняется и запрос падает с 500
+        with pytest.raises(ValidationError):
+            ApiKeyCreate(user_id=1, name="ci", expires_in_days=10**9)
+        assert ApiKeyCreate(user_id=1, name="ci", expires_in_days=3650)
+
+
+class TestVerifiedKeys:
+    """Тесты кэша проверенных ключей"""
+
+    def test_entry_expires_after_ttl_or_key_expiry(self):
+        clock = FakeClock()
+        keys = VerifiedKeys(ttl=10, clock=clock)
+        keys.put("a", PRINCIPAL, 1, expires_at=None)
+        keys.put(
+            "b", PRINCIPAL, 2, expires_at=datetime.fromtimestamp(1005, timezone.utc)
+        )
+
+        clock.now = 1006
+        assert keys.get("a") == (PRINCIPAL, 1)
+        assert keys.get("b") is None
+        clock.now = 1011
+        assert keys.get("a") is None
+
+    def test_invalidate_by_key_id(self):
+        keys = VerifiedKeys(ttl=10)
+        keys.put("a", PRINCIPAL, 1, expires_at=None)
+        keys.invalidate(1)
+        assert keys.get("a") is None
+
+
+class TestLastUsedTracker:
+    """Тесты пакетной записи last_used_at"""
+
+    async def test_flush_writes_latest_use_per_key(self):
+        log = []
+        tracker = LastUsedTracker(lambda: RecordingSession(log))
+        for key_id in (1, 2, 1, 1):
+            tracker.touch(key_id)
+
+        assert tracker.pending == 2
+        assert await tracker.flush() == 2
+        assert tracker.pending == 0
+        assert [params["key_id"] for params in log[0]] == [1, 2]
+        assert await tracker.flush() == 0
+
+
+class TestApiKeysViaAPI:
+    """Тесты выпуска, использования и отзыва API-ключей"""
+
+    async def test_key_authenticates_with_scoped_roles(self, client, admin_token):
+        admin_headers = {"Authorization": f"Bearer {admin_token}"}
+        me = await client.get("/auth/me", headers=admin_headers)
+
+        created = await client.post(
+            "/admin/api-keys",
+            json={"user_id": me.json()["id"], "name": "ci", "role_ids": []},
+            headers=admin_headers,
+        )
+        assert created.status_code == 200
+        key = created.json()["key"]
+
+        resp = await client.get("/auth/me", headers={"Authorization": f"Bearer {key}"})
+        assert resp.status_code == 200
+        # Ключ без ролей не даёт прав администратора владельца
+        assert resp.json()["roles"] == []
+
+        revoked = await client.delete(
+            f"/admin/api-keys/{created.json()['id']}", headers=admin_headers
+        )
+        assert revoked.status_code == 200
+        resp = await client.get("/auth/me", headers={"Authorization": f"Bearer {key}"})
+        assert resp.status_code == 401
@@ -0,0 +1,157 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from services.audit_log import AUDIT_COLUMNS, AuditLog, partition_ddl
+
+
+class CopySession:
+    """Сессия, запоминающая COPY и DDL вместо записи в БД"""
+
+    def __init__(self, log: dict, fail: bool, fail_ddl: bool = False) -> None:
+        self.log = log
+        self.fail = fail
+        self.fail_ddl = fail_ddl
+        self.driver_connection = self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def connection(self):
+        return self
+
+    async def get_raw_connection(self):
+        return self
+
+    async def copy_records_to_table(self, table, records, columns):
+        if self.fail:
+            raise ConnectionError("db down")
+        assert columns == AUDIT_COLUMNS
+        self.log["copies"].append((table, records))
+
+    async def execute(self, stmt):
+        if self.fail_ddl:
+            raise ConnectionError("ddl failed")
+        self.log["ddl"].append(str(stmt))
+
+    async def scalar(self, stmt, params):
+        # Строки месяца в секции по умолчанию
+        return params["start"] in self.log.get("in_default", ())
+
+    async def commit(self):
+        pass
+
+
+class TestAuditLog:
+    """Тесты очереди журнала аудита"""
+
+    def _log(self, store: dict, fail: bool = False, **kwargs) -> AuditLog:
+        store.setdefault("copies", [])
+        store.setdefault("ddl", [])
+        return AuditLog(lambda: CopySession(store, fail), max_batch=2, **kwargs)
+
+    async def test_flush_copies_batches(self):
+        store = {}
+        audit = self._log(store)
+        for user_id in range(3):
+            await audit.record("authz", "allow", tenant_id=1, user_id=user_id)
+
+        assert await audit.flush() == 3
+        assert audit.pending == 0
+        assert [len(records) for _, records in store["copies"]] == [2, 1]
+        table, records = store["copies"][0]
+        assert table == "audit_events"
+        assert records[0][:4] == ("authz", "allow", 1, 0)
+        # Секции создаются один раз: текущий месяц и два вперёд
+        assert len(store["ddl"]) == 3
+
+    async def test_drop_newest_when_full(self):
+        audit = self._log({}, max_pending=2)
+        assert await audit.record("login", "success", user_id=1)
+        assert await audit.record("login", "success", user_id=2)
+        assert not await audit.record("login", "success", user_id=3)
+
+        assert [entry.user_id for entry in audit._queue] == [1, 2]
+
+    async def test_drop_oldest_when_full(self):
+        audit = self._log({}, max_pending=2, overflow="drop_oldest")
+        for user_id in range(1, 4):
+            assert await audit.record("login", "success", user_id=user_id)
+
+        assert [entry.user_id for entry in audit._queue] == [2, 3]
+
+    async def test_block_times_out_without_writer(self):
+        audit = self._log({}, max_pending=1, overflow="block", block_timeout=0.01)
+        assert await audit.record("logout", "success")
+        assert not await audit.record("logout", "success")
+        assert audit.pending == 1
+
+    async def test_failed_flush_keeps_events(self):
+        audit = self._log({}, fail=True)
+        await audit.record("refresh", "failure")
+
+        with pytest.raises(ConnectionError):
+            await audit.flush()
+        assert audit.pending == 1
+
+    async def test_failed_partition_ddl_retried_on_next_flush(self):
+        store = {"copies": [], "ddl": []}
+        sessions = iter([CopySession(store, fail=False, fail_ddl=True)])
+        audit = AuditLog(
+            lambda: next(sessions, CopySession(store, fail=False)), max_batch=2
+        )
+        await audit.record("authz", "allow")
+        assert await audit.flush() == 1
+        # Текущий месяц не создан, следующие — в своих транзакциях — созданы
+        assert len(store["ddl"]) == 2
+
+        await audit.record("authz", "allow")
+        assert await audit.flush() == 1
+        assert len(store["ddl"]) == 5
+        assert audit._partitions_until is not None
+
+    async def test_month_in_default_partition_skipped(self):
+        now = datetime.now(timezone.utc)
+        store = {"in_default": {date(now.year, now.month, 1)}}
+        audit = self._log(store)
+        await audit.record("authz", "allow")
+        await audit.flush()
+
+        assert len(store["ddl"]) == 2
+        assert audit._default_months == store["in_default"]
+
+    async def test_disabled_log_records_nothing(self):
+        audit = self._log({}, enabled=False)
+        assert not await audit.record("authz", "deny")
+        assert audit.pending == 0
+
+
+class TestPartitions:
+    """Тесты DDL месячных секций"""
+
+    def test_partition_ddl_crosses_year(self):
+        ddl = partition_ddl(date(2026, 12, 1))
+        assert "audit_events_2026_12 PARTITION OF audit_events" in ddl
+        assert "FROM ('2026-12-01') TO ('2027-01-01')" in ddl
+
+
+class TestAuditExport:
+    """Тесты выгрузки журнала аудита"""
+
+    async def test_export_streams_ndjson(self, client, admin_token):
+        resp = await client.get(
+            "/admin/audit",
+            params={"since": datetime(2000, 1, 1, tzinfo=timezone.utc).isoformat()},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/x-ndjson"
+
+    async def test_export_requires_admin(self, client, user_token):
+        resp = await client.get(
+            "/admin/audit", headers={"Authorization": f"Bearer {user_token}"}
+        )
+        assert resp.status_code == 403
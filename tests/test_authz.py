@@ -109,3 +109,86 @@ class TestAuthorizationServiceViaAPI:
         data = resp.json()
         assert "roles" in data
         assert "admin" in data["roles"]
+
+    async def test_shared_project_visible_to_grantee(
+        self, client, user_token, admin_token
+    ):
+        headers_user = {"Authorization": f"Bearer {user_token}"}
+        headers_admin = {"Authorization": f"Bearer {admin_token}"}
+        user_id = (await client.get("/auth/me", headers=headers_user)).json()["id"]
+
+        resp = await client.post(
+            "/projects/", json={"title": "Shared"}, headers=headers_admin
+        )
+        project_id = resp.json()["id"]
+
+        resp_before = await client.get(f"/projects/{project_id}", headers=headers_user)
+        assert resp_before.status_code == 403
+
+        resp_share = await client.post(
+            f"/projects/{project_id}/grants",
+            json={
+                "principal_type": "user",
+                "principal_id": user_id,
+                "actions": ["read"],
+            },
+            headers=headers_admin,
+        )
+        assert resp_share.status_code == 200
+        assert resp_share.json()["actions"] == ["read"]
+
+        resp_after = await client.get(f"/projects/{project_id}", headers=headers_user)
+        assert resp_after.status_code == 200
+
+        # Список: свои проекты и расшаренные, чужие без гранта не видны
+        resp_list = await client.get("/projects/", headers=headers_user)
+        assert resp_list.status_code == 200
+        owners = {p["owner_id"] for p in resp_list.json() if p["id"] != project_id}
+        assert owners <= {user_id}
+        assert project_id in {p["id"] for p in resp_list.json()}
+
+        # Грант только на чтение — изменять нельзя
+        resp_patch = await client.patch(
+            f"/projects/{project_id}", json={"title": "Nope"}, headers=headers_user
+        )
+        assert resp_patch.status_code == 403
+
+    async def test_update_grantee_cannot_extend_own_grant(
+        self, client, user_token, admin_token
+    ):
+        headers_user = {"Authorization": f"Bearer {user_token}"}
+        headers_admin = {"Authorization": f"Bearer {admin_token}"}
+        user_id = (await client.get("/auth/me", headers=headers_user)).json()["id"]
+
+        resp = await client.post(
+            "/projects/", json={"title": "Update only"}, headers=headers_admin
+        )
+        project_id = resp.json()["id"]
+        resp_share = await client.post(
+            f"/projects/{project_id}/grants",
+            json={
+                "principal_type": "user",
+                "principal_id": user_id,
+                "actions": ["read", "update"],
+            },
+            headers=headers_admin,
+        )
+        assert resp_share.status_code == 200
+
+        # Грант на изменение не даёт права управлять грантами
+        resp_escalate = await client.post(
+            f"/projects/{project_id}/grants",
+            json={
+                "principal_type": "user",
+                "principal_id": user_id,
+                "actions": ["read", "update", "delete"],
+            },
+            headers=headers_user,
+        )
+        assert resp_escalate.status_code == 403
+
+        resp_revoke = await client.delete(
+            f"/projects/{project_id}/grants/{resp_share.json()['id']}",
+            headers=headers_user,
+        )
+        assert resp_revoke.status_code == 403
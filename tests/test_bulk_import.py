@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import ValidationError
+
+from core.schemas import UserImportItem
+from services.auth_service import AuthService
+from services.bulk_import import BulkImportService
+
+
+class TestBulkImport:
+    """Тесты подготовки данных для массового импорта"""
+
+    def test_item_requires_exactly_one_password_field(self):
+        with pytest.raises(ValidationError):
+            UserImportItem(email="a@test.com")
+        with pytest.raises(ValidationError):
+            UserImportItem(email="a@test.com", password="secret1", pass_hash="x")
+
+    async def test_prepare_batch_hashes_and_filters(self):
+        existing_hash = AuthService.get_password_hash("prehashed")
+        batch = [
+            UserImportItem(email="a@test.com", password="secret1", roles=["user"]),
+            UserImportItem(email="b@test.com", pass_hash=existing_hash),
+            UserImportItem(email="c@test.com", pass_hash="not-a-hash"),
+        ]
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            records, invalid = await BulkImportService._prepare_batch(
+                batch, executor, chunks=2
+            )
+
+        assert invalid == 1
+        assert [r[0] for r in records] == ["a@test.com", "b@test.com"]
+        assert AuthService.verify_password("secret1", records[0][1])
+        assert records[1][1] == existing_hash
+        assert records[0][3] == ["user"]
+        # Порядок строки в пачке — для выбора первой из повторов email
+        assert [r[4] for r in records] == [0, 1]
+
+    async def test_hash_without_executor_uses_thread_pool(self):
+        hashed = await BulkImportService.hash_passwords(
+            ["secret1", "secret2", "secret3"], executor=None, chunks=1
+        )
+
+        assert len(hashed) == 3
+        assert AuthService.verify_password("secret3", hashed[2])
@@ -0,0 +1,80 @@
+import pytest
+from fastapi import HTTPException, Request
+
+from core.conditional import expected_versions, make_etag, not_modified
+
+
+def make_request(**headers: str) -> Request:
+    raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "headers": raw})
+
+
+class TestConditionalHelpers:
+    """Тесты разбора If-None-Match / If-Match"""
+
+    def test_not_modified(self):
+        etag = make_etag(3)
+        assert etag == '"3"'
+
+        response = not_modified(make_request(if_none_match='W/"3", "4"'), etag)
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert not_modified(make_request(if_none_match='"2"'), etag) is None
+        assert not_modified(make_request(), etag) is None
+
+    def test_expected_versions(self):
+        assert expected_versions(make_request()) is None
+        assert expected_versions(make_request(if_match="*")) is None
+        assert expected_versions(make_request(if_match='"2", "5"')) == [2, 5]
+
+    def test_weak_if_match_never_matches(self):
+        with pytest.raises(HTTPException) as exc:
+            expected_versions(make_request(if_match='W/"2"'))
+        assert exc.value.status_code == 412
+
+
+class TestConditionalProjects:
+    """Тесты ETag и условных запросов через API"""
+
+    async def test_get_returns_304_for_current_version(self, client, admin_token):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        created = await client.post(
+            "/projects/", json={"title": "ETag"}, headers=headers
+        )
+        project_id = created.json()["id"]
+
+        resp = await client.get(f"/projects/{project_id}", headers=headers)
+        etag = resp.headers["etag"]
+        cached = await client.get(
+            f"/projects/{project_id}", headers={**headers, "If-None-Match": etag}
+        )
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    async def test_stale_if_match_is_rejected(self, client, admin_token):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        created = await client.post(
+            "/projects/", json={"title": "Concurrent"}, headers=headers
+        )
+        project_id = created.json()["id"]
+        etag = created.headers["etag"]
+
+        first = await client.patch(
+            f"/projects/{project_id}",
+            json={"title": "First"},
+            headers={**headers, "If-Match": etag},
+        )
+        assert first.status_code == 200
+        assert first.json()["version"] == 2
+
+        second = await client.patch(
+            f"/projects/{project_id}",
+            json={"title": "Second"},
+            headers={**headers, "If-Match": etag},
+        )
+        assert second.status_code == 412
+
+        deleted = await client.delete(
+            f"/projects/{project_id}", headers={**headers, "If-Match": etag}
+        )
+        assert deleted.status_code == 412
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from core.db_helper import DEADLINE_INFO, DatabaseHelper, _apply_deadline, db_helper
+from core.deadline import Deadline, DeadlineExceeded, reset_deadline, set_deadline
+from middleware.deadline import DeadlineMiddleware
+
+
+class SlowSession:
+    """Сессия, которая долго ждёт соединение из пула"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.executed = []
+        self.info = {}
+        self.sync_session = self
+
+    async def connection(self):
+        await asyncio.sleep(self.delay)
+
+    def execute(self, stmt, params=None):
+        self.executed.append(params)
+
+    def begin(self):
+        """Новая транзакция сессии: срабатывает after_begin"""
+        _apply_deadline(self, None, self)
+
+
+class TestDeadline:
+    """Тесты сроков запросов и отсечения нагрузки"""
+
+    async def test_checkout_bounded_by_deadline(self):
+        helper = DatabaseHelper("postgresql+asyncpg://u:p@localhost/db")
+        token = set_deadline(Deadline(0.05))
+        try:
+            with pytest.raises(DeadlineExceeded):
+                await helper._checkout(SlowSession(1.0))
+        finally:
+            reset_deadline(token)
+        assert helper.pool_waiters == 0
+
+    async def test_statement_timeout_follows_deadline(self):
+        helper = DatabaseHelper("postgresql+asyncpg://u:p@localhost/db")
+        session = SlowSession(0)
+        token = set_deadline(Deadline(2.0))
+        try:
+            await helper._checkout(session)
+        finally:
+            reset_deadline(token)
+        session.begin()
+        # Каждая транзакция, в том числе после commit, получает свой лимит
+        session.begin()
+        assert len(session.executed) == 2
+        assert 0 < int(session.executed[1]["timeout"]) <= 2000
+        assert session.info[DEADLINE_INFO][1] == 0
+
+    async def test_server_timeout_stricter_than_deadline(self):
+        helper = DatabaseHelper(
+            "postgresql+asyncpg://u:p@localhost/db", statement_timeout_ms=1000
+        )
+        session = SlowSession(0)
+        token = set_deadline(Deadline(30.0))
+        try:
+            await helper._checkout(session)
+        finally:
+            reset_deadline(token)
+        session.begin()
+        assert session.executed == []
+
+    async def test_header_deadline_returns_504(self):
+        async def slow_app(scope, receive, send):
+            await asyncio.sleep(1.0)
+
+        app = DeadlineMiddleware(slow_app)
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            resp = await client.get("/", headers={"X-Request-Timeout-Ms": "50"})
+        assert resp.status_code == 504
+
+    async def test_saturated_pool_sheds_load(self, client, monkeypatch):
+        monkeypatch.setattr(db_helper, "pool_waiters", 10_000)
+
+        resp = await client.get("/projects/")
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "1"
+
+        resp = await client.get("/livez")
+        assert resp.status_code == 200
@@ -0,0 +1,35 @@
+import pytest
+
+from core.health import ReadinessProbe
+
+
+class TestReadiness:
+    """Тесты проверки готовности"""
+
+    async def test_not_ready_until_started(self):
+        probe = ReadinessProbe(self._check(True), interval=60)
+        assert await probe.ready() is False
+        probe.mark_started()
+        assert await probe.ready() is True
+
+    async def test_database_check_is_rate_limited(self):
+        calls = []
+        probe = ReadinessProbe(self._check(True, calls), interval=60)
+        probe.mark_started()
+
+        for _ in range(5):
+            assert await probe.ready() is True
+        assert len(calls) == 1
+
+    async def test_livez(self, client):
+        resp = await client.get("/livez")
+        assert resp.status_code == 200
+
+    @staticmethod
+    def _check(result: bool, calls: list | None = None):
+        async def check():
+            if calls is not None:
+                calls.append(1)
+            return result
+
+        return check
@@ -0,0 +1,37 @@
+import pytest
+
+from core.metrics import MetricsRegistry
+
+
+class TestMetrics:
+    """Тесты метрик"""
+
+    def test_histogram_render(self):
+        registry = MetricsRegistry()
+        hist = registry.histogram(
+            "op_seconds", "Длительность", ("op",), buckets=(0.1, 1.0)
+        )
+        hist.observe(0.05, op="a")
+        hist.observe(0.5, op="a")
+        hist.observe(5, op="a")
+
+        text = registry.render()
+        assert 'op_seconds_bucket{op="a",le="0.1"} 1' in text
+        assert 'op_seconds_bucket{op="a",le="1"} 2' in text
+        assert 'op_seconds_bucket{op="a",le="+Inf"} 3' in text
+        assert 'op_seconds_count{op="a"} 3' in text
+
+    def test_labels_are_validated(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("c_total", "Счётчик", ("route",))
+        with pytest.raises(ValueError):
+            counter.inc(path="/")
+
+    async def test_metrics_endpoint_uses_route_template(self, client):
+        await client.get("/")
+        resp = await client.get("/metrics")
+
+        assert resp.status_code == 200
+        assert 'http_requests_total{method="GET",route="/",status="200"}' in resp.text
+        assert "http_requests_in_flight" in resp.text
+        assert "db_pool_checked_out" in resp.text
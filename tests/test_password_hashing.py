@@ -0,0 +1,33 @@
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+from config import settings
+from services.password_hashing import MIN_BCRYPT_ROUNDS, PasswordHashing
+
+
+class TestPasswordHashing:
+    """Тесты настройки стоимости хеширования"""
+
+    def test_calibration_respects_floor(self):
+        auth = settings.auth.model_copy(update={"password_scheme": "bcrypt"})
+        assert PasswordHashing.calibrate(1, auth) == MIN_BCRYPT_ROUNDS
+
+    def test_weaker_hash_is_upgraded(self):
+        context = CryptContext()
+        auth = settings.auth.model_copy(
+            update={"bcrypt_rounds": 5, "password_hash_target_ms": 0}
+        )
+        assert PasswordHashing.configure(context, auth) == "bcrypt, rounds=5"
+
+        weak = bcrypt.using(rounds=4).hash("secret")
+        verified, new_hash = context.verify_and_update("secret", weak)
+        assert verified
+        assert new_hash.startswith("$2b$05$")
+        assert context.verify_and_update("secret", new_hash) == (True, None)
+
+    def test_neighbouring_cost_is_tolerated(self):
+        context = CryptContext()
+        auth = settings.auth.model_copy(update={"bcrypt_rounds": 5})
+        PasswordHashing.configure(context, auth, calibrate=False)
+        assert not context.needs_update(bcrypt.using(rounds=6).hash("secret"))
+        assert context.needs_update(bcrypt.using(rounds=8).hash("secret"))
@@ -0,0 +1,75 @@
+import dataclasses
+from datetime import datetime, timezone
+
+import pytest
+
+from core.principal import (
+    Permission,
+    Principal,
+    is_allowed,
+    pack_actions,
+    pack_rule,
+    unpack_actions,
+)
+
+
+class TestRuleMask:
+    """Тесты упаковки правил доступа в битовое поле"""
+
+    def test_pack_rule(self):
+        flags = (True, False, True, False, False, False, True)
+        assert pack_rule(flags) == (
+            Permission.READ | Permission.CREATE | Permission.DELETE_ALL
+        )
+        assert pack_rule((False,) * 7) == 0
+
+    def test_own_objects_only(self):
+        mask = Permission.UPDATE
+        assert is_allowed(mask, "update", owner_id=1, principal_id=1)
+        assert not is_allowed(mask, "update", owner_id=2, principal_id=1)
+        assert not is_allowed(mask, "update", owner_id=None, principal_id=1)
+
+    def test_all_objects(self):
+        mask = Permission.READ_ALL | Permission.CREATE
+        assert is_allowed(mask, "read", owner_id=2, principal_id=1)
+        assert is_allowed(mask, "create", owner_id=None, principal_id=1)
+        assert not is_allowed(mask, "delete", owner_id=1, principal_id=1)
+
+    def test_unknown_action(self):
+        assert not is_allowed(0x7F, "publish", owner_id=1, principal_id=1)
+
+
+class TestPrincipal:
+    """Тесты неизменяемого представления пользователя"""
+
+    def test_frozen_with_slots(self):
+        principal = Principal(
+            id=1,
+            tenant_id=1,
+            email="user@test.com",
+            is_active=True,
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            role_ids=frozenset({1, 2}),
+            role_names=("admin", "user"),
+        )
+
+        assert principal.has_role("admin")
+        assert not principal.has_role("manager")
+        assert not hasattr(principal, "__dict__")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            principal.email = "other@test.com"
+
+
+class TestGrantActions:
+    """Тесты маски действий, выдаваемых на объект"""
+
+    def test_pack_roundtrip(self):
+        mask = pack_actions(["read", "delete"])
+        assert mask == Permission.READ | Permission.DELETE
+        assert unpack_actions(mask) == ["read", "delete"]
+
+    def test_grant_bits_match_own_object_permissions(self):
+        # Грант на объект даёт те же права, что и владение им
+        mask = pack_actions(["update"])
+        assert is_allowed(mask, "update", owner_id=1, principal_id=1)
+        assert not is_allowed(mask, "delete", owner_id=1, principal_id=1)
@@ -0,0 +1,106 @@
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from config import settings
+from core.profiling import (
+    ProfileBuffer,
+    Profiler,
+    RequestProfile,
+    StackSampler,
+    profile_request,
+)
+from core.profiling import profiler as app_profiler
+from core.profiling import (
+    sign_profile_token,
+    span,
+    verify_profile_token,
+)
+from main import app
+
+
+class TestProfilingTrigger:
+    """Тесты решения, профилировать ли запрос"""
+
+    def test_signed_header(self):
+        token = sign_profile_token("secret", 2000)
+
+        assert verify_profile_token("secret", token, now=1000)
+        assert not verify_profile_token("secret", token, now=2001)
+        assert not verify_profile_token("other", token, now=1000)
+        assert not verify_profile_token("secret", "garbage", now=1000)
+
+    def test_temporary_sampling_reverts(self):
+        clock = [1000.0]
+        profiler = Profiler("secret", rng=lambda: 0.5, clock=lambda: clock[0])
+
+        assert profiler.trigger(None) is None
+        profiler.set_sampling(0.6, duration=10)
+        assert profiler.trigger(None) == "sample"
+        assert profiler.trigger(sign_profile_token("secret", 2000)) == "header"
+        clock[0] = 1011
+        assert profiler.trigger(None) is None
+
+
+class TestProfileCollection:
+    """Тесты сбора участков, стеков и кольцевого буфера"""
+
+    def test_spans_only_inside_profile(self):
+        profile = RequestProfile("GET", "/")
+        with span("token_decode"):
+            pass
+        with profile_request(profile):
+            with span("token_decode"):
+                pass
+            with span("token_decode"):
+                pass
+        assert list(profile.spans) == ["token_decode"]
+
+    def test_sampler_collects_stacks(self):
+        sampler = StackSampler(0.001)
+        assert sampler.start()
+        assert not StackSampler(0.001).start()  # Один сэмплер на процесс
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        stacks = sampler.stop()
+
+        assert sum(stacks.values()) > 0
+        assert any("test_sampler_collects_stacks" in stack for stack in stacks)
+
+        # stop() не ждёт поток: он завершается сам и освобождает сэмплер
+        total = sum(stacks.values())
+        time.sleep(0.01)
+        assert sum(stacks.values()) == total
+        again = StackSampler(0.001)
+        assert again.start()
+        again.stop()
+
+    def test_ring_buffer(self):
+        buffer = ProfileBuffer(2)
+        profiles = [RequestProfile("GET", f"/{i}") for i in range(3)]
+        for profile in profiles:
+            buffer.add(profile)
+
+        assert buffer.list() == [profiles[2], profiles[1]]
+        assert buffer.get(profiles[0].id) is None
+
+
+class TestProfilingMiddleware:
+    """Тесты профилирования запроса целиком"""
+
+    async def test_profiled_request_lands_in_buffer(self):
+        token = sign_profile_token(settings.auth.secret_key, int(time.time()) + 60)
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            plain = await client.get("/livez")
+            resp = await client.get(
+                "/livez", headers={settings.profiling.header: token}
+            )
+
+        assert "x-profile-id" not in plain.headers
+        profile = app_profiler.buffer.get(resp.headers["x-profile-id"])
+        assert profile.status == 200
+        assert profile.trigger == "header"
+        assert {"handler", "serialize", "send"} <= set(profile.spans)
@@ -0,0 +1,60 @@
+import pytest
+
+from core.query_stats import QueryStats
+
+
+class TestQueryStats:
+    """Тесты подсчёта SQL-запросов"""
+
+    def test_repeated_statements(self):
+        stats = QueryStats()
+        stats.record("SELECT 1", 0.001)
+        stats.record("SELECT 1", 0.002)
+        stats.record("SELECT 2", 0.003)
+
+        assert stats.count == 3
+        assert stats.total_ms == pytest.approx(6.0)
+        assert stats.repeated() == {"SELECT 1": 2}
+
+    async def test_get_me_query_budget(self, client, admin_token, query_counter):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        # Пользователь с ролями — один запрос в get_current_user
+        with query_counter(max_queries=1):
+            resp = await client.get("/auth/me", headers=headers)
+        assert resp.status_code == 200
+
+    async def test_list_projects_query_budget(
+        self, client, manager_token, query_counter
+    ):
+        headers = {"Authorization": f"Bearer {manager_token}"}
+        # Пользователь, маска прав на ресурс, список проектов
+        with query_counter(max_queries=3):
+            resp = await client.get("/projects/", headers=headers)
+        assert resp.status_code == 200
+
+    async def test_create_project_query_budget(
+        self, client, admin_token, query_counter
+    ):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        # Пользователь, маска прав, INSERT ... RETURNING (без refresh)
+        with query_counter(max_queries=3):
+            resp = await client.post(
+                "/projects/",
+                json={"title": "Budget", "description": "RETURNING"},
+                headers=headers,
+            )
+        assert resp.status_code == 200
+        assert resp.json()["created_at"]
+
+    async def test_update_rule_query_budget(self, client, admin_token, query_counter):
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        rule_id = (await client.get("/admin/rules", headers=headers)).json()[0]["id"]
+        # Пользователь и UPDATE ... RETURNING с названиями роли и ресурса
+        with query_counter(max_queries=2):
+            resp = await client.patch(
+                f"/admin/rules/{rule_id}",
+                json={"read_permission": True},
+                headers=headers,
+            )
+        assert resp.status_code == 200
+        assert resp.json()["role_name"]
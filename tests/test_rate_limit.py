@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from services.rate_limit import (
+    HashConcurrencyLimiter,
+    LoginThrottle,
+    MemoryBackend,
+    SlidingWindowLimiter,
+    login_throttle,
+)
+
+
+class TestRateLimit:
+    """Тесты ограничения попыток входа"""
+
+    async def test_sliding_window_limit(self):
+        limiter = SlidingWindowLimiter(MemoryBackend(), limit=3, window=3600)
+        for _ in range(3):
+            _, retry_after = await limiter.acquire("k")
+            assert retry_after is None
+        window_id, retry_after = await limiter.acquire("k")
+        assert retry_after is not None and retry_after > 0
+        assert (await limiter.acquire("other"))[1] is None
+
+        # Возвращённое событие освобождает место в окне
+        await limiter.release("k", window_id)
+        assert (await limiter.acquire("k"))[1] is None
+
+    async def test_memory_backend_bounded(self):
+        backend = MemoryBackend(max_keys=10)
+        for i in range(100):
+            await backend.incr(f"k{i}", window_id=1, ttl=60)
+        assert len(backend._windows) <= 10
+
+    async def test_memory_backend_evicts_stale_keys_first(self):
+        backend = MemoryBackend(max_keys=3)
+        await backend.incr("old", window_id=1, ttl=60)
+        await backend.incr("a", window_id=5, ttl=60)
+        await backend.incr("b", window_id=5, ttl=60)
+        await backend.incr("c", window_id=5, ttl=60)
+        assert list(backend._windows) == ["a", "b", "c"]
+
+    async def test_throttle_by_email(self):
+        throttle = LoginThrottle(MemoryBackend(), per_email=2, per_ip=100, window=60)
+        await throttle.reserve("A@test.com", "10.0.0.1")
+        await throttle.reserve("a@test.com", "10.0.0.2")
+
+        with pytest.raises(HTTPException) as exc:
+            await throttle.reserve("a@test.com", "10.0.0.3")
+        assert exc.value.status_code == 429
+        assert int(exc.value.headers["Retry-After"]) >= 1
+        await throttle.reserve("b@test.com", "10.0.0.3")
+
+    async def test_concurrent_burst_reserves_at_most_limit(self):
+        throttle = LoginThrottle(MemoryBackend(), per_email=3, per_ip=100, window=60)
+        results = await asyncio.gather(
+            *(throttle.reserve("a@test.com", "10.0.0.1") for _ in range(10)),
+            return_exceptions=True,
+        )
+        reservations = [r for r in results if not isinstance(r, Exception)]
+        assert len(reservations) == 3
+
+        # Удачный вход возвращает резерв
+        await throttle.refund(reservations[0])
+        await throttle.reserve("a@test.com", "10.0.0.1")
+        with pytest.raises(HTTPException):
+            await throttle.reserve("a@test.com", "10.0.0.1")
+
+    async def test_hash_queue_timeout(self):
+        limiter = HashConcurrencyLimiter(max_concurrent=1, queue_timeout=0.05)
+        slow = asyncio.create_task(limiter.run(lambda: __import__("time").sleep(0.3)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            await limiter.run(lambda: None)
+        assert exc.value.status_code == 503
+        await slow
+
+    async def test_throttled_login_skips_authentication(self, client, monkeypatch):
+        async def fail(*args, **kwargs):
+            raise AssertionError("authenticate не должен вызываться")
+
+        monkeypatch.setattr("services.auth_service.AuthService.authenticate", fail)
+        monkeypatch.setattr(login_throttle, "enabled", True)
+        for _ in range(login_throttle.by_email.limit):
+            await login_throttle.reserve("victim@test.com", "127.0.0.1")
+
+        resp = await client.post(
+            "/auth/login", json={"email": "victim@test.com", "password": "x"}
+        )
+        assert resp.status_code == 429
+        assert "Retry-After" in resp.headers
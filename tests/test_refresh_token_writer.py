@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from services.auth_service import AuthService
+from services.refresh_token_writer import RefreshTokenWriter
+
+
+class RecordingSession:
+    """Сессия, запоминающая выполненные statement'ы"""
+
+    def __init__(self, log: list, fail: bool) -> None:
+        self.log = log
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        if self.fail:
+            raise ConnectionError("db down")
+        self.log.append(stmt)
+
+    async def commit(self):
+        pass
+
+
+class TestRefreshTokenWriter:
+    """Тесты отложенной записи refresh-токенов"""
+
+    EXPIRES = datetime.now(timezone.utc) + timedelta(days=1)
+
+    def _writer(self, log: list, fail: bool = False) -> RefreshTokenWriter:
+        return RefreshTokenWriter(
+            lambda: RecordingSession(log, fail), enabled=True, max_batch=2
+        )
+
+    async def test_pending_tokens_are_valid(self):
+        writer = self._writer([])
+        await writer.submit(1, "login-token", "hash", self.EXPIRES)
+
+        assert writer.lookup(1, "login-token") is True
+        assert writer.lookup(1, "stored-token") is None
+        assert writer.lookup(2, "login-token") is None
+
+    async def test_rotation_supersedes_previous_tokens(self):
+        writer = self._writer([])
+        await writer.submit(1, "old", "hash", self.EXPIRES)
+        await writer.submit(1, "new", "hash", self.EXPIRES, revoke_previous=True)
+
+        assert writer.lookup(1, "new") is True
+        assert writer.lookup(1, "old") is False
+        assert writer.lookup(1, "stored-token") is False
+
+    async def test_repeated_rotation_before_flush(self):
+        writer = self._writer([])
+        login = AuthService.create_refresh_token(1)
+        await writer.submit(1, login, "hash", self.EXPIRES)
+        rotated = AuthService.create_refresh_token(1)
+        await writer.submit(1, rotated, "hash", self.EXPIRES, revoke_previous=True)
+        assert login != rotated
+        assert writer.lookup(1, rotated) is True
+
+        again = AuthService.create_refresh_token(1)
+        await writer.submit(1, again, "hash", self.EXPIRES, revoke_previous=True)
+        assert writer.lookup(1, again) is True
+        assert writer.lookup(1, rotated) is False
+        assert writer.lookup(1, login) is False
+
+    async def test_reissued_digest_uses_newest_entry(self):
+        writer = self._writer([])
+        await writer.submit(1, "same", "hash", self.EXPIRES)
+        await writer.submit(1, "same", "hash", self.EXPIRES, revoke_previous=True)
+
+        assert writer.lookup(1, "same") is True
+
+    async def test_flush_writes_batches(self):
+        log = []
+        writer = self._writer(log)
+        for i in range(3):
+            await writer.submit(i, f"token-{i}", "hash", self.EXPIRES)
+        await writer.submit(0, "rotated", "hash", self.EXPIRES, revoke_previous=True)
+
+        assert await writer.flush() == 4
+        assert writer.pending == 0
+        assert writer.lookup(0, "rotated") is None
+        # 2 пачки: INSERT; UPDATE (ротация) + INSERT
+        assert [stmt.__visit_name__ for stmt in log] == ["insert", "update", "insert"]
+
+    async def test_failed_flush_keeps_tokens(self):
+        writer = self._writer([], fail=True)
+        await writer.submit(1, "token", "hash", self.EXPIRES)
+
+        with pytest.raises(ConnectionError):
+            await writer.flush()
+        assert writer.pending == 1
+        assert writer.lookup(1, "token") is True
@@ -0,0 +1,32 @@
+import json
+from datetime import datetime, timezone
+
+from core.responses import rows_response
+from core.schemas import ProjectRead
+from main import app
+
+
+class TestFastListSerialization:
+    """Тесты быстрого пути сериализации списков"""
+
+    def test_matches_pydantic_serialization(self):
+        created_at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        row = ("Title", None, 1, 2, created_at, 1)
+        keys = ("title", "description", "id", "owner_id", "created_at", "version")
+
+        response = rows_response(keys, [row])
+
+        expected = ProjectRead(**dict(zip(keys, row))).model_dump(mode="json")
+        assert json.loads(response.body) == [expected]
+        assert response.media_type == "application/json"
+
+    def test_openapi_schema_unchanged(self):
+        paths = app.openapi()["paths"]
+        for path, model in (
+            ("/projects/", "ProjectRead"),
+            ("/admin/rules", "AccessRuleRead"),
+        ):
+            schema = paths[path]["get"]["responses"]["200"]["content"][
+                "application/json"
+            ]["schema"]
+            assert schema["items"]["$ref"].endswith(model)
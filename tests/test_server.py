@@ -0,0 +1,58 @@
+import pytest
+
+from config import RunConfig
+from core.worker import WorkerHooks, resolve
+from server import missing_modules, uvicorn_options
+
+
+class TestServerOptions:
+    """Тесты параметров запуска uvicorn из настроек"""
+
+    def test_options_from_settings(self):
+        options = uvicorn_options(
+            RunConfig(workers=4, keep_alive=30, limit_concurrency=0, backlog=4096)
+        )
+        assert options["workers"] == 4
+        assert options["timeout_keep_alive"] == 30
+        assert options["backlog"] == 4096
+        assert options["limit_concurrency"] is None
+
+    def test_zero_workers_means_cpu_count(self, monkeypatch):
+        monkeypatch.setattr("os.cpu_count", lambda: 6)
+        assert uvicorn_options(RunConfig(workers=0))["workers"] == 6
+
+    def test_missing_explicit_modules(self, monkeypatch):
+        monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+        assert missing_modules(RunConfig(loop="uvloop", http="httptools")) == [
+            "uvloop",
+            "httptools",
+        ]
+        assert missing_modules(RunConfig()) == []
+
+
+class TestWorkerHooks:
+    """Тесты хуков старта и остановки воркера"""
+
+    async def test_order_and_failing_shutdown(self):
+        calls = []
+        hooks = WorkerHooks()
+
+        async def start_pool():
+            calls.append("pool")
+
+        def broken_stop():
+            raise RuntimeError("boom")
+
+        hooks.on_startup(start_pool)
+        hooks.on_startup(lambda: calls.append("cache"))
+        hooks.on_shutdown(lambda: calls.append("stop pool"))
+        hooks.on_shutdown(broken_stop)
+
+        await hooks.startup()
+        await hooks.shutdown()
+        assert calls == ["pool", "cache", "stop pool"]
+
+    def test_resolve(self):
+        assert resolve("os.path:join") is __import__("os").path.join
+        with pytest.raises(ValueError):
+            resolve("os.path.join")
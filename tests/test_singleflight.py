@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from core.metrics import singleflight_calls
+from core.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Тесты объединения одинаковых вызовов"""
+
+    async def test_concurrent_calls_share_result(self):
+        flight = SingleFlight("test_share")
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"id": 1}
+
+        results = await asyncio.gather(*(flight.do(1, load) for _ in range(30)))
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert singleflight_calls.value(name="test_share", result="shared") == 29
+        assert flight.in_flight == 0
+
+    async def test_sequential_calls_are_not_cached(self):
+        flight = SingleFlight("test_sequential")
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        assert await flight.do("k", load) == 1
+        assert await flight.do("k", load) == 2
+
+    async def test_error_is_shared(self):
+        flight = SingleFlight("test_error")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise LookupError("db")
+
+        results = await asyncio.gather(
+            *(flight.do(1, fail) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(result, LookupError) for result in results)
+
+    async def test_follower_retries_after_leader_cancelled(self):
+        flight = SingleFlight("test_cancel")
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        leader = asyncio.create_task(flight.do(1, load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do(1, load))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "ok"
+        assert len(calls) == 2
+        with pytest.raises(asyncio.CancelledError):
+            await leader
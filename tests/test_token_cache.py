@@ -0,0 +1,79 @@
+from core.token_cache import TokenCache
+from services.auth_service import AuthService, access_token_cache
+
+
+class Clock:
+    def __init__(self, now: float) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTokenCache:
+    """Тесты кэша проверенных JWT"""
+
+    def test_entry_expires_with_token(self):
+        clock = Clock(1000)
+        cache = TokenCache(max_entries=10, clock=clock)
+        cache.put("token", {"sub": "1", "exp": 1060})
+
+        assert cache.get("token") == {"sub": "1", "exp": 1060}
+        clock.now = 1060
+        assert cache.get("token") is None
+        assert len(cache) == 0
+
+    def test_tokens_without_exp_are_not_cached(self):
+        cache = TokenCache(max_entries=10)
+        cache.put("token", {"sub": "1"})
+        assert cache.get("token") is None
+
+    def test_bounded_lru(self):
+        cache = TokenCache(max_entries=2, clock=Clock(0))
+        cache.put("a", {"sub": "1", "exp": 10})
+        cache.put("b", {"sub": "2", "exp": 10})
+        cache.get("a")
+        cache.put("c", {"sub": "3", "exp": 10})
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+    def test_invalidate_subject(self):
+        cache = TokenCache(max_entries=10, clock=Clock(0))
+        cache.put("a", {"sub": "1", "exp": 10})
+        cache.put("b", {"sub": "1", "exp": 10})
+        cache.put("c", {"sub": "2", "exp": 10})
+
+        assert cache.invalidate_subject(1) == 2
+        assert cache.get("a") is None and cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_large_tenant_evicts_only_itself(self):
+        cache = TokenCache(max_entries=4, clock=Clock(0), max_per_tenant=2)
+        cache.put("small", {"sub": "1", "tid": 2, "exp": 10})
+        for i in range(10):
+            cache.put(f"big-{i}", {"sub": str(i), "tid": 1, "exp": 10})
+
+        assert cache.tenant_size(1) == 2
+        assert cache.get("small") is not None
+        assert cache.get("big-9") is not None
+        assert cache.get("big-0") is None
+
+    def test_full_cache_evicts_from_largest_tenant(self):
+        cache = TokenCache(max_entries=3, clock=Clock(0), max_per_tenant=2)
+        cache.put("a1", {"sub": "1", "tid": 1, "exp": 10})
+        cache.put("a2", {"sub": "2", "tid": 1, "exp": 10})
+        cache.put("b1", {"sub": "3", "tid": 2, "exp": 10})
+        cache.put("c1", {"sub": "4", "tid": 3, "exp": 10})
+
+        assert len(cache) == 3
+        assert cache.get("a1") is None
+        assert cache.get("b1") is not None and cache.get("c1") is not None
+
+    def test_decode_uses_cache(self):
+        token = AuthService.create_access_token({"sub": "42"})
+        claims = AuthService.decode_access_token(token)
+        assert AuthService.decode_access_token(token) is claims
+        access_token_cache.invalidate_subject(42)
+        assert access_token_cache.get(token) is None